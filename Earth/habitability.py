@@ -0,0 +1,257 @@
+# habitability.py
+"""
+Habitability scoring without Streamlit: the feature / label definitions and the scoring used by
+app.py, the backend's /predict/habitability route, and a command line for whole catalogs:
+
+    python habitability.py archive.csv scored.parquet [--chunk-rows 100000] [--workers 4]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from knn_engine import PIPELINE_PATH, load_engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet input / output is optional
+    pa = pq = None
+
+# ===========================
+# إعداد: أسماء الميزات وخرائط اللابل
+# ===========================
+FEATURE_COLS = [
+    "P_PERIOD", "P_FLUX", "P_TEMP_EQUIL", "P_TYPE",
+    "P_HABZONE_OPT", "P_RADIUS_EST", "P_MASS_EST", "S_TYPE_TEMP"
+]
+
+LABEL_MAP = {
+    0: "Inhabitable ❌",
+    1: "Conservatively Habitable ✅",
+    2: "Optimistically Habitable 🌱"
+}
+# the same classes as plain names, for machine-readable output (prob_<name> columns, "prediction")
+LABEL_NAMES = {
+    0: "inhabitable",
+    1: "conservatively_habitable",
+    2: "optimistically_habitable",
+}
+
+# next to this file unless overridden (the app used to point at one developer's Windows path)
+PIPELINE_PATH = os.environ.get("HABITABILITY_PIPELINE_PATH", PIPELINE_PATH)
+CHUNK_ROWS = int(os.environ.get("HABITABILITY_CHUNK_ROWS", 100_000))
+SCORE_WORKERS = int(os.environ.get("HABITABILITY_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+SAMPLE_SIZE = 10
+
+_engine = None
+_engine_stamp = None
+_engine_lock = threading.Lock()
+
+
+# ===========================
+# Engine
+# ===========================
+def get_engine(path=PIPELINE_PATH):
+    """The scoring engine, loaded once per process and again only when the pipeline file changes."""
+    global _engine, _engine_stamp
+    stamp = (path, os.path.getmtime(path))
+    with _engine_lock:
+        if _engine is None or _engine_stamp != stamp:
+            _engine, _engine_stamp = load_engine(path), stamp
+        return _engine
+
+
+def get_classes_order(pipe):
+    # find classes_ from pipeline or final estimator
+    classes = None
+    if hasattr(pipe, "classes_"):
+        classes = pipe.classes_
+    else:
+        # try to get last estimator in pipeline
+        try:
+            last = list(pipe.named_steps.values())[-1]
+            classes = getattr(last, "classes_", None)
+        except Exception:
+            classes = None
+    if classes is None:
+        # fallback to [0,1,2]
+        classes = np.array([0, 1, 2])
+    return classes.astype(int)
+
+
+def missing_columns(df):
+    return [c for c in FEATURE_COLS if c not in df.columns]
+
+
+# ===========================
+# Scoring
+# ===========================
+def score(engine, X):
+    """(labels, probabilities): one KNN pass, the label is the most probable class (same as predict())."""
+    probs = engine.predict_proba(X)
+    return get_classes_order(engine)[probs.argmax(axis=1)], probs
+
+
+def score_frame(df, engine, display=False, skip_invalid=True):
+    """
+    df with a probability column per class and the predicted class appended. display=True uses
+    the dashboard's names (LABEL_MAP, "Prediction"), otherwise prob_<name> / "prediction".
+    Rows the pipeline cannot score (a missing feature, an unknown category) are left empty when
+    skip_invalid, otherwise they fail the whole frame like the pipeline does.
+    """
+    classes = get_classes_order(engine)
+    names = LABEL_MAP if display else LABEL_NAMES
+    prob_cols = [names.get(int(c), str(c)) if display else f"prob_{names.get(int(c), c)}" for c in classes]
+    valid = engine.valid_rows(df) if skip_invalid else np.ones(len(df), dtype=bool)
+
+    probs = np.full((len(df), len(classes)), np.nan)
+    labels = np.full(len(df), None, dtype=object)
+    if valid.any():
+        preds, probs[valid] = score(engine, df.loc[valid, FEATURE_COLS])
+        labels[valid] = [names.get(int(p), p) for p in preds]
+    df = df.copy()
+    for i, col in enumerate(prob_cols):
+        df[col] = probs[:, i]
+    df["Prediction" if display else "prediction"] = labels
+    return df
+
+
+def summarize(df_out, sample_size=SAMPLE_SIZE):
+    """Counts per predicted class and a sample of scored rows (the /predict response shape)."""
+    scored = df_out["prediction"].notna()
+    return {
+        "rows": len(df_out),
+        "scored": int(scored.sum()),
+        "skipped": int((~scored).sum()),
+        "counts": df_out.loc[scored, "prediction"].value_counts().to_dict(),
+        "sample": df_out.head(sample_size).replace({np.nan: None}).to_dict(orient="records"),
+    }
+
+
+# ===========================
+# Whole catalogs: chunks scored on a process pool
+# ===========================
+_worker_engine = None
+
+
+def _init_worker(path):
+    global _worker_engine
+    _worker_engine = load_engine(path)
+
+
+def _score_chunk(chunk):
+    """Runs inside a pool worker, with the engine its initializer loaded."""
+    return score_frame(chunk, _worker_engine)
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("Reading Parquet needs pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, low_memory=False)
+
+
+class _Output:
+    """Appends scored chunks to a CSV or Parquet file (by extension)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        if self.parquet and pq is None:
+            raise RuntimeError("Writing Parquet needs pyarrow")
+        self.writer = None
+        self.header = True
+
+    def write(self, df):
+        if not self.parquet:
+            df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+            self.header = False
+            return
+        # integer columns may turn into floats in a later chunk with NaNs, so store them as floats from the start
+        df = df.astype({c: "float64" for c in df.select_dtypes(include=["integer"]).columns})
+        # a chunk without any scorable row would otherwise fix the prediction column as all-null
+        df = df.astype({"prediction": "string"})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def score_file(source, destination, chunk_rows=CHUNK_ROWS, workers=SCORE_WORKERS, pipeline_path=PIPELINE_PATH):
+    """
+    Streams `source` (CSV / Parquet) through the engine in chunks of `chunk_rows` on `workers`
+    processes into `destination`, in input order; at most 2 x workers chunks are held in memory.
+    """
+    start = time.perf_counter()
+    counts = Counter()
+    rows = skipped = 0
+    out = _Output(destination)
+    # spawn: a worker loads the engine itself instead of inheriting whatever the caller holds
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(pipeline_path,))
+    inflight = deque()
+
+    def drain_one():
+        nonlocal rows, skipped
+        df_out = inflight.popleft().result()
+        out.write(df_out)
+        scored = df_out["prediction"].notna()
+        rows += len(df_out)
+        skipped += int((~scored).sum())
+        counts.update(df_out.loc[scored, "prediction"].value_counts().to_dict())
+
+    try:
+        for chunk in iter_chunks(source, chunk_rows):
+            missing = missing_columns(chunk)
+            if missing:
+                raise ValueError(f"Missing required columns: {missing}")
+            inflight.append(pool.submit(_score_chunk, chunk))
+            if len(inflight) >= 2 * workers:
+                drain_one()
+        while inflight:
+            drain_one()
+    finally:
+        out.close()
+        pool.shutdown(cancel_futures=True)
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "scored": rows - skipped, "skipped": skipped, "counts": dict(counts),
+            "seconds": round(seconds, 3), "rows_per_s": round(rows / seconds) if seconds else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an exoplanet catalog (CSV / Parquet) for habitability.")
+    parser.add_argument("source")
+    parser.add_argument("destination", help="output .csv or .parquet")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=SCORE_WORKERS)
+    parser.add_argument("--pipeline", default=PIPELINE_PATH)
+    args = parser.parse_args(argv)
+    try:
+        result = score_file(args.source, args.destination, args.chunk_rows, args.workers, args.pipeline)
+    except (ValueError, RuntimeError) as e:
+        print(json.dumps({"error": str(e)}))
+        return 1
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
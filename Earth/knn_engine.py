@@ -0,0 +1,207 @@
+# knn_engine.py
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+# ===========================
+# إعداد
+# ===========================
+HERE = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_PATH = os.environ.get("KNN_PIPELINE_PATH", os.path.join(HERE, "knn_pipeline.pkl"))
+# the exported index: training features already transformed + the KD-tree over them
+INDEX_DIR = os.environ.get("KNN_INDEX_DIR", os.path.join(HERE, "knn_index"))
+# batched queries are split in chunks answered in parallel (KDTree.query releases the GIL)
+QUERY_WORKERS = int(os.environ.get("KNN_QUERY_WORKERS", os.cpu_count() or 1))
+QUERY_CHUNK = int(os.environ.get("KNN_QUERY_CHUNK", 2048))
+INDEX_FORMAT = "knn-index-1"
+
+_pool = None
+
+
+def _query_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="knn")
+    return _pool
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ===========================
+# المحرك: نفس الـ pipeline بس arrays + KD-tree
+# ===========================
+class KNNEngine:
+    """
+    knn_pipeline.pkl (ColumnTransformer[MinMaxScaler, OrdinalEncoder] -> KNeighborsClassifier) as
+    plain arrays: the transform is replayed with the same float operations, and neighbours come
+    from the classifier's own fitted KD-tree (a rebuilt one may order equidistant points
+    differently), so ties resolve the same way and predictions match the pipeline exactly.
+    """
+
+    def __init__(self, numeric, categorical, scale, offset, categories, tree, labels, classes, n_neighbors):
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.categories = [pd.Index(c) for c in categories]
+        self.labels = np.asarray(labels, dtype=np.intp)
+        self.classes = np.asarray(classes)
+        self.n_neighbors = int(n_neighbors)
+        # the training points (already transformed) live in the tree
+        self.tree = tree
+
+    @property
+    def classes_(self):
+        return self.classes
+
+    @property
+    def columns(self):
+        return self.numeric + self.categorical
+
+    # ---------- export ----------
+    @classmethod
+    def from_pipeline(cls, pipe):
+        """Read the fitted arrays out of the pipeline; ValueError for a layout the engine does not replay."""
+        pre = pipe.named_steps["preprocessor"]
+        knn = pipe.named_steps["model"]
+        if knn.weights != "uniform" or knn.effective_metric_ != "euclidean":
+            raise ValueError(f"Unsupported KNN settings: weights={knn.weights}, metric={knn.effective_metric_}")
+        if pre.remainder != "drop" or [name for name, _, _ in pre.transformers_ if name != "remainder"] != ["num", "cat"]:
+            raise ValueError("Expected a ColumnTransformer with exactly a 'num' and a 'cat' step")
+
+        columns = {name: list(cols) for name, _, cols in pre.transformers_}
+        scaler = pre.named_transformers_["num"].named_steps["scaler"]
+        encoder = pre.named_transformers_["cat"].named_steps["encoder"]
+        if scaler.clip or encoder.handle_unknown != "error":
+            raise ValueError("Unsupported scaler / encoder settings (clip, handle_unknown)")
+        if knn._fit_method == "kd_tree":
+            tree = knn._tree
+        else:
+            # brute / ball_tree fits get a KD-tree over the same points (same neighbours up to ties)
+            tree = KDTree(knn._fit_X, leaf_size=knn.leaf_size, metric="euclidean")
+        return cls(
+            numeric=columns["num"], categorical=columns["cat"],
+            scale=scaler.scale_, offset=scaler.min_, categories=encoder.categories_,
+            tree=tree, labels=knn._y, classes=knn.classes_, n_neighbors=knn.n_neighbors,
+        )
+
+    def save(self, directory, source=None):
+        """index.npz (arrays), tree.joblib (the built KD-tree with its points) and manifest.json."""
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, "index.npz"), scale=self.scale, offset=self.offset,
+                 labels=self.labels, classes=self.classes)
+        joblib.dump(self.tree, os.path.join(directory, "tree.joblib"))
+        manifest = {
+            "format": INDEX_FORMAT,
+            "numeric": self.numeric,
+            "categorical": self.categorical,
+            "categories": [c.tolist() for c in self.categories],
+            "n_neighbors": self.n_neighbors,
+            "training_rows": len(self.labels),
+            "source": os.path.basename(source) if source else None,
+            "source_sha256": file_sha256(source) if source else None,
+        }
+        with open(os.path.join(directory, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unknown index format {manifest.get('format')!r}")
+        with np.load(os.path.join(directory, "index.npz"), allow_pickle=False) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        tree = joblib.load(os.path.join(directory, "tree.joblib"))
+        return cls(manifest["numeric"], manifest["categorical"], arrays["scale"], arrays["offset"],
+                   manifest["categories"], tree, arrays["labels"], arrays["classes"], manifest["n_neighbors"])
+
+    # ---------- scoring ----------
+    def transform(self, df):
+        """Raw feature columns -> the matrix the KNN was fitted on (MinMax-scaled numbers, then category codes)."""
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        X = np.empty((len(df), len(self.columns)), dtype=np.float64)
+        num = X[:, :len(self.numeric)]
+        num[:] = df[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        # MinMaxScaler.transform: X *= scale_; X += min_
+        num *= self.scale
+        num += self.offset
+        for j, (name, categories) in enumerate(zip(self.categorical, self.categories)):
+            codes = categories.get_indexer(df[name])
+            if (codes < 0).any():
+                unknown = pd.unique(df[name][codes < 0]).tolist()
+                raise ValueError(f"Found unknown categories {unknown} in column {name} during transform")
+            X[:, len(self.numeric) + j] = codes
+        if np.isnan(X).any():
+            raise ValueError("Input X contains NaN.")
+        return X
+
+    def valid_rows(self, df):
+        """Boolean mask of the rows transform() accepts: every feature present, categories known."""
+        mask = df[self.numeric].notna().all(axis=1).to_numpy()
+        for name, categories in zip(self.categorical, self.categories):
+            mask &= categories.get_indexer(df[name]) >= 0
+        return mask
+
+    def kneighbors(self, X):
+        """Row indices (into the training set) of the n_neighbors closest training points of every row."""
+        if len(X) <= QUERY_CHUNK or QUERY_WORKERS <= 1:
+            return self.tree.query(X, k=self.n_neighbors, return_distance=False)
+        chunks = [X[i:i + QUERY_CHUNK] for i in range(0, len(X), QUERY_CHUNK)]
+        parts = _query_pool().map(lambda chunk: self.tree.query(chunk, k=self.n_neighbors, return_distance=False), chunks)
+        return np.vstack(list(parts))
+
+    def predict_proba(self, df):
+        """Share of the neighbours in each class (uniform weights), in classes order."""
+        neighbours = self.labels[self.kneighbors(self.transform(df))]
+        proba = np.empty((len(neighbours), len(self.classes)))
+        for c in range(len(self.classes)):
+            proba[:, c] = (neighbours == c).sum(axis=1)
+        proba /= self.n_neighbors
+        return proba
+
+    def predict(self, df):
+        # ties go to the first class, as in KNeighborsClassifier.predict
+        return self.classes[self.predict_proba(df).argmax(axis=1)]
+
+
+# ===========================
+# تحميل: الـ index المحفوظ لو لسه مطابق للـ pipeline، غير كده يتبني من الـ pipeline
+# ===========================
+def load_engine(pipeline_path=PIPELINE_PATH, index_dir=INDEX_DIR, pipeline=None):
+    manifest_path = os.path.join(index_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("source_sha256") == file_sha256(pipeline_path):
+            return KNNEngine.load(index_dir)
+    if pipeline is None:
+        pipeline = joblib.load(pipeline_path)
+    return KNNEngine.from_pipeline(pipeline)
+
+
+def export_index(pipeline_path=PIPELINE_PATH, index_dir=INDEX_DIR):
+    engine = KNNEngine.from_pipeline(joblib.load(pipeline_path))
+    return engine.save(index_dir, source=pipeline_path)
+
+
+if __name__ == "__main__":
+    # python knn_engine.py [pipeline.pkl] [index_dir]  ->  (re)build the persisted index
+    manifest = export_index(*sys.argv[1:3])
+    print(json.dumps({k: manifest[k] for k in ("training_rows", "n_neighbors", "source_sha256")}))
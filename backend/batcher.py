@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+from model_registry import get_bundle
+from streaming import BATCH_PREDICTORS, PredictionSummary
+from instrumentation import span, register_collector
+
+# -------- CONFIG --------
+MICROBATCH_ENABLED = os.environ.get("MICROBATCH_ENABLED", "1") == "1"
+MICROBATCH_WINDOW_MS = float(os.environ.get("MICROBATCH_WINDOW_MS", 5))
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", 64))
+LATENCY_SAMPLES = 10_000
+# ------------------------
+
+
+def _row_signature(row):
+    # rows are only batched with rows of the same columns and value types,
+    # so a row is scored exactly as it would be on its own
+    return tuple(sorted((str(k), type(v).__name__) for k, v in row.items()))
+
+
+def _score_rows(mission, version, profile, rows):
+    """Score a list of single-row dicts in one vectorized call; runs in a worker thread."""
+    bundle = get_bundle(mission, version, profile)
+    df_out, y_true, y_pred, probs = BATCH_PREDICTORS[mission](pd.DataFrame(rows), bundle)
+    y_pred = np.asarray(y_pred)
+    y_true = None if y_true is None else np.asarray(y_true)
+    probs = np.asarray(probs)
+    return [
+        (df_out.iloc[[i]], None if y_true is None else y_true[i:i + 1], y_pred[i:i + 1], probs[i:i + 1])
+        for i in range(len(rows))
+    ]
+
+
+class _Pending:
+    def __init__(self):
+        self.items = []
+        self.timer = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-row requests per (mission, version, profile, columns) for up to window_ms
+    or max_size rows, scores them together and resolves each caller's future with its own row.
+    """
+
+    def __init__(self, window_ms=MICROBATCH_WINDOW_MS, max_size=MICROBATCH_MAX_SIZE):
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self._pending = {}
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.batches = 0
+        self.fallbacks = 0
+
+    async def submit(self, mission, row, version=None, profile=None):
+        loop = asyncio.get_running_loop()
+        key = (mission, version, profile, _row_signature(row))
+        fut = loop.create_future()
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _Pending()
+            pending.timer = loop.call_later(self.window, self._flush, key, pending)
+        pending.items.append((row, fut, time.perf_counter()))
+        self.requests += 1
+
+        if len(pending.items) >= self.max_size:
+            pending.timer.cancel()
+            self._flush(key, pending)
+        return await fut
+
+    def _flush(self, key, pending):
+        if self._pending.get(key) is pending:
+            del self._pending[key]
+        if pending.items:
+            asyncio.ensure_future(self._run(key, pending.items))
+
+    async def _run(self, key, items):
+        mission, version, profile, _ = key
+        loop = asyncio.get_running_loop()
+        rows = [row for row, _, _ in items]
+        self.batches += 1
+        self.batch_sizes[len(items)] += 1
+
+        try:
+            results = await loop.run_in_executor(None, _score_rows, mission, version, profile, rows)
+        except Exception:
+            # one bad row must not fail its neighbours: score them one by one
+            self.fallbacks += 1
+            results = []
+            for row in rows:
+                try:
+                    results.append((await loop.run_in_executor(None, _score_rows, mission, version, profile, [row]))[0])
+                except Exception as e:
+                    results.append(e)
+
+        now = time.perf_counter()
+        for (_, fut, started), result in zip(items, results):
+            self.latencies_ms.append((now - started) * 1000)
+            if fut.done():
+                continue
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    def stats(self):
+        lat = np.fromiter(self.latencies_ms, dtype=float)
+        percentiles = {}
+        if len(lat):
+            for p in (50, 90, 95, 99):
+                percentiles[f"p{p}"] = round(float(np.percentile(lat, p)), 3)
+        return {
+            "enabled": MICROBATCH_ENABLED,
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "mean_batch_size": round(self.requests / self.batches, 3) if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "latency_ms": percentiles,
+        }
+
+
+batcher = MicroBatcher()
+
+
+def _batcher_metrics():
+    yield "microbatch_requests_total", "counter", "Single-row requests sent through the micro-batcher", {}, batcher.requests
+    yield "microbatch_batches_total", "counter", "Micro-batches scored", {}, batcher.batches
+    yield "microbatch_fallbacks_total", "counter", "Micro-batches rescored row by row after a failure", {}, batcher.fallbacks
+
+
+register_collector(_batcher_metrics)
+
+
+async def predict_row(mission, row, version=None, profile=None):
+    """Single-planet prediction through the micro-batcher, shaped like the /predict response."""
+    with span("microbatch", mission=mission):
+        row_out, y_true, y_pred, probs = await batcher.submit(mission, row, version, profile)
+    summary = PredictionSummary(mission, probs.shape[1])
+    summary.update(row_out, y_true, y_pred, probs)
+    result = summary.result()
+    # single planets are not kept for /results queries, as on the unbatched path
+    return {"mission": mission, "profile": profile or "full", "counts": result["counts"],
+            "metrics": result["metrics"], "result_id": None, "sample": result["sample"]}
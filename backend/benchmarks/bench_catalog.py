@@ -0,0 +1,68 @@
+"""
+CSV parsing vs the memory-mapped catalog store.
+
+    cd backend && python benchmarks/bench_catalog.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import pandas as pd
+
+import catalog_store
+
+COLUMNS = {
+    "Data_DR25": ["koi_prad", "koi_insol"],
+    "Data_K2": ["pl_rade", "pl_orbper", "st_teff", "disposition"],
+}
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not catalog_store.available():
+        sys.exit("pyarrow is not installed: the catalog store falls back to CSV parsing")
+
+    results = {}
+    for name, columns in COLUMNS.items():
+        csv_path = catalog_store.CATALOGS[name]
+        start = time.perf_counter()
+        rows = catalog_store.ingest_csv(csv_path, catalog_store.store_path(name))
+        ingest_s = time.perf_counter() - start
+        catalog_store.ensure_catalog(name)
+
+        results[name] = {
+            "rows": rows,
+            "csv_bytes": os.path.getsize(csv_path),
+            "store_bytes": os.path.getsize(catalog_store.store_path(name)),
+            "ingest_s": ingest_s,
+            "read_csv_all_s": best_of(lambda: pd.read_csv(csv_path), args.repeat),
+            "read_csv_usecols_s": best_of(lambda: pd.read_csv(csv_path, usecols=columns), args.repeat),
+            "mmap_arrays_s": best_of(lambda: catalog_store.read_arrays(name, columns), args.repeat),
+            "mmap_frame_s": best_of(lambda: catalog_store.read_frame(name, columns), args.repeat),
+        }
+        r = results[name]
+        r["speedup_vs_read_csv"] = round(r["read_csv_all_s"] / r["mmap_arrays_s"], 1)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
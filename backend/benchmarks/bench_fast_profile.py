@@ -0,0 +1,96 @@
+"""
+Accuracy / latency trade-off of the pruned "fast" profile (fast_profile) against the full model,
+on the mission CSVs: one row per (share of trees kept, ranking, depth cap). Agreement is the share
+of rows labelled as the full model labels them; latency is a whole predict_batch call
+(align, impute / scale, predict, labels), best of --repeat, with the prediction cache off.
+
+    cd backend && python benchmarks/bench_fast_profile.py [--keep 1,0.5,0.25,0.1] [--depths 0,4] [--ranks leaf,gain]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+os.environ["PREDICTION_CACHE_ENABLED"] = "0"  # every repeat scores every row
+
+import numpy as np
+import pandas as pd
+
+import fast_profile
+from model_registry import get_bundle
+from streaming import BATCH_PREDICTORS
+
+DATASETS = {
+    "kepler": ("Data_DR25.csv", "koi_disposition"),
+    "k2": ("Data_K2.csv", "disposition"),
+}
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return out, min(times)
+
+
+def score(mission, bundle, df, repeat):
+    predict_batch = BATCH_PREDICTORS[mission]
+    # copies: K2 rewrites its label column in place
+    (_, y_true, y_pred, probs), seconds = best_of(lambda: predict_batch(df.copy(), bundle), repeat)
+    accuracy = float(np.mean(np.asarray(y_pred) == np.asarray(y_true))) if y_true is not None else None
+    return np.asarray(y_pred), np.asarray(probs), accuracy, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--missions", default=",".join(DATASETS))
+    parser.add_argument("--keep", default="1,0.5,0.25,0.1")
+    parser.add_argument("--depths", default="0,4")
+    parser.add_argument("--ranks", default="leaf,gain")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for mission in args.missions.split(","):
+        path, _ = DATASETS[mission]
+        df = pd.read_csv(path)
+        bundle = get_bundle(mission)
+        full_pred, full_probs, full_acc, full_s = score(mission, bundle, df, args.repeat)
+        r = results[mission] = {
+            "rows": len(df),
+            "full": {"accuracy": full_acc, "ms": round(full_s * 1000, 2),
+                     "size_kb": round(sum(fast_profile._model_bytes(bundle[n]) for n in fast_profile.MODEL_NAMES
+                                          if n in bundle.artifacts) / 1024, 1)},
+            "default": {"keep": fast_profile.FAST_KEEP_TREES, "rank": fast_profile.FAST_RANK,
+                        "max_depth": fast_profile.FAST_MAX_DEPTH or None},
+            "profiles": [],
+        }
+        for rank in args.ranks.split(","):
+            for depth in (int(d) for d in args.depths.split(",")):
+                for keep in (float(k) for k in args.keep.split(",")):
+                    pruned = fast_profile.prune(bundle, keep, rank, depth)
+                    pred, probs, acc, seconds = score(mission, pruned, df, args.repeat)
+                    r["profiles"].append({
+                        "keep": keep, "rank": rank, "max_depth": depth or None,
+                        "trees": pruned.pruning["trees"],
+                        "unused_features": pruned.pruning["unused_features"],
+                        "size_kb": round(pruned.size_bytes / 1024, 1),
+                        "build_s": round(pruned.load_seconds, 3),
+                        "accuracy": acc,
+                        "agreement": float(np.mean(pred == full_pred)),
+                        "max_abs_prob_diff": float(np.max(np.abs(probs - full_probs))),
+                        "ms": round(seconds * 1000, 2),
+                        "speedup": round(full_s / seconds, 2),
+                    })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
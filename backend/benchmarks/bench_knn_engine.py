@@ -0,0 +1,101 @@
+"""
+Habitability KNN (Earth/knn_pipeline.pkl): queries/second of the sklearn pipeline (KD-tree and
+brute force) vs Earth/knn_engine.py, on the real training set and synthetic enlargements of it
+(training points resampled with jitter, same labels), plus a check that the engine returns
+exactly the pipeline's probabilities and labels. Results are printed as JSON.
+
+    cd backend && python benchmarks/bench_knn_engine.py [--sizes 1,10,100] [--queries 20000] [--workers 1,4]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+EARTH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "Earth")
+sys.path.insert(0, EARTH_DIR)
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+
+import knn_engine
+from knn_engine import KNNEngine
+
+CATALOG = os.path.join(EARTH_DIR, "phl_exoplanet_catalog_2019.csv")
+NOISE = 0.01  # jitter of the resampled training points (scaled features are in [0, 1])
+
+
+def queries(engine, n):
+    """n catalog planets (the rows the pipeline can score), numeric features jittered by up to ±20%."""
+    df = pd.read_csv(CATALOG, usecols=engine.columns).dropna()
+    df = df[np.isin(df[engine.categorical[0]], engine.categories[0]) & np.isin(df[engine.categorical[1]], engine.categories[1])]
+    df = df.sample(n, replace=True, random_state=0).reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    for c in engine.numeric:
+        df[c] = df[c] * rng.uniform(0.8, 1.2, len(df))
+    return df
+
+
+def enlarged(pipe, factor):
+    """The pipeline refitted on `factor` x its training points (factor 1: the pipeline itself)."""
+    knn = pipe.named_steps["model"]
+    if factor == 1:
+        return pipe
+    rng = np.random.default_rng(factor)
+    pick = rng.integers(0, len(knn._fit_X), len(knn._fit_X) * factor)
+    X = knn._fit_X[pick].copy()
+    n_numeric = len(pipe.named_steps["preprocessor"].transformers_[0][2])
+    X[:, :n_numeric] += rng.normal(0, NOISE, (len(X), n_numeric))
+    model = KNeighborsClassifier(n_neighbors=knn.n_neighbors, leaf_size=knn.leaf_size).fit(X, knn.classes_[knn._y[pick]])
+    return Pipeline([("preprocessor", pipe.named_steps["preprocessor"]), ("model", model)])
+
+
+def brute(pipe):
+    knn = pipe.named_steps["model"]
+    model = KNeighborsClassifier(n_neighbors=knn.n_neighbors, algorithm="brute").fit(knn._fit_X, knn.classes_[knn._y])
+    return Pipeline([("preprocessor", pipe.named_steps["preprocessor"]), ("model", model)])
+
+
+def qps(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return round(len(df) / best), out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,10,100", help="training-set sizes, as multiples of the real one")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--workers", default="1,4", help="engine query threads")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pipeline = joblib.load(knn_engine.PIPELINE_PATH)
+    df = queries(KNNEngine.from_pipeline(pipeline), args.queries)
+    results = {"queries": len(df), "cpus": os.cpu_count()}
+    for factor in [int(s) for s in args.sizes.split(",")]:
+        pipe = enlarged(pipeline, factor)
+        case = {"training_rows": len(pipe.named_steps["model"]._fit_X)}
+        case["pipeline_qps"], expected = qps(pipe.predict_proba, df, args.repeat)
+        case["pipeline_brute_qps"], _ = qps(brute(pipe).predict_proba, df, 1)
+
+        start = time.perf_counter()
+        engine = KNNEngine.from_pipeline(pipe)
+        case["engine_build_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        for workers in [int(w) for w in args.workers.split(",")]:
+            knn_engine.QUERY_WORKERS, knn_engine._pool = workers, None
+            case[f"engine_qps_{workers}_threads"], proba = qps(engine.predict_proba, df, args.repeat)
+            case[f"engine_exact_{workers}_threads"] = bool(np.array_equal(proba, expected))
+        case["labels_exact"] = bool(np.array_equal(engine.predict(df), pipe.predict(df)))
+        results[f"x{factor}"] = case
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Preprocessing before/after: the pandas path (select_dtypes -> reindex -> imputer.transform ->
+scaler.transform, a new DataFrame per step) vs preprocessing.FeaturePipeline (one matrix,
+imputed and scaled in place). Latency and peak traced memory per mission, plus a check that
+both produce the same matrix.
+
+    cd backend && python benchmarks/bench_preprocessing.py [--scale 10] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import numpy as np
+import pandas as pd
+
+from model_registry import get_bundle
+from preprocessing import FILL_NAN, FILL_ZERO, pipeline
+
+MISSIONS = {
+    # mission: (csv, label column, fill for missing / non-numeric columns)
+    "kepler": ("Data_DR25.csv", "koi_disposition", FILL_NAN),
+    "k2": ("Data_K2.csv", "disposition", FILL_ZERO),
+}
+
+
+def pandas_path(df, bundle, label, fill):
+    """The preprocessing the model modules did before FeaturePipeline."""
+    X = df.drop(columns=[label]) if label in df.columns else df.copy()
+    X = X.select_dtypes(include=[np.number])
+    X = X.reindex(columns=bundle["features"], fill_value=0 if fill == FILL_ZERO else np.nan)
+    if bundle.get("imputer") is not None:
+        X = pd.DataFrame(bundle["imputer"].transform(X), columns=X.columns)
+    if bundle.get("scaler") is not None:
+        X = pd.DataFrame(bundle["scaler"].transform(X), columns=X.columns)
+    return X
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1, help="repeat the mission CSV this many times")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for mission, (source, label, fill) in MISSIONS.items():
+        bundle = get_bundle(mission)
+        df = pd.read_csv(source)
+        if args.scale > 1:
+            df = pd.concat([df] * args.scale, ignore_index=True)
+        pipe = pipeline(bundle, fill=fill)
+
+        before, before_s, before_peak = measure(lambda: pandas_path(df, bundle, label, fill), args.repeat)
+        after, after_s, after_peak = measure(lambda: pipe.transform(df), args.repeat)
+
+        before = before.to_numpy(dtype=np.float64)
+        results[mission] = {
+            "rows": len(df),
+            "features": len(pipe.features),
+            "dtype": str(pipe.dtype),
+            "before_ms": round(before_s * 1000, 3),
+            "after_ms": round(after_s * 1000, 3),
+            "speedup": round(before_s / after_s, 2),
+            "before_peak_mb": round(before_peak / 2**20, 2),
+            "after_peak_mb": round(after_peak / 2**20, 2),
+            "max_abs_diff": float(np.nanmax(np.abs(before - after))) if before.size else 0.0,
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
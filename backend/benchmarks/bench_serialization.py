@@ -0,0 +1,102 @@
+"""
+Pickles vs native model files (model_export): cold-load time of every bundle in a fresh process,
+on-disk size, and a check that both formats score the mission CSV identically.
+
+    cd backend && python model_export.py            # writes models/native/ once
+    cd backend && python benchmarks/bench_serialization.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import numpy as np
+import pandas as pd
+
+CASES = {
+    # (mission, version): csv scored to compare the two formats
+    ("kepler", "Kepler"): "Data_DR25.csv",
+    ("kepler", "KeplerRetrained"): None,
+    ("k2", "K2"): "Data_K2.csv",
+}
+FORMATS = ("pickle", "native")
+
+
+def child(fmt, mission, version):
+    """Runs in a fresh interpreter: libraries imported first, then only the bundle load is timed."""
+    import lightgbm  # noqa: F401
+    import sklearn  # noqa: F401
+    import xgboost  # noqa: F401
+    import model_registry
+
+    model_registry.MODEL_FORMAT = fmt
+    start = time.perf_counter()
+    bundle = model_registry.registry.get(mission, version)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "size_bytes": bundle.size_bytes, "rss_bytes": bundle.rss_bytes,
+                      "files": sorted(os.path.basename(p) for p in bundle.paths.values())}))
+
+
+def cold_load(fmt, mission, version, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, __file__, "--child", fmt, mission, version],
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r["seconds"])
+    return {
+        "cold_load_ms": round(best["seconds"] * 1000, 2),
+        "size_mb": round(best["size_bytes"] / 2**20, 3),
+        "rss_mb": round(best["rss_bytes"] / 2**20, 1) if best["rss_bytes"] is not None else None,
+        "files": best["files"],
+    }
+
+
+def same_scores(mission, version, source):
+    import model_registry
+    from tree_engine import predict_proba
+    from preprocessing import pipeline
+
+    df = pd.read_csv(source)
+    probs = {}
+    for fmt in FORMATS:
+        model_registry.MODEL_FORMAT = fmt
+        model_registry.registry.invalidate(mission, version)
+        bundle = model_registry.registry.get(mission, version)
+        probs[fmt] = predict_proba(bundle, pipeline(bundle).transform(df))
+    return float(np.max(np.abs(probs["pickle"] - probs["native"])))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", nargs=3, metavar=("FORMAT", "MISSION", "VERSION"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    from model_registry import NATIVE_DIR
+    results = {}
+    for (mission, version), source in CASES.items():
+        if not os.path.exists(os.path.join(NATIVE_DIR, mission, version, "manifest.json")):
+            results[f"{mission}/{version}"] = {"skipped": "no native export, run model_export.py"}
+            continue
+        case = {fmt: cold_load(fmt, mission, version, args.repeat) for fmt in FORMATS}
+        case["load_speedup"] = round(case["pickle"]["cold_load_ms"] / case["native"]["cold_load_ms"], 2)
+        case["size_ratio"] = round(case["native"]["size_mb"] / case["pickle"]["size_mb"], 3)
+        if source:
+            case["max_abs_proba_diff"] = same_scores(mission, version, source)
+        results[f"{mission}/{version}"] = case
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
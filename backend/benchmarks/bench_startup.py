@@ -0,0 +1,128 @@
+"""
+Startup cost of the API: what `import main` imports (a `python -X importtime` report, summed per
+top-level package), what the warm-up then adds on top (startup.load_deferred), and, per
+STARTUP_MODE, how long a uvicorn process takes to answer /healthz and to report ready on /readyz.
+
+    cd backend && python benchmarks/bench_startup.py [--modes background,lazy,blocking] [--repeat 3] [--top 15]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+STAGES = {
+    "import_main": "import main",
+    "import_main_and_warmup": "import main, startup; startup.load_deferred()",
+}
+
+
+def importtime(code):
+    """(total seconds, {top-level package: seconds}) of the imports `code` makes, from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=BACKEND_DIR))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    packages, total = {}, 0
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; top-level imports are not indented
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1e6
+        if not name.startswith("  "):
+            total += int(cumulative_us) / 1e6
+    return total, packages
+
+
+def import_report(repeat, top):
+    report = {}
+    for stage, code in STAGES.items():
+        runs = [importtime(code) for _ in range(repeat)]
+        total, packages = min(runs, key=lambda r: r[0])
+        ranked = sorted(packages.items(), key=lambda kv: -kv[1])
+        report[stage] = {
+            "seconds": round(total, 3),
+            "packages": len(packages),
+            "top_packages_s": {name: round(s, 3) for name, s in ranked[:top]},
+        }
+    return report
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        conn.close()
+
+
+def serve_timings(mode, timeout=120):
+    """Seconds from launching uvicorn to the first /healthz 200, to /readyz 200 and to a warm /models."""
+    port = free_port()
+    env = dict(os.environ, STARTUP_MODE=mode, PYTHONPATH=BACKEND_DIR)
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    out = {}
+    try:
+        while "ready_s" not in out:
+            if time.perf_counter() - start > timeout or proc.poll() is not None:
+                out["error"] = "timed out" if proc.poll() is None else f"exited with {proc.returncode}"
+                break
+            try:
+                if "healthz_s" not in out:
+                    if get(port, "/healthz")[0] == 200:
+                        out["healthz_s"] = round(time.perf_counter() - start, 3)
+                status, body = get(port, "/readyz")
+                if status == 200:
+                    out["ready_s"] = round(time.perf_counter() - start, 3)
+                    out["state"] = body["state"]
+            except OSError:
+                pass
+            time.sleep(0.02)
+        if "error" not in out:
+            # lazy mode is "ready" before anything is imported: the first request of a route pays for
+            # the modules that route uses (/models: the registry, no model is loaded)
+            get(port, "/models")
+            out["first_request_s"] = round(time.perf_counter() - start, 3)
+            out["warmup_s"] = get(port, "/readyz")[1]["seconds"]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="background,lazy,blocking")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    results = {"imports": import_report(args.repeat, args.top), "serve": {}}
+    for mode in args.modes.split(","):
+        runs = [serve_timings(mode) for _ in range(args.repeat)]
+        results["serve"][mode] = min(runs, key=lambda r: r.get("healthz_s", float("inf")))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+End-to-end benchmarks for the backend: the model functions, /predict (single row and bulk),
+/retrain and /api/researcher/insights, on the mission CSVs and synthetic scale-ups of them.
+Every case runs in its own process, so peak RSS is per case. Results are printed as JSON.
+
+    cd backend && python benchmarks/bench_suite.py [--scales 1,10,100,1000] [--out results.json]
+    python benchmarks/bench_suite.py --out baseline.json                 # store a baseline
+    python benchmarks/bench_suite.py --baseline baseline.json            # exit 1 on regressions
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join("benchmarks", ".data")
+DATASETS = {
+    "kepler": ("Data_DR25.csv", "koi_disposition"),
+    "k2": ("Data_K2.csv", "disposition"),
+    # no TESS catalog ships with the repo: the K2 rows under TOI column names (what the stand-in is trained on)
+    "tess": (os.path.join(DATA_DIR, "Data_TESS_standin.csv"), "tfopwg_disp"),
+}
+SINGLE_ROW_REQUESTS = 200
+# (metric, +1 if higher is better / -1 if lower is better)
+COMPARED_METRICS = [("rows_per_s", 1), ("p50_ms", -1), ("p99_ms", -1), ("peak_rss_mb", -1)]
+
+
+# ======================================================
+# Data
+# ======================================================
+def scaled_csv(mission, scale):
+    """The mission CSV repeated `scale` times, float columns jittered so the copies are not identical rows."""
+    source, label = DATASETS[mission]
+    if mission == "tess" and not os.path.exists(source):
+        from tess_model import STANDIN_SOURCE, STANDIN_RENAME
+        os.makedirs(DATA_DIR, exist_ok=True)
+        pd.read_csv(STANDIN_SOURCE).rename(columns=STANDIN_RENAME).to_csv(source, index=False)
+    if scale == 1:
+        return source
+    path = os.path.join(DATA_DIR, f"{os.path.splitext(source)[0]}_x{scale}.csv")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    df = pd.read_csv(source)
+    floats = [c for c in df.select_dtypes(include=["float"]).columns if c != label]
+    rng = np.random.default_rng(0)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    for i in range(scale):
+        copy = df.copy()
+        if i:
+            copy[floats] = copy[floats] * (1 + 1e-6 * rng.standard_normal((len(df), len(floats))))
+        copy.to_csv(tmp, mode="a", header=i == 0, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def row_count(path):
+    with open(path, "rb") as f:
+        return sum(1 for _ in f) - 1
+
+
+# ======================================================
+# Measurements
+# ======================================================
+def summarize(rows, seconds):
+    """rows processed per run and the wall time of each run -> throughput and latency percentiles."""
+    seconds = np.asarray(seconds)
+    return {
+        "rows": rows,
+        "runs": len(seconds),
+        "rows_per_s": round(rows / float(np.median(seconds)), 1),
+        "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(seconds, 99)) * 1000, 3),
+    }
+
+
+def timed(fn, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def repeats_for(rows, budget_rows=2_000_000, most=7):
+    return max(1, min(most, budget_rows // max(rows, 1)))
+
+
+# ======================================================
+# Cases (each runs in a fresh process)
+# ======================================================
+def case_run_prediction(mission, scale):
+    path = scaled_csv(mission, scale)
+    df = pd.read_csv(path)
+    if mission == "kepler":
+        from kepler_model import run_prediction as run
+    elif mission == "k2":
+        from k2_model import run_prediction_k2 as run
+    else:
+        from tess_model import run_prediction_tess as run
+    run(df.head(10).copy())  # load the bundle outside the timed runs
+    return summarize(len(df), timed(lambda: run(df.copy()), repeats_for(len(df))))
+
+
+def case_predict_bulk(mission, scale):
+    from fastapi.testclient import TestClient
+    import main
+
+    path = scaled_csv(mission, scale)
+    rows = row_count(path)
+    with open(path, "rb") as f:
+        payload = f.read()
+    with TestClient(main.app) as client:
+        def call():
+            r = client.post("/predict", data={"mission": mission}, files={"file": (os.path.basename(path), payload)})
+            assert "error" not in r.json(), r.json()
+        call()
+        result = summarize(rows, timed(call, repeats_for(rows)))
+    result["bytes"] = len(payload)
+    return result
+
+
+def case_predict_single(mission, scale, concurrency=1):
+    from fastapi.testclient import TestClient
+    import main
+
+    source, label = DATASETS[mission]
+    df = pd.read_csv(scaled_csv(mission, 1)).drop(columns=[label]).head(SINGLE_ROW_REQUESTS)
+    rows = [{k: (None if pd.isna(v) else v) for k, v in rec.items()} for rec in df.to_dict(orient="records")]
+    latencies = []
+    lock = threading.Lock()
+
+    with TestClient(main.app) as client:
+        def call(row):
+            start = time.perf_counter()
+            r = client.post("/predict", json={"mission": mission, "features": row})
+            elapsed = time.perf_counter() - start
+            assert "error" not in r.json(), r.json()
+            with lock:
+                latencies.append(elapsed)
+
+        call(rows[0])
+        latencies.clear()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, rows))
+        wall = time.perf_counter() - start
+
+    result = summarize(1, latencies)
+    result["rows"] = len(rows)
+    result["rows_per_s"] = round(len(rows) / wall, 1)
+    result["concurrency"] = concurrency
+    return result
+
+
+def case_retrain(mission, scale, stream=False):
+    from fastapi.testclient import TestClient
+    import main
+
+    path = scaled_csv(mission, scale)
+    with TestClient(main.app) as client, open(path, "rb") as f:
+        # the file object itself, so the out-of-core case never holds the whole upload in this process
+        start = time.perf_counter()
+        r = client.post("/retrain", data={"mission": mission, "stream": str(stream).lower()},
+                        files={"file": (os.path.basename(path), f)})
+        seconds = time.perf_counter() - start
+    body = r.json()
+    assert "error" not in body, body
+    result = summarize(row_count(path), [seconds])
+    result["test_accuracy"] = body["metrics"]["test_accuracy"]
+    return result
+
+
+def case_insights(mission, scale):
+    from fastapi.testclient import TestClient
+    import insights
+    import main
+
+    insights.DATA_PATH = scaled_csv("kepler", scale)
+    rows = row_count(insights.DATA_PATH)
+    with TestClient(main.app) as client:
+        cold = timed(lambda: client.get("/api/researcher/insights"), 1)
+        warm = timed(lambda: client.get("/api/researcher/insights"), 50)
+    result = summarize(rows, cold)
+    result["warm_p50_ms"] = round(float(np.percentile(warm, 50)) * 1000, 3)
+    return result
+
+
+CASES = {
+    # name: (function, missions, largest scale it is run at)
+    "run_prediction": (case_run_prediction, ("kepler", "k2", "tess"), None),
+    "predict_bulk": (case_predict_bulk, ("kepler", "k2", "tess"), None),
+    "predict_single": (case_predict_single, ("kepler", "k2", "tess"), 1),
+    "predict_single_concurrent": (lambda m, s: case_predict_single(m, s, concurrency=8), ("kepler", "k2", "tess"), 1),
+    "retrain": (case_retrain, ("kepler", "k2"), 10),
+    "retrain_stream": (lambda m, s: case_retrain(m, s, stream=True), ("kepler", "k2"), 100),
+    "insights": (case_insights, ("kepler",), None),
+}
+
+
+class ChildRssSampler(threading.Thread):
+    """Largest RSS seen in any live child process (pool workers are never reaped before the case ends)."""
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        try:
+            import psutil
+        except ImportError:
+            return
+        me = psutil.Process()
+        while not self.stop.wait(self.interval):
+            for child in me.children(recursive=True):
+                try:
+                    self.peak = max(self.peak, child.memory_info().rss)
+                except psutil.Error:
+                    pass
+
+
+def run_case(name, mission, scale):
+    fn = CASES[name][0]
+    sampler = ChildRssSampler()
+    sampler.start()
+    try:
+        result = fn(mission, scale)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    sampler.stop.set()
+    sampler.join()
+    # ru_maxrss is in KiB on Linux; children = pool workers (training / batch jobs), largest one
+    children = max(sampler.peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    result["peak_child_rss_mb"] = round(children / 2**20, 1)
+    return result
+
+
+# ======================================================
+# Driver
+# ======================================================
+def environment():
+    versions = {}
+    for module in ("numpy", "pandas", "sklearn", "xgboost", "lightgbm", "fastapi", "pyarrow"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "versions": versions,
+    }
+
+
+def run_isolated(name, mission, scale, scratch):
+    # retraining publishes into a scratch dir, never into models/
+    env = dict(
+        os.environ,
+        MODEL_RELEASES_DIR=os.path.join(scratch, "releases"),
+        TRAIN_JOBS_DIR=os.path.join(scratch, "training"),
+        PREDICT_JOBS_DIR=os.path.join(scratch, "jobs"),
+    )
+    cmd = [sys.executable, os.path.abspath(__file__), "--case", name, "--mission", mission, "--scale", str(scale)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Per case and metric: relative change vs the baseline, flagged when worse than tolerance."""
+    report, regressions = {}, []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        report[key] = {}
+        for metric, direction in COMPARED_METRICS:
+            if metric not in current or not previous.get(metric):
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            regressed = change * direction < -tolerance
+            report[key][metric] = {"baseline": previous[metric], "current": current[metric],
+                                   "change": round(change, 4), "regressed": regressed}
+            if regressed:
+                regressions.append(f"{key} {metric}: {previous[metric]} -> {current[metric]} ({change:+.1%})")
+    return report, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="1,10", help="comma separated scale-up factors, e.g. 1,10,100,1000")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--out", help="also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative change counted as a regression")
+    # internal: run one case in this process
+    parser.add_argument("--case")
+    parser.add_argument("--mission")
+    parser.add_argument("--scale", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.mission, args.scale)))
+        return
+
+    scales = [int(s) for s in args.scales.split(",")]
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in args.cases.split(","):
+            _, missions, max_scale = CASES[name]
+            for mission in missions:
+                for scale in scales:
+                    if max_scale is not None and scale > max_scale:
+                        continue
+                    key = f"{name}/{mission}/x{scale}"
+                    print(f"running {key}", file=sys.stderr, flush=True)
+                    results[key] = run_isolated(name, mission, scale, scratch)
+
+    output = {"environment": environment(), "results": results}
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        output["comparison"], regressions = compare(results, baseline["results"], args.tolerance)
+        output["regressions"] = regressions
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(output, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Native xgboost/lightgbm predict_proba vs the compiled tree engine, per batch size.
+
+    cd backend && python benchmarks/bench_tree_engine.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import numpy as np
+import pandas as pd
+
+import tree_engine
+from model_registry import get_bundle
+
+BATCH_SIZES = [1, 8, 32, 128, 512]
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def kepler_inputs(bundle):
+    features = list(bundle["model"].feature_names_in_)
+    X = pd.read_csv("Data_DR25.csv", usecols=lambda c: c in features).reindex(columns=features)
+    return bundle["imputer"].transform(X)
+
+
+def k2_inputs(bundle):
+    features = bundle["features"]
+    X = pd.read_csv("Data_K2.csv", usecols=lambda c: c in features).reindex(columns=features)
+    return bundle["scaler"].transform(bundle["imputer"].transform(X))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for mission, make_inputs in (("kepler", kepler_inputs), ("k2", k2_inputs)):
+        bundle = get_bundle(mission)
+        X = np.asarray(make_inputs(bundle), dtype=np.float64)
+
+        start = time.perf_counter()
+        tree_engine.compiled(bundle)
+        compile_s = time.perf_counter() - start
+
+        r = results[mission] = {
+            "rows": len(X),
+            "trees": tree_engine.compiled(bundle).forest.n_trees,
+            "compile_s": compile_s,
+            "validation": tree_engine.validate(bundle, X),
+            "batches": {},
+        }
+        for n in BATCH_SIZES:
+            block = X[:n]
+            native = best_of(lambda: tree_engine.predict_proba(bundle, block, backend="native"), args.repeat)
+            fast = best_of(lambda: tree_engine.predict_proba(bundle, block, backend="compiled"), args.repeat)
+            r["batches"][n] = {
+                "native_ms": round(native * 1000, 3),
+                "compiled_ms": round(fast * 1000, 3),
+                "speedup": round(native / fast, 2),
+            }
+        native = best_of(lambda: tree_engine.predict_proba(bundle, X, backend="native"), 1)
+        fast = best_of(lambda: tree_engine.predict_proba(bundle, X, backend="compiled"), 1)
+        r["full_rows_per_s"] = {"native": round(len(X) / native), "compiled": round(len(X) / fast)}
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Memory of N serving workers: `uvicorn main:app --workers N` (every worker imports the libraries
+and loads the bundles itself) vs `python serve.py N` (loaded once by the supervisor, then forked).
+Each server is started on a free port with the bundles preloaded, sent bulk /predict requests for
+every mission, then measured per process: RSS, PSS (shared pages split between their users),
+and the totals. Results are printed as JSON.
+
+    cd backend && python benchmarks/bench_workers.py [--workers 1,2,4] [--requests 4]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from serve import child_pids, memory_report, process_memory
+
+UPLOADS = {"kepler": "Data_DR25.csv", "k2": "Data_K2.csv"}
+PRELOAD = "kepler,k2,tess"
+START_TIMEOUT = 180
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post_predict(port, mission, path):
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        data = f.read()
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="mission"\r\n\r\n{mission}\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        f"Content-Type: text/csv\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    conn.request("POST", "/predict", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    response = json.loads(conn.getresponse().read())
+    conn.close()
+    if "error" in response:
+        raise RuntimeError(response["error"])
+
+
+def tree_memory(root):
+    """memory_report of the server tree; uvicorn with a single worker serves from the root process itself."""
+    if child_pids(root):
+        return memory_report(root)
+    memory = process_memory(root) or {}
+    return {"supervisor": None, "workers": [{"pid": root, **memory}],
+            "total": {"processes": 1, "rss_bytes": memory.get("rss_bytes", 0), "pss_bytes": memory.get("pss_bytes", 0)}}
+
+
+def wait_settled(root, workers):
+    """Until every worker is up and the memory of the tree stops growing (startup preload done)."""
+    deadline = time.time() + START_TIMEOUT
+    last = None
+    while time.time() < deadline:
+        report = tree_memory(root)
+        total = report["total"]["rss_bytes"]
+        if len(report["workers"]) >= workers and last is not None and abs(total - last) < 0.005 * total:
+            return
+        last = total
+        time.sleep(1.0)
+    raise TimeoutError("server did not settle")
+
+
+def run(mode, workers, requests):
+    port = free_port()
+    env = dict(os.environ, SERVE_PRELOAD=PRELOAD, PRELOAD_ON_STARTUP="1", SERVE_LOG_LEVEL="warning")
+    if mode == "uvicorn":
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+               "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "serve.py", str(workers)]
+        env["SERVE_PORT"] = str(port)
+    server = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_settled(server.pid, workers)
+        start = time.perf_counter()
+        for _ in range(requests * workers):
+            for mission, path in UPLOADS.items():
+                post_predict(port, mission, path)
+        seconds = time.perf_counter() - start
+        report = tree_memory(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    mb = lambda b: round(b / 2**20, 1)
+    per_worker = report["workers"]
+    return {
+        "processes": report["total"]["processes"],
+        "total_rss_mb": mb(report["total"]["rss_bytes"]),
+        "total_pss_mb": mb(report["total"]["pss_bytes"]),
+        "supervisor_pss_mb": mb(report["supervisor"]["pss_bytes"]) if report["supervisor"] else None,
+        "worker_rss_mb": [mb(w["rss_bytes"]) for w in per_worker],
+        "worker_pss_mb": [mb(w["pss_bytes"]) for w in per_worker],
+        "worker_private_mb": [mb(w["private_bytes"]) for w in per_worker],
+        "requests": requests * workers * len(UPLOADS),
+        "seconds": round(seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--requests", type=int, default=4, help="bulk /predict requests per worker and mission")
+    args = parser.parse_args()
+
+    results = {}
+    for workers in [int(w) for w in args.workers.split(",")]:
+        case = {mode: run(mode, workers, args.requests) for mode in ("uvicorn", "serve")}
+        case["pss_saved_mb"] = round(case["uvicorn"]["total_pss_mb"] - case["serve"]["total_pss_mb"], 1)
+        results[f"{workers}_workers"] = case
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
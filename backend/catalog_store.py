@@ -0,0 +1,162 @@
+import csv
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.ipc as ipc
+except ImportError:  # without pyarrow every read falls back to pandas CSV parsing
+    pa = None
+
+# -------- CONFIG --------
+STORE_DIR = os.environ.get("CATALOG_STORE_DIR", "catalog")
+CATALOGS = {
+    "Data_DR25": "Data_DR25.csv",
+    "Data_K2": "Data_K2.csv",
+}
+BLOCK_BYTES = 16 * 1024 * 1024
+# ------------------------
+
+_lock = threading.Lock()
+
+
+def available():
+    return pa is not None
+
+
+def store_path(name):
+    return os.path.join(STORE_DIR, f"{name}.arrow")
+
+
+def _source_stamp(csv_path):
+    st = os.stat(csv_path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+# ======================================================
+# Ingest: CSV -> typed Arrow IPC file (uncompressed, so it can be memory-mapped)
+# ======================================================
+def _ingest_schema(source):
+    """Infer column types from the first block; ints become float64 so later NaNs still fit."""
+    reader = pacsv.open_csv(source, read_options=pacsv.ReadOptions(block_size=BLOCK_BYTES))
+    schema = reader.schema
+    reader.close()
+    return {
+        f.name: pa.float64() if pa.types.is_integer(f.type) or pa.types.is_null(f.type) else f.type
+        for f in schema
+    }
+
+
+def _fill_float_nulls(batch):
+    # NaN instead of a validity mask: float columns then convert to NumPy without copying
+    arrays = [
+        pc.fill_null(col, np.nan) if pa.types.is_floating(col.type) and col.null_count else col
+        for col in batch.columns
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=batch.schema)
+
+
+def ingest_csv(source, dest, metadata=None):
+    """Stream a CSV file into an Arrow IPC file at dest. Returns the row count."""
+    column_types = _ingest_schema(source)
+
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=BLOCK_BYTES),
+        convert_options=pacsv.ConvertOptions(column_types=column_types),
+    )
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    tmp = f"{dest}.tmp-{os.getpid()}"
+    rows = 0
+    with pa.OSFile(tmp, "wb") as sink:
+        with ipc.new_file(sink, reader.schema.with_metadata(metadata or {})) as writer:
+            for batch in reader:
+                writer.write_batch(_fill_float_nulls(batch))
+                rows += batch.num_rows
+    os.replace(tmp, dest)
+    return rows
+
+
+def ensure_catalog(name):
+    """Ingest a known catalog if its store file is missing or older than the CSV."""
+    csv_path = CATALOGS[name]
+    dest = store_path(name)
+    stamp = _source_stamp(csv_path)
+    with _lock:
+        if os.path.exists(dest):
+            with pa.memory_map(dest) as source:
+                meta = ipc.open_file(source).schema.metadata or {}
+            if meta.get(b"source_stamp", b"").decode() == stamp:
+                return dest
+        ingest_csv(csv_path, dest, {"source_stamp": stamp})
+    return dest
+
+
+# ======================================================
+# Reads (column-projected, zero-copy from the memory map)
+# ======================================================
+def read_table(name, columns=None):
+    dest = ensure_catalog(name)
+    source = pa.memory_map(dest)
+    table = ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table
+
+
+def read_arrays(name, columns):
+    """
+    {column: numpy array}. Float columns of a single-batch catalog are views on the mapped file.
+    Falls back to pandas CSV parsing (usecols) when pyarrow is not installed.
+    """
+    if not available():
+        df = pd.read_csv(CATALOGS[name], usecols=lambda c: c in columns)
+        return {c: df[c].to_numpy() for c in columns if c in df}
+    table = read_table(name, columns)
+    return {c: table.column(c).to_numpy() for c in table.column_names}
+
+
+def read_frame(name, columns=None):
+    if not available():
+        usecols = None if columns is None else (lambda c: c in columns)
+        return pd.read_csv(CATALOGS[name], usecols=usecols)
+    return read_table(name, columns).to_pandas(split_blocks=True)
+
+
+def iter_frames(name, columns=None, batch_rows=50_000):
+    """Batches of a stored catalog as DataFrames, reading only the requested columns."""
+    if not available():
+        usecols = None if columns is None else (lambda c: c in columns)
+        yield from pd.read_csv(CATALOGS[name], usecols=usecols, chunksize=batch_rows)
+        return
+    table = read_table(name, columns)
+    for batch in table.to_batches(max_chunksize=batch_rows):
+        yield batch.to_pandas(split_blocks=True)
+
+
+def read_csv_columns(source, columns=None):
+    """Column-projected parse of an uploaded CSV (multi-threaded Arrow parser when available)."""
+    if not available():
+        usecols = None if columns is None else (lambda c: c in columns)
+        return pd.read_csv(source, usecols=usecols)
+
+    # Arrow يقرأ الملف على دفعات (blocks) مباشرة من المصدر، فلا نحمّل الرفع كاملًا في الذاكرة
+    owned = not hasattr(source, "read")
+    stream = open(source, "rb") if owned else source
+    try:
+        convert = None
+        if columns is not None:
+            start = stream.tell()
+            first_line = stream.readline().decode("utf-8-sig").rstrip("\r\n")
+            stream.seek(start)
+            header = next(csv.reader([first_line]))
+            convert = pacsv.ConvertOptions(include_columns=[c for c in header if c in set(columns)])
+        return pacsv.read_csv(stream, convert_options=convert).to_pandas(split_blocks=True)
+    finally:
+        if owned:
+            stream.close()
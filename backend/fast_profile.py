@@ -0,0 +1,226 @@
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from sklearn.impute import SimpleImputer
+
+from model_export import LightGBMModel
+from model_registry import ModelBundle
+from preprocessing import SimpleImputation
+from tree_engine import xgb_served_trees
+
+# -------- CONFIG --------
+# "full" = the bundle as published, "fast" = a pruned copy of its ensemble for triage traffic
+# (same features, preprocessing and classes; fewer trees; float32 features unless a LightGBM
+# member needs them back in float64: it widens every row to double, float32 input only costs it time)
+PROFILES = ("full", "fast")
+# share of each member's trees kept: single trees for xgboost, whole boosting rounds for lightgbm
+# (its trees are tied to their class by position within the round)
+FAST_KEEP_TREES = float(os.environ.get("FAST_PROFILE_KEEP_TREES", 0.25))
+# "leaf" = the trees whose largest |leaf value| is smallest go first (they move the margins least),
+# "gain" = the trees with the smallest summed split gain go first
+FAST_RANK = os.environ.get("FAST_PROFILE_RANK", "leaf")
+# xgboost trees are cut at this depth, the cut nodes scoring their own weight; 0 = whole trees
+FAST_MAX_DEPTH = int(os.environ.get("FAST_PROFILE_MAX_DEPTH", 0))
+MODEL_NAMES = ("model", "xgb_model", "lgb_model")
+# ------------------------
+
+# الـ profile السريع: نفس الـ bundle بس بجزء من الشجر (اللي تأثيرها على الـ margin أقل بيتشال)
+# وبـ float32 (لو مفيش عضو LightGBM)؛ بيتبني مرة واحدة من الـ bundle الكامل عند أول طلب، والدقة مقابل السرعة
+# على Data_DR25.csv و Data_K2.csv في benchmarks/bench_fast_profile.py
+
+_build_lock = threading.Lock()
+
+
+class PrunedBundle(ModelBundle):
+    """A bundle whose ensemble members were pruned from a full bundle's; served under its release."""
+
+    profile = "fast"
+
+    def __init__(self, full, artifacts, pruning, build_seconds, size_bytes, dtype=None, skip_features=()):
+        super().__init__(full.mission, full.version, artifacts, full.paths, build_seconds, size_bytes, None, full.release)
+        self.stamp = full.stamp
+        self.pruning = pruning
+        self.dtype = dtype
+        self.skip_features = tuple(skip_features)
+
+    def info(self):
+        return {**super().info(), "pruning": self.pruning}
+
+
+def _top(scores, keep):
+    """Positions of the best round(keep * n) scores (at least one), in their original order."""
+    n = max(1, int(round(len(scores) * keep)))
+    return np.sort(np.argsort(-np.asarray(scores), kind="stable")[:n])
+
+
+# ======================================================
+# XGBoost: trees are dropped / cut in the model JSON
+# ======================================================
+def _xgb_score(tree, rank):
+    is_leaf = np.asarray(tree["left_children"]) == -1
+    if rank == "gain":
+        return float(np.sum(np.asarray(tree["loss_changes"])[~is_leaf]))
+    return float(np.max(np.abs(np.asarray(tree["split_conditions"])[is_leaf])))
+
+
+def _cap_depth(tree, max_depth):
+    """The tree with every node at max_depth turned into a leaf worth the node's own weight."""
+    if tree["categories_nodes"]:
+        raise ValueError("Categorical xgboost splits cannot be depth-capped")
+    left, right = tree["left_children"], tree["right_children"]
+    # breadth first, so the kept nodes keep xgboost's parent-before-children order
+    order, depth, leaf = [0], {0: 0}, []
+    for i in order:
+        cut = left[i] == -1 or depth[i] >= max_depth
+        leaf.append(cut)
+        if not cut:
+            for child in (left[i], right[i]):
+                depth[child] = depth[i] + 1
+                order.append(child)
+    position = {node: k for k, node in enumerate(order)}
+
+    out = dict(tree)
+    for key in ("base_weights", "loss_changes", "sum_hessian", "default_left", "split_type"):
+        out[key] = [tree[key][i] for i in order]
+    out["left_children"] = [-1 if cut else position[left[i]] for i, cut in zip(order, leaf)]
+    out["right_children"] = [-1 if cut else position[right[i]] for i, cut in zip(order, leaf)]
+    out["split_indices"] = [0 if cut else tree["split_indices"][i] for i, cut in zip(order, leaf)]
+    out["split_conditions"] = [tree["base_weights"][i] if cut else tree["split_conditions"][i] for i, cut in zip(order, leaf)]
+    parents = [tree["parents"][0]] * len(order)
+    for k, cut in enumerate(leaf):
+        if not cut:
+            parents[out["left_children"][k]] = parents[out["right_children"][k]] = k
+    out["parents"] = parents
+    out["tree_param"] = dict(tree["tree_param"], num_nodes=str(len(order)), num_deleted="0")
+    return out
+
+
+def prune_xgb(model, keep=FAST_KEEP_TREES, rank=FAST_RANK, max_depth=FAST_MAX_DEPTH):
+    """(pruned XGBClassifier, feature indices its trees split on, trees kept)."""
+    from xgboost import XGBClassifier
+
+    raw = json.loads(model.get_booster().save_raw("json"))
+    booster = raw["learner"]["gradient_booster"]
+    if booster["name"] != "gbtree":
+        raise ValueError(f"Only gbtree models can be pruned, not '{booster['name']}'")
+    gb = booster["model"]
+    # an early-stopped model only predicts with its rounds up to best_iteration: the rest is dropped
+    # before ranking, and the pruned copy predicts with every round it keeps
+    n_trees = xgb_served_trees(raw["learner"])
+    rounds = int(np.searchsorted(gb["iteration_indptr"], n_trees))
+    trees, info, indptr = gb["trees"][:n_trees], gb["tree_info"][:n_trees], gb["iteration_indptr"][:rounds + 1]
+    for attr in ("best_iteration", "best_score"):
+        raw["learner"].get("attributes", {}).pop(attr, None)
+
+    kept = _top([_xgb_score(t, rank) for t in trees], keep)
+    # a boosting round may lose all its trees; iteration_indptr keeps it as an empty range
+    rounds = np.searchsorted(indptr, kept, side="right") - 1
+    gb["iteration_indptr"] = np.concatenate([[0], np.cumsum(np.bincount(rounds, minlength=len(indptr) - 1))]).tolist()
+    gb["trees"] = [dict(_cap_depth(trees[i], max_depth) if max_depth else trees[i], id=n) for n, i in enumerate(kept)]
+    gb["tree_info"] = [info[i] for i in kept]
+    gb["gbtree_model_param"]["num_trees"] = str(len(kept))
+
+    used = {s for t in gb["trees"] for s, child in zip(t["split_indices"], t["left_children"]) if child != -1}
+    pruned = XGBClassifier()
+    pruned.load_model(bytearray(json.dumps(raw).encode()))
+    return pruned, used, len(kept)
+
+
+# ======================================================
+# LightGBM: whole rounds are dropped from the text model
+# ======================================================
+_LGB_TREE = re.compile(r"(?m)^Tree=\d+$")
+
+
+def _lgb_values(block, key):
+    match = re.search(rf"(?m)^{key}=(.*)$", block)
+    return np.array(match.group(1).split(), dtype=np.float64) if match else np.zeros(0)
+
+
+def prune_lgb(model, keep=FAST_KEEP_TREES, rank=FAST_RANK):
+    """(pruned LightGBMModel, feature indices its trees split on, trees kept)."""
+    import lightgbm
+
+    text = model.booster_.model_to_string()
+    start, end = _LGB_TREE.search(text).start(), text.index("end of trees")
+    head, tail = text[:start], text[end:]
+    blocks = re.split(r"(?m)^(?=Tree=\d+$)", text[start:end])[1:]
+    per_round = int(re.search(r"(?m)^num_tree_per_iteration=(\d+)$", head).group(1))
+
+    if rank == "gain":
+        scores = [float(_lgb_values(b, "split_gain").sum()) for b in blocks]
+    else:
+        scores = [float(np.abs(_lgb_values(b, "leaf_value")).max()) for b in blocks]
+    kept = _top(np.reshape(scores, (-1, per_round)).max(axis=1), keep)
+    trees = [_LGB_TREE.sub(f"Tree={n * per_round + k}", blocks[r * per_round + k], count=1)
+             for n, r in enumerate(kept) for k in range(per_round)]
+    # tree_sizes only speeds up parsing and no longer matches: LightGBM reads the trees in order without it
+    head = re.sub(r"(?m)^tree_sizes=.*\n", "", head)
+
+    used = {int(f) for t in trees for f in _lgb_values(t, "split_feature")}
+    booster = lightgbm.Booster(model_str=head + "".join(trees) + tail)
+    return LightGBMModel(booster, model.classes_), used, len(trees)
+
+
+# ======================================================
+# Profiles
+# ======================================================
+def _model_bytes(model):
+    if hasattr(model, "get_booster"):
+        return len(model.get_booster().save_raw("ubj"))
+    return len(model.booster_.model_to_string())
+
+
+def _columnwise(imputer):
+    """True when every column is imputed from its own statistic (so unread columns can stay unfilled)."""
+    return imputer is None or isinstance(imputer, (SimpleImputer, SimpleImputation))
+
+
+def prune(bundle, keep=FAST_KEEP_TREES, rank=FAST_RANK, max_depth=FAST_MAX_DEPTH):
+    """A PrunedBundle of bundle: every ensemble member keeps its top `keep` share of trees."""
+    if rank not in ("leaf", "gain"):
+        raise ValueError(f"Unknown tree ranking '{rank}'. Available: ['leaf', 'gain']")
+    if not 0 < keep <= 1:
+        raise ValueError("keep must be in (0, 1]")
+    start = time.perf_counter()
+    # the pipeline and compiled engine are not artifacts: the pruned copy builds its own
+    artifacts = dict(bundle.artifacts)
+    used, trees, size_bytes, dtype = set(), {}, 0, np.float32
+    for name in MODEL_NAMES:
+        model = artifacts.get(name)
+        if model is None:
+            continue
+        if hasattr(model, "get_booster"):
+            artifacts[name], features, n = prune_xgb(model, keep, rank, max_depth)
+        else:
+            artifacts[name], features, n = prune_lgb(model, keep, rank)
+            dtype = np.float64
+        used |= features
+        trees[name] = n
+        size_bytes += _model_bytes(artifacts[name])
+
+    unused = [f for j, f in enumerate(bundle["features"]) if j not in used]
+    pruning = {"keep": keep, "rank": rank, "max_depth": max_depth or None, "trees": trees, "unused_features": unused}
+    skip = unused if _columnwise(bundle.get("imputer")) else ()
+    return PrunedBundle(bundle, artifacts, pruning, time.perf_counter() - start, size_bytes, dtype, skip)
+
+
+def fast_bundle(bundle):
+    """Prune a bundle once and keep the copy on it (a new release is a new bundle, pruned anew)."""
+    pruned = bundle._fast
+    if pruned is None:
+        with _build_lock:
+            pruned = bundle._fast
+            if pruned is None:
+                pruned = bundle._fast = prune(bundle)
+    return pruned
+
+
+def profile_bundle(bundle, profile):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}'. Available: {list(PROFILES)}")
+    return bundle if profile == "full" else fast_bundle(bundle)
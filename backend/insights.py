@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import catalog_store
+from instrumentation import inc
+
+# -------- CONFIG --------
+DATA_PATH = "Data_DR25.csv"
+TOP_N = 20
+REQUIRED_COLUMNS = ["koi_prad", "koi_insol"]
+# an append-only refresh needs the whole old file unchanged: its SHA-1 is checked (read in blocks
+# of this size, no parsing) before only the new rows are folded in
+HASH_BLOCK_BYTES = 1024 * 1024
+# ------------------------
+
+PLANET_TYPES = np.array(["Unknown", "Rocky / Earth-like", "Super-Earth", "Mini-Neptune", "Gas Giant"], dtype=object)
+
+_lock = threading.Lock()
+_cache = {}
+
+
+# ======================================================
+# Aggregates (mergeable, so appended rows can be folded in)
+# ======================================================
+def _empty_summary():
+    return {
+        "total_rows": 0,
+        "type_counts": np.zeros(len(PLANET_TYPES), dtype=np.int64),
+        "temp_min": np.inf,
+        "temp_max": -np.inf,
+        "temp_sum": 0.0,
+        "temp_count": 0,
+        # (row index, koi_prad, koi_insol, score) of the best habitable candidates so far
+        "top": np.empty((0, 4)),
+    }
+
+
+def _fold(summary, prad, insol):
+    """Add a block of rows (already in file order) to the running summary."""
+    offset = summary["total_rows"]
+    n = len(prad)
+
+    # planet type, vectorized (same bins as the old per-row classify_planet_type)
+    codes = np.select(
+        [np.isnan(prad), prad < 1.5, prad < 2.5, prad < 4],
+        [0, 1, 2, 3],
+        default=4,
+    )
+    summary["type_counts"] += np.bincount(codes, minlength=len(PLANET_TYPES))
+
+    with np.errstate(invalid="ignore"):
+        temp = 278 * (insol ** 0.25)
+    temp = temp[~np.isnan(temp)]
+    if len(temp):
+        summary["temp_min"] = min(summary["temp_min"], float(temp.min()))
+        summary["temp_max"] = max(summary["temp_max"], float(temp.max()))
+        summary["temp_sum"] += float(temp.sum())
+        summary["temp_count"] += len(temp)
+
+    habitable = (prad >= 0.8) & (prad <= 1.5) & (insol >= 0.25) & (insol <= 2.0)
+    idx = np.flatnonzero(habitable)
+    h_prad, h_insol = prad[idx], insol[idx]
+    score = (1 - abs(1 - h_insol)) * 0.6 + (1.5 - abs(1 - h_prad)) * 0.4
+    candidates = np.vstack([summary["top"], np.column_stack([idx + offset, h_prad, h_insol, score])])
+    # highest score first, earlier rows win ties (same as nlargest(keep="first"))
+    order = np.lexsort((candidates[:, 0], -candidates[:, 3]))[:TOP_N]
+    summary["top"] = candidates[order]
+
+    summary["total_rows"] += n
+    return summary
+
+
+def _payload(summary):
+    order = np.argsort(-summary["type_counts"], kind="stable")
+    type_counts = [
+        {"type": PLANET_TYPES[i], "count": int(summary["type_counts"][i])}
+        for i in order if summary["type_counts"][i] > 0
+    ]
+    has_temp = summary["temp_count"] > 0
+    return {
+        "total_rows": summary["total_rows"],
+        "planet_types": type_counts,
+        "temperature_range": {
+            "min": summary["temp_min"] if has_temp else None,
+            "max": summary["temp_max"] if has_temp else None,
+            "mean": summary["temp_sum"] / summary["temp_count"] if has_temp else None,
+        },
+        "top_habitable": [
+            {
+                "planet_id": f"Candidate_{int(row[0]) + 1}",
+                "koi_prad": float(row[1]),
+                "koi_insol": float(row[2]),
+                "habitability_score": float(row[3]),
+            }
+            for row in summary["top"]
+        ],
+    }
+
+
+# ======================================================
+# File state
+# ======================================================
+def _hash_bytes(path, start, end, digest=None):
+    """digest (a new SHA-1 by default) updated with bytes [start, end) of the file, and whether they end with a newline."""
+    digest = digest or hashlib.sha1()
+    last = b""
+    with open(path, "rb") as f:
+        f.seek(start)
+        while start < end:
+            block = f.read(min(HASH_BLOCK_BYTES, end - start))
+            if not block:
+                break
+            digest.update(block)
+            last = block
+            start += len(block)
+    return digest, last.endswith(b"\n")
+
+
+def _read_columns(path, offset=0, columns=None):
+    if offset == 0 and catalog_store.available() and path == catalog_store.CATALOGS["Data_DR25"]:
+        arrays = catalog_store.read_arrays("Data_DR25", REQUIRED_COLUMNS)
+        return arrays["koi_prad"].astype(float, copy=False), arrays["koi_insol"].astype(float, copy=False)
+    if offset == 0:
+        df = pd.read_csv(path, usecols=lambda c: c in REQUIRED_COLUMNS)
+    else:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            df = pd.read_csv(f, header=None, names=columns, usecols=REQUIRED_COLUMNS)
+    return df["koi_prad"].to_numpy(dtype=float), df["koi_insol"].to_numpy(dtype=float)
+
+
+def get_insights(path=None):
+    """
+    Returns (payload, etag). The summary is recomputed only when the file changes,
+    and only the appended rows are read when the file just grew.
+    """
+    path = path or DATA_PATH
+    if not os.path.exists(path):
+        return {"error": f"{os.path.basename(path)} not found on server"}, None
+
+    stat = os.stat(path)
+    with _lock:
+        entry = _cache.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            inc("insights_cache_total", result="hit")
+            return entry["payload"], entry["etag"]
+
+        columns = list(pd.read_csv(path, nrows=0).columns)
+        if any(c not in columns for c in REQUIRED_COLUMNS):
+            return {"error": "Missing required columns"}, None
+
+        # appended = the old bytes are all still there, unchanged (a rewrite that also edits an
+        # earlier row fails the check); the hash then runs on over the new bytes only
+        prefix = None
+        if (entry is not None and entry["columns"] == columns and entry["ends_with_newline"]
+                and stat.st_size > entry["size"]):
+            prefix, _ = _hash_bytes(path, 0, entry["size"])
+        appended = prefix is not None and prefix.hexdigest() == entry["sha1"]
+        inc("insights_cache_total", result="append" if appended else "miss")
+        if appended:
+            previous = dict(entry["summary"], type_counts=entry["summary"]["type_counts"].copy())
+            summary = _fold(previous, *_read_columns(path, entry["size"], columns))
+            digest, ends_with_newline = _hash_bytes(path, entry["size"], stat.st_size, prefix)
+        else:
+            summary = _fold(_empty_summary(), *_read_columns(path))
+            digest, ends_with_newline = _hash_bytes(path, 0, stat.st_size)
+
+        sha1 = digest.hexdigest()
+        payload = _payload(summary)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}-{sha1[:12]}"'
+        _cache[path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "columns": columns,
+            "sha1": sha1,
+            "ends_with_newline": ends_with_newline,
+            "summary": summary,
+            "payload": payload,
+            "etag": etag,
+        }
+        return payload, etag
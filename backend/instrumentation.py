@@ -0,0 +1,169 @@
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+
+# -------- CONFIG --------
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# a request carrying this header gets a Server-Timing response header with its stage breakdown
+PROFILE_HEADER = "X-Profile"
+METRIC_PREFIX = "exoplanet_"
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DESCRIPTIONS = {
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route"),
+    "stage_duration_seconds": ("histogram", "Time spent in one pipeline stage (parse, impute, predict, ...)"),
+    "model_load_seconds": ("histogram", "Time to load a model bundle from disk"),
+    "rows_processed_total": ("counter", "Rows scored by the models"),
+    "bytes_parsed_total": ("counter", "CSV bytes parsed from uploads"),
+    "errors_total": ("counter", "Errors caught and returned as {\"error\": ...}"),
+    "insights_cache_total": ("counter", "Researcher insights cache lookups"),
+    "prediction_cache_total": ("counter", "Rows looked up in the prediction cache, by result"),
+}
+# ------------------------
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+_collectors = []
+# stage -> seconds for the current request, only set while it is being profiled
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+# ======================================================
+# Recording
+# ======================================================
+def inc(name, value=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] += value
+
+
+def observe(name, seconds, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            # [count per bucket..., +Inf count, sum]
+            hist = _histograms[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += seconds
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "profile", "start")
+
+    def __init__(self, stage, labels, profile):
+        self.stage = stage
+        self.labels = labels
+        self.profile = profile
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        observe("stage_duration_seconds", elapsed, stage=self.stage, **self.labels)
+        if self.profile is not None:
+            self.profile[self.stage] = self.profile.get(self.stage, 0.0) + elapsed
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage, **labels):
+    """Time a block as one pipeline stage: `with span("impute", mission="k2"): ...`"""
+    profile = _profile.get()
+    if not METRICS_ENABLED and profile is None:
+        return _NO_SPAN
+    return _Span(stage, labels, profile)
+
+
+# ======================================================
+# Per-request profiles
+# ======================================================
+def start_profile():
+    """Collect the stages of the current request (and the threads it hands work to)."""
+    profile = {}
+    _profile.set(profile)
+    return profile
+
+
+def server_timing(profile, total=None):
+    parts = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in profile.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+# ======================================================
+# Prometheus text format
+# ======================================================
+def register_collector(fn):
+    """fn() -> [(name, type, help, labels dict, value)] read at scrape time (cache stats, ...)."""
+    _collectors.append(fn)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    families = defaultdict(list)
+    for (name, labels), value in counters.items():
+        families[name].append(f"{METRIC_PREFIX}{name}{_labels(labels)} {value:g}")
+    for (name, labels), hist in histograms.items():
+        full = METRIC_PREFIX + name
+        for bound, count in zip(DURATION_BUCKETS, hist):
+            families[name].append(f"{full}_bucket{_labels(labels, [('le', f'{bound:g}')])} {count}")
+        families[name].append(f"{full}_bucket{_labels(labels, [('le', '+Inf')])} {hist[-2]}")
+        families[name].append(f"{full}_count{_labels(labels)} {hist[-2]}")
+        families[name].append(f"{full}_sum{_labels(labels)} {hist[-1]:.6f}")
+
+    described = dict(DESCRIPTIONS)
+    for collect in _collectors:
+        for name, kind, help_text, labels, value in collect():
+            described.setdefault(name, (kind, help_text))
+            families[name].append(f"{METRIC_PREFIX}{name}{_labels(sorted(labels.items()))} {value:g}")
+
+    lines = []
+    for name in sorted(families):
+        kind, help_text = described.get(name, ("untyped", name))
+        lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+        lines.extend(families[name])
+    return "\n".join(lines) + "\n"
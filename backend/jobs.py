@@ -0,0 +1,273 @@
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics import MetricsAccumulator
+from model_registry import get_bundle
+from streaming import BATCH_PREDICTORS, CHUNK_ROWS, PredictionSummary, prob_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet downloads are optional
+    pa = pq = None
+
+# -------- CONFIG --------
+JOBS_DIR = os.environ.get("PREDICT_JOBS_DIR", "jobs")
+# leave one core to the API process so interactive requests are not starved
+JOB_WORKERS = int(os.environ.get("PREDICT_JOB_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+MAX_INFLIGHT_CHUNKS = 2 * JOB_WORKERS
+# every update of a job is also written to <job dir>/status.json, so whichever serve.py worker
+# a /jobs/{id} or /results/{id} request lands on answers for it (the job runs in the one it was sent to)
+STATUS_FILE = "status.json"
+# finished jobs kept (their dir with the NDJSON / Parquet results, and their record in memory);
+# the oldest ones past this are removed when a new job is submitted
+JOBS_KEPT = int(os.environ.get("PREDICT_JOBS_KEPT", 32))
+# ------------------------
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: never fork the threaded API process
+            _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def score_chunk(mission, version, chunk):
+    """
+    Runs inside a pool worker: the worker's own registry loads the bundle once and keeps it.
+    The chunk's metrics come back as a mergeable accumulator instead of its label arrays.
+    """
+    bundle = get_bundle(mission, version)
+    df_out, y_true, y_pred, probs = BATCH_PREDICTORS[mission](chunk, bundle)
+    classes = bundle["label_encoder"].classes_
+    for name, col in zip(prob_columns(classes), np.asarray(probs).T):
+        df_out[name] = col
+    return df_out, MetricsAccumulator(len(classes)).update(y_true, y_pred, probs)
+
+
+# ======================================================
+# Job records
+# ======================================================
+def _new_job(job_id, mission, version, input_path):
+    job = {
+        "job_id": job_id,
+        "mission": mission,
+        "version": version,
+        "status": "queued",
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "rows_done": 0,
+        "bytes_done": 0,
+        "bytes_total": os.path.getsize(input_path),
+        "error": None,
+        "result": None,
+        "dir": os.path.dirname(input_path),
+    }
+    with _jobs_lock:
+        _jobs[job_id] = job
+        _write_status(job)
+    return job
+
+
+def _update(job, **fields):
+    with _jobs_lock:
+        job.update(fields)
+        _write_status(job)
+
+
+def _plain(value):
+    # numpy scalars in the metrics / sample rows
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def _write_status(job):
+    """Replace the job's status.json atomically: readers in other workers never see half a file."""
+    path = os.path.join(job["dir"], STATUS_FILE)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(job, f, default=_plain)
+    os.replace(tmp, path)
+
+
+def _read_status(job_id):
+    if not _JOB_ID.fullmatch(job_id):
+        return None
+    try:
+        with open(os.path.join(JOBS_DIR, job_id, STATUS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        return None
+
+
+def get_job(job_id):
+    """The job record: from memory in the worker running it, from its status.json in the others."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+    return _read_status(job_id)
+
+
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return None
+    total = job["bytes_total"] or 1
+    status = {k: v for k, v in job.items() if k not in ("dir", "result")}
+    status["progress"] = 1.0 if job["status"] == "done" else round(min(job["bytes_done"] / total, 1.0), 4)
+    if job["result"] is not None:
+        status.update(job["result"])
+    status["formats"] = available_formats(job)
+    return status
+
+
+def result_path(job, fmt):
+    return os.path.join(job["dir"], f"predictions.{fmt}")
+
+
+def available_formats(job):
+    if job["status"] != "done":
+        return []
+    return [fmt for fmt in ("ndjson", "parquet") if os.path.exists(result_path(job, fmt))]
+
+
+# ======================================================
+# Submit / run
+# ======================================================
+def submit_job(fileobj, mission, version=None, chunk_rows=CHUNK_ROWS):
+    mission = mission.lower()
+    if mission not in BATCH_PREDICTORS:
+        raise ValueError(f"Batch jobs are not supported for mission '{mission}'")
+
+    _prune_jobs()
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    input_path = os.path.join(job_dir, "input.csv")
+    with open(input_path, "wb") as f:
+        shutil.copyfileobj(fileobj, f, 1024 * 1024)
+
+    job = _new_job(job_id, mission, version, input_path)
+    threading.Thread(target=_run_job, args=(job, input_path, chunk_rows), daemon=True).start()
+    return job_id
+
+
+def _prune_jobs():
+    """Forget the oldest finished jobs past JOBS_KEPT: their dirs on disk (any worker's), their records in memory."""
+    with _jobs_lock:
+        finished = sorted((j for j in _jobs.values() if j["finished_at"] is not None), key=lambda j: j["finished_at"])
+        for job in finished[:max(0, len(finished) - JOBS_KEPT)]:
+            del _jobs[job["job_id"]]
+    if not os.path.isdir(JOBS_DIR):
+        return
+    done = []
+    for entry in os.scandir(JOBS_DIR):
+        status = _read_status(entry.name) if entry.is_dir() else None
+        if status is not None and status["finished_at"] is not None:
+            done.append((status["finished_at"], entry.path))
+    for _, path in sorted(done)[:max(0, len(done) - JOBS_KEPT)]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _run_job(job, input_path, chunk_rows):
+    _update(job, status="running", started_at=time.time())
+    mission, version = job["mission"], job["version"]
+    ndjson_path = result_path(job, "ndjson")
+    parquet_path = result_path(job, "parquet")
+    writer = None
+    parquet_ok = pq is not None
+
+    try:
+        executor = _get_executor()
+        n_classes = len(get_bundle(mission, version)["label_encoder"].classes_)
+        summary = PredictionSummary(mission, n_classes)
+        inflight = deque()
+
+        with open(input_path, "rb") as src, open(ndjson_path, "w", encoding="utf-8") as out:
+
+            def drain_one():
+                nonlocal writer, parquet_ok
+                df_out, metrics = inflight.popleft().result()
+                summary.merge(df_out, metrics)
+                out.write(df_out.to_json(orient="records", lines=True))
+                if parquet_ok:
+                    try:
+                        writer = _write_parquet(writer, parquet_path, df_out)
+                    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                        # column types drifted between chunks: NDJSON is still complete
+                        parquet_ok = False
+                        if writer is not None:
+                            writer.close()
+                            writer = None
+                        if os.path.exists(parquet_path):
+                            os.remove(parquet_path)
+                _update(job, rows_done=summary.rows)
+
+            # chunks stay in order; at most MAX_INFLIGHT_CHUNKS are held in memory
+            for chunk in pd.read_csv(src, chunksize=chunk_rows):
+                inflight.append(executor.submit(score_chunk, mission, version, chunk))
+                _update(job, bytes_done=src.tell())
+                if len(inflight) >= MAX_INFLIGHT_CHUNKS:
+                    drain_one()
+            while inflight:
+                drain_one()
+
+        if writer is not None:
+            writer.close()
+        result = summary.result()
+        result.pop("mission")
+        _update(job, status="done", finished_at=time.time(), bytes_done=job["bytes_total"], result=result)
+
+    except Exception as e:
+        if writer is not None:
+            writer.close()
+        for path in (ndjson_path, parquet_path):
+            if os.path.exists(path):
+                os.remove(path)
+        _update(job, status="failed", finished_at=time.time(), error=str(e))
+    finally:
+        if os.path.exists(input_path):
+            os.remove(input_path)
+
+
+def _write_parquet(writer, path, df_out):
+    # integer columns may turn into floats in a later chunk with NaNs, so store them as floats from the start
+    int_cols = df_out.select_dtypes(include=["integer"]).columns
+    df_out = df_out.astype({c: "float64" for c in int_cols})
+    table = pa.Table.from_pandas(df_out, preserve_index=False)
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema)
+    else:
+        table = table.cast(writer.schema)
+    writer.write_table(table)
+    return writer
+
+
+def iter_ndjson(job, chunk_bytes=1024 * 1024):
+    with open(result_path(job, "ndjson"), "rb") as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            yield block
@@ -1,161 +1,522 @@
-from fastapi import FastAPI, UploadFile, File, Form, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-import pandas as pd
-import numpy as np
-import io, os, json
-
-# ✅ Import models
-from tess_model import predict_tess
-from kepler_model import run_prediction as run_kepler, retrain_kepler, OUTPUT_PATH as KEPLER_OUTPUT
-from k2_model import run_prediction_k2 as run_k2, retrain_k2, OUTPUT_PATH as K2_OUTPUT
-
-app = FastAPI()
-
-# ✅ Enable CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# ======================================================
-# 🔮 Prediction Endpoint (File or JSON)
-# ======================================================
-@app.post("/predict")
-async def predict(request: Request, mission: str = Form(None), file: UploadFile = File(None), features: str = Form(None)):
-    try:
-        # ---------- Handle input ----------
-        if file:
-            contents = await file.read()
-            df = pd.read_csv(io.BytesIO(contents))
-        elif features:  # if sent as form-data string
-            feat_dict = json.loads(features)
-            df = pd.DataFrame([feat_dict])
-        elif request.headers.get("content-type", "").startswith("application/json"):
-            body = await request.json()
-            mission = body.get("mission")
-            df = pd.DataFrame([body.get("features", {})])
-        else:
-            return {"error": "No valid input provided"}
-
-        if not mission:
-            return {"error": "Mission not specified"}
-
-        # ---------- Run selected model ----------
-        mission = mission.lower()
-        if mission == "kepler":
-             df_out, metrics = run_kepler(df)
-        elif mission == "k2":
-             df_out, metrics = run_k2(df)
-        elif mission == "tess":
-             df_out, counts = predict_tess(df)  # Direct call to the predict_tess function
-             metrics = {}  # No need for metrics for TESS in this version
-        else:
-             return {"error": f"Mission '{mission}' not supported"}
-
-        # ---------- Format output ----------
-        counts = df_out["prediction"].astype(str).str.title().value_counts().to_dict()
-        sample = df_out.head(10).replace({np.nan: None}).to_dict(orient="records")
-
-        return {
-            "mission": mission,
-            "counts": counts,
-            "metrics": metrics or {},
-            "sample": sample
-        }
-
-    except Exception as e:
-        return {"error": f"Prediction failed: {str(e)}"}
-# ======================================================
-# 🧠 Retrain Endpoint
-# ======================================================
-@app.post("/retrain")
-async def retrain(mission: str = Form(...), file: UploadFile = File(...)):
-    contents = await file.read()
-    df = pd.read_csv(io.BytesIO(contents))
-
-    if mission.lower() == "kepler":
-        result = retrain_kepler(df)
-    elif mission.lower() == "k2":
-        result = retrain_k2(df)
-    elif mission == "tess":
-        return {"error": "Retraining is not supported for TESS, use the pre-trained model."}
-    else:
-        return {"error": f"Mission '{mission}' not supported"}
-
-    return result
-
-# ======================================================
-# 💾 Model Download
-# ======================================================
-@app.get("/download_model")
-async def download_model(mission: str = "kepler", retrained: bool = False):
-    mission = mission.lower()
-
-    if mission == "kepler":
-        path = "models/KeplerRetrained/xgb_kepler_retrained.pkl" if retrained else "models/Kepler/xgb_kepler.pkl"
-    elif mission == "k2":
-        path = "models/K2Retrained/xgb_k2_retrained.pkl" if retrained else "models/K2/xgb_k2.pkl"
-    elif mission == "tess":
-        path = "models/Tess_Model.pkl"
-    else:
-        return {"error": f"Mission '{mission}' not supported"}
-
-    if os.path.exists(path):
-        return FileResponse(path, filename=os.path.basename(path))
-    return {"error": "Model not found"}
-
-# ======================================================
-# 🌍 Researcher Insights (unchanged)
-# ======================================================
-@app.get("/api/researcher/insights")
-def researcher_insights():
-    data_path = "Data_DR25.csv"
-    if not os.path.exists(data_path):
-        return {"error": "Data_DR25.csv not found on server"}
-
-    df = pd.read_csv(data_path)
-    if "koi_prad" not in df or "koi_insol" not in df:
-        return {"error": "Missing required columns"}
-
-    df["planet_id"] = [f"Candidate_{i+1}" for i in range(len(df))]
-    df["estimated_temp_K"] = 278 * (df["koi_insol"] ** 0.25)
-
-    def classify_planet_type(r):
-        if pd.isna(r): return "Unknown"
-        elif r < 1.5: return "Rocky / Earth-like"
-        elif r < 2.5: return "Super-Earth"
-        elif r < 4: return "Mini-Neptune"
-        else: return "Gas Giant"
-
-    df["planet_type"] = df["koi_prad"].apply(classify_planet_type)
-
-    habitable = df[(df["koi_prad"].between(0.8, 1.5)) & (df["koi_insol"].between(0.25, 2.0))].copy()
-    habitable["habitability_score"] = (
-        (1 - abs(1 - habitable["koi_insol"])) * 0.6 +
-        (1.5 - abs(1 - habitable["koi_prad"])) * 0.4
-    )
-
-    top20 = habitable.nlargest(20, "habitability_score")[
-        ["planet_id", "koi_prad", "koi_insol", "habitability_score"]
-    ]
-
-    type_counts = (
-        df["planet_type"].value_counts().reset_index()
-        .rename(columns={"index": "type", "planet_type": "count"})
-        .to_dict(orient="records")
-    )
-
-    return {
-        "total_rows": len(df),
-        "planet_types": type_counts,
-        "temperature_range": {
-            "min": float(df["estimated_temp_K"].min()),
-            "max": float(df["estimated_temp_K"].max()),
-            "mean": float(df["estimated_temp_K"].mean()),
-        },
-        "top_habitable": top20.to_dict(orient="records"),
-    }
\ No newline at end of file
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, Response, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+import os, sys, json
+
+from instrumentation import span, inc, observe, start_profile, server_timing, render as render_metrics, PROFILE_HEADER
+from serve import memory_report, preload, PRELOAD_ON_STARTUP
+from startup import deferred, modules_used, warmup, STARTUP_MODE, STARTUP_MODES
+
+# ✅ Models and libraries: imported by the warm-up (or on first use), not with the app,
+# so the app binds and answers health checks right away
+pd = deferred("pandas")
+tess_model = deferred("tess_model")
+kepler_model = deferred("kepler_model")
+k2_model = deferred("k2_model")
+model_registry = deferred("model_registry")
+fast_profile = deferred("fast_profile")
+streaming = deferred("streaming")
+jobs = deferred("jobs")
+batcher = deferred("batcher")
+prediction_cache = deferred("prediction_cache")
+insights = deferred("insights")
+catalog_store = deferred("catalog_store")
+result_query = deferred("result_query")
+# training-only (train_test_split, search, ...): inference workers import it on their first /retrain, if ever
+training = deferred("training", warm=False)
+# habitability scoring lives with its pipeline and the Streamlit app in ../Earth
+EARTH_DIR = os.environ.get("EARTH_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Earth"))
+sys.path.append(EARTH_DIR)
+habitability = deferred("habitability")
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI()
+
+# ✅ Enable CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Model-Format"],
+)
+
+if PRELOAD_ON_STARTUP:
+    # under serve.py the supervisor has already loaded them (every worker shares its copy)
+    warmup.add_task("preload", preload)
+
+
+@app.on_event("startup")
+async def start_warmup():
+    if STARTUP_MODE not in STARTUP_MODES:
+        raise ValueError(f"Unknown STARTUP_MODE '{STARTUP_MODE}'. Available: {list(STARTUP_MODES)}")
+    if STARTUP_MODE == "blocking":
+        await run_in_threadpool(warmup.run)
+    elif STARTUP_MODE == "background":
+        warmup.start()
+
+# ======================================================
+# 🚦 Health and readiness (answered while the warm-up runs)
+# ======================================================
+HEALTH_PATHS = ("/healthz", "/readyz")
+
+
+def _route_modules(scope):
+    """The deferred modules of the endpoint this request is routed to that are not imported yet."""
+    for route in app.router.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return [m for m in modules_used(route.endpoint) if not m.loaded]
+    return []
+
+
+def _load_modules(modules):
+    for module in modules:
+        module.load()
+
+
+@app.middleware("http")
+async def wait_for_warmup(request: Request, call_next):
+    # other requests wait for the warm-up in a worker thread, never on the event loop; in lazy mode
+    # there is none, a route's first request imports only the modules that route uses
+    if not warmup.ready and request.url.path not in HEALTH_PATHS:
+        if STARTUP_MODE == "lazy":
+            modules = _route_modules(request.scope)
+            if modules:
+                await run_in_threadpool(_load_modules, modules)
+        else:
+            await run_in_threadpool(warmup.run)
+    return await call_next(request)
+
+
+@app.get("/healthz")
+async def healthz():
+    # liveness: the process is up and its event loop answers, whatever the warm-up state
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    # readiness: 503 until the deferred modules are imported (and the models preloaded, if asked);
+    # in lazy mode there is nothing to wait for, the first request of each route pays for its imports
+    status = warmup.status()
+    ready = status["ready"] or (STARTUP_MODE == "lazy" and status["state"] != "failed")
+    return JSONResponse({**status, "ready": ready}, status_code=200 if ready else 503)
+
+# ======================================================
+# ⏱️ Request timing (+ per-stage breakdown when the request sends X-Profile)
+# ======================================================
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    profile = start_profile() if PROFILE_HEADER in request.headers else None
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    # route template (/jobs/{job_id}), not the raw path, so job ids don't become label values
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    observe("http_request_duration_seconds", elapsed, method=request.method, route=route, status=response.status_code)
+    if profile is not None:
+        response.headers["Server-Timing"] = server_timing(profile, elapsed)
+    return response
+
+# ======================================================
+# 🔮 Prediction Endpoint (File or JSON)
+# ======================================================
+@app.post("/predict")
+async def predict(request: Request, mission: str = Form(None), file: UploadFile = File(None), features: str = Form(None),
+                  version: str = Form(None), stream: bool = Form(False), chunk_rows: int = Form(None),
+                  profile: str = Form(None)):
+    # profile: "full" (default) or "fast" (pruned ensemble in float32, for triage traffic)
+    try:
+        row = None  # single planet (manual input)
+
+        # ---------- Handle input ----------
+        if file:
+            # Big uploads (or stream=true) are scored chunk by chunk straight from the spooled upload.
+            # Parsing and scoring run in worker threads: the event loop keeps serving the batcher,
+            # the health checks and every other request meanwhile
+            big_upload = (file.size or 0) > streaming.STREAM_THRESHOLD_BYTES
+            if mission and mission.lower() in streaming.BATCH_PREDICTORS and (stream or big_upload):
+                result = await run_in_threadpool(streaming.stream_predict, file.file, mission, version,
+                                                 chunk_rows or streaming.CHUNK_ROWS, profile=profile)
+                result.pop("rows")
+                return result
+            # the rest is parsed straight from the spooled upload, only the model's features, the label
+            # and the row identifiers (as /predict/multi); the bundle is loaded for its feature list
+            columns = None
+            if mission and mission.lower() in streaming.BATCH_PREDICTORS:
+                columns = await run_in_threadpool(streaming.multi_columns, [mission], {mission.lower(): version})
+            with span("csv_parse"):
+                df = await run_in_threadpool(catalog_store.read_csv_columns, file.file, columns)
+            inc("bytes_parsed_total", file.size or 0)
+        elif features:  # if sent as form-data string
+            feat_dict = json.loads(features)
+            row = feat_dict
+            df = pd.DataFrame([feat_dict])
+        elif request.headers.get("content-type", "").startswith("application/json"):
+            body = await request.json()
+            mission = body.get("mission")
+            version = body.get("version")
+            profile = body.get("profile")
+            row = body.get("features", {})
+            df = pd.DataFrame([row])
+        else:
+            return {"error": "No valid input provided"}
+
+        if not mission:
+            return {"error": "Mission not specified"}
+        if profile is not None and profile not in fast_profile.PROFILES:
+            return {"error": f"Unknown profile '{profile}'. Available: {list(fast_profile.PROFILES)}"}
+
+        # ---------- Run selected model ----------
+        mission = mission.lower()
+
+        # Concurrent single planets are scored together by the micro-batcher
+        if batcher.MICROBATCH_ENABLED and isinstance(row, dict) and mission in streaming.BATCH_PREDICTORS:
+            return await batcher.predict_row(mission, row, version, profile)
+
+        if mission == "kepler":
+             run = kepler_model.run_prediction
+        elif mission == "k2":
+             run = k2_model.run_prediction_k2
+        elif mission == "tess":
+             run = tess_model.run_prediction_tess
+        else:
+             return {"error": f"Mission '{mission}' not supported"}
+        df_out, metrics = await run_in_threadpool(run, df, version, profile)
+
+        # ---------- Format output ----------
+        with span("value_counts"):
+            counts = df_out["prediction"].astype(str).str.title().value_counts().to_dict()
+
+        # the full scored frame stays on the server: /results/{result_id}/... pages and aggregates it
+        result_id = None
+        if row is None:
+            result_id = await run_in_threadpool(result_query.result_store.register, df_out, mission=mission,
+                                                version=version, profile=profile, source="predict")
+
+        with span("serialize"):
+            meta = jsonable_encoder({"mission": mission, "profile": profile or "full", "counts": counts,
+                                     "metrics": metrics or {}, "result_id": result_id})
+            return Response(result_query.to_json(meta, df_out.head(10), key="sample"), media_type="application/json")
+
+    except Exception as e:
+        logger.exception("/predict failed")
+        inc("errors_total", where="predict")
+        return {"error": f"Prediction failed: {str(e)}"}
+# ======================================================
+# 🛰️ Score a stored mission catalog (memory-mapped, only the model columns are read)
+# ======================================================
+@app.get("/predict/catalog/{name}")
+def predict_stored_catalog(name: str, mission: str, version: str = None):
+    if name not in catalog_store.CATALOGS:
+        return {"error": f"Catalog '{name}' not found. Available: {list(catalog_store.CATALOGS)}"}
+    try:
+        result = streaming.predict_catalog(name, mission, version)
+    except Exception as e:
+        logger.exception("/predict/catalog failed")
+        inc("errors_total", where="predict_catalog")
+        return {"error": f"Prediction failed: {str(e)}"}
+    result.pop("rows")
+    return result
+
+# ======================================================
+# 🔭 One catalog, every mission (parsed once, missions scored in parallel)
+# ======================================================
+@app.post("/predict/multi")
+async def predict_multi_missions(file: UploadFile = File(...), missions: str = Form(None), versions: str = Form(None)):
+    # missions: "kepler,k2,tess" (default: all)، versions: JSON زي {"kepler": "KeplerRetrained"}
+    try:
+        mission_list = [m.strip().lower() for m in missions.split(",") if m.strip()] if missions else None
+        version_map = json.loads(versions) if versions else {}
+        # the missions' bundles are loaded (if cold) to learn their columns: off the event loop
+        columns = await run_in_threadpool(streaming.multi_columns, mission_list, version_map)
+        with span("csv_parse"):
+            df = await run_in_threadpool(catalog_store.read_csv_columns, file.file, columns)
+        result = await run_in_threadpool(streaming.predict_multi, df, mission_list, version_map)
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        logger.exception("/predict/multi failed")
+        inc("errors_total", where="predict_multi")
+        return {"error": f"Prediction failed: {str(e)}"}
+
+    table = result.pop("table").reset_index(names="row")
+    result["result_id"] = await run_in_threadpool(result_query.result_store.register, table, mission="multi",
+                                                  source="predict_multi")
+    with span("serialize"):
+        return Response(result_query.to_json(jsonable_encoder(result), table, key="table"), media_type="application/json")
+
+# ======================================================
+# 🌱 Habitability (the Earth KNN pipeline, same engine as the dashboard)
+# ======================================================
+@app.post("/predict/habitability")
+async def predict_habitability(request: Request, file: UploadFile = File(None), features: str = Form(None)):
+    # file: CSV من الكتالوج، features: كوكب واحد JSON، أو JSON body فيه "features" (dict أو list of dicts)
+    try:
+        if file:
+            with span("csv_parse"):
+                df = await run_in_threadpool(catalog_store.read_csv_columns, file.file)
+        elif features:
+            df = pd.DataFrame([json.loads(features)])
+        elif request.headers.get("content-type", "").startswith("application/json"):
+            rows = (await request.json()).get("features", {})
+            df = pd.DataFrame(rows if isinstance(rows, list) else [rows])
+        else:
+            return {"error": "No valid input provided"}
+
+        missing = habitability.missing_columns(df)
+        if missing:
+            return {"error": f"Missing required columns: {missing}", "required": habitability.FEATURE_COLS}
+        with span("habitability_score"):
+            df_out = await run_in_threadpool(lambda: habitability.score_frame(df, habitability.get_engine()))
+    except Exception as e:
+        logger.exception("/predict/habitability failed")
+        inc("errors_total", where="predict_habitability")
+        return {"error": f"Prediction failed: {str(e)}"}
+
+    result = habitability.summarize(df_out)
+    result["result_id"] = None
+    if file:
+        result["result_id"] = await run_in_threadpool(result_query.result_store.register, df_out,
+                                                      mission="habitability", source="predict")
+    with span("serialize"):
+        return JSONResponse(jsonable_encoder(result))
+
+# ======================================================
+# 🔎 Query a scored result (a bulk /predict upload or a finished job): pages, histograms, counts, top-K
+# ======================================================
+def _split(columns):
+    return [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+
+
+def _frame_response(meta, frame, format):
+    if format == "arrow":
+        headers = {f"X-Result-{k.replace('_', '-').title()}": str(v) for k, v in meta.items() if v is not None}
+        return Response(result_query.to_arrow(frame), media_type=result_query.ARROW_MEDIA_TYPE, headers=headers)
+    return Response(result_query.to_json(meta, frame), media_type="application/json")
+
+
+def _query(result_id, fn):
+    found = result_query.result_store.get(result_id)
+    if found is None:
+        return {"error": f"Result '{result_id}' not found"}
+    try:
+        with span("result_query"):
+            return fn(*found)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+@app.get("/results/{result_id}")
+def result_info(result_id: str):
+    return _query(result_id, result_query.describe)
+
+
+@app.get("/results/{result_id}/rows")
+def result_rows(result_id: str, cursor: str = None, limit: int = None, columns: str = None,
+                prediction: str = None, format: str = "json"):
+    # defaults (PAGE_ROWS, HISTOGRAM_BINS, TOP_K) come from result_query, imported after the routes are declared
+    return _query(result_id, lambda df, _: _frame_response(
+        *result_query.page(df, cursor, limit or result_query.PAGE_ROWS, _split(columns), prediction), format))
+
+
+@app.get("/results/{result_id}/histogram")
+def result_histogram(result_id: str, column: str, bins: int = None, min: float = None, max: float = None,
+                     prediction: str = None):
+    return _query(result_id, lambda df, _: result_query.histogram(
+        df, column, bins or result_query.HISTOGRAM_BINS, min, max, prediction))
+
+
+@app.get("/results/{result_id}/counts")
+def result_class_counts(result_id: str, column: str = "prediction"):
+    return _query(result_id, lambda df, _: result_query.counts(df, column))
+
+
+@app.get("/results/{result_id}/top")
+def result_top(result_id: str, column: str, k: int = None, columns: str = None, prediction: str = None,
+               format: str = "json"):
+    return _query(result_id, lambda df, _: _frame_response(
+        *result_query.top_k(df, column, k or result_query.TOP_K, _split(columns), prediction), format))
+
+# ======================================================
+# 🗂️ Batch Prediction Jobs (process pool, full results download)
+# ======================================================
+@app.post("/jobs")
+async def create_job(mission: str = Form(...), file: UploadFile = File(...), version: str = Form(None),
+                     chunk_rows: int = Form(None)):
+    try:
+        job_id = await run_in_threadpool(jobs.submit_job, file.file, mission, version, chunk_rows or streaming.CHUNK_ROWS)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    status = jobs.job_status(job_id)
+    if status is None:
+        return {"error": f"Job '{job_id}' not found"}
+    return status
+
+
+@app.get("/jobs/{job_id}/results")
+def download_job_results(job_id: str, format: str = "ndjson"):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return {"error": f"Job '{job_id}' not found"}
+    if job["status"] != "done":
+        return {"error": f"Job is {job['status']}", "status": job["status"]}
+    if format not in jobs.available_formats(job):
+        return {"error": f"Format '{format}' not available", "formats": jobs.available_formats(job)}
+
+    if format == "ndjson":
+        return StreamingResponse(jobs.iter_ndjson(job), media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": f"attachment; filename=predictions_{job_id}.ndjson"})
+    return FileResponse(jobs.result_path(job, "parquet"), media_type="application/vnd.apache.parquet",
+                        filename=f"predictions_{job_id}.parquet")
+
+# ======================================================
+# 🧠 Retrain Endpoint
+# ======================================================
+@app.post("/retrain")
+async def retrain(mission: str = Form(...), file: UploadFile = File(...),
+                  learning_rate: str = Form(None), max_depth: str = Form(None), n_estimators: str = Form(None),
+                  search: str = Form("grid"), n_jobs: int = Form(None),
+                  early_stopping_rounds: int = Form(None), wait: bool = Form(True),
+                  stream: bool = Form(False), warm_start: bool = Form(False), chunk_rows: int = Form(None)):
+    # Hyperparameters accept comma separated lists ("0.05,0.1") to search over;
+    # the fits run on the training process pool, never on the API event loop.
+    # stream=true (or a big upload) trains out of core; warm_start=true continues the served model.
+    if mission == "tess":
+        return {"error": "Retraining is not supported for TESS, use the pre-trained model."}
+    if mission.lower() not in ("kepler", "k2"):
+        return {"error": f"Mission '{mission}' not supported"}
+    # the training modules are left out of the warm-up: the first retrain imports them, off the event loop
+    await run_in_threadpool(training.load)
+    if early_stopping_rounds is None:
+        early_stopping_rounds = training.EARLY_STOPPING_ROUNDS
+
+    if stream or (file.size or 0) > training.STREAM_THRESHOLD_BYTES:
+        # the upload is spooled to disk and read chunk by chunk, never parsed whole
+        data = file.file
+    else:
+        # K2 only trains on its fixed feature list, so only those columns are parsed
+        # (a cold or evicted K2 bundle is deserialized here: off the event loop)
+        columns = None
+        if mission.lower() == "k2":
+            columns = await run_in_threadpool(lambda: streaming.required_columns("k2", model_registry.get_bundle("k2")))
+        data = await run_in_threadpool(catalog_store.read_csv_columns, file.file, columns)
+
+    try:
+        job_id = await run_in_threadpool(training.submit_training, mission, data, learning_rate, max_depth, n_estimators,
+                                         search, n_jobs, early_stopping_rounds, warm_start, chunk_rows)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if not wait:
+        return training.training_status(job_id)
+    try:
+        result = await asyncio.wrap_future(training.get_training(job_id)["future"])
+    except Exception as e:
+        logger.exception("/retrain failed")
+        inc("errors_total", where="retrain")
+        return {"error": str(e), "job_id": job_id}
+    return {**result, "job_id": job_id}
+
+
+@app.get("/retrain/{job_id}")
+def get_retrain_status(job_id: str):
+    status = training.training_status(job_id)
+    if status is None:
+        return {"error": f"Training job '{job_id}' not found"}
+    return status
+
+
+@app.get("/retrain/{job_id}/events")
+def stream_retrain_events(job_id: str):
+    if training.get_training(job_id) is None:
+        return {"error": f"Training job '{job_id}' not found"}
+    return StreamingResponse(training.iter_events(job_id), media_type="application/x-ndjson")
+
+# ======================================================
+# 📦 Loaded Models (load time / size per bundle)
+# ======================================================
+@app.get("/models")
+def models_status():
+    return model_registry.registry.stats()
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/batcher/stats")
+def batcher_stats():
+    return batcher.batcher.stats()
+
+@app.get("/prediction_cache/stats")
+def prediction_cache_stats():
+    return prediction_cache.prediction_cache.stats()
+
+@app.get("/serving/stats")
+def serving_stats():
+    # RSS / PSS of every serving worker (and of the supervisor under serve.py)
+    return memory_report()
+
+# ======================================================
+# 💾 Model Download
+# ======================================================
+# xgboost model file extension -> (X-Model-Format, media type)
+MODEL_FILE_FORMATS = {
+    ".ubj": ("xgboost-ubj", "application/ubjson"),  # native exports / releases: XGBClassifier().load_model()
+    ".pkl": ("joblib-pickle", "application/octet-stream"),  # MODEL_FORMAT=pickle, TESS stand-in: joblib.load()
+}
+
+
+@app.get("/download_model")
+async def download_model(mission: str = "kepler", retrained: bool = False):
+    # the xgboost model a mission is served with, resolved by the registry like every prediction;
+    # its format is in the file name, the media type and the X-Model-Format header
+    mission = mission.lower()
+    registry = model_registry.registry
+    if mission not in registry.specs:
+        return {"error": f"Mission '{mission}' not supported"}
+
+    if retrained and mission == "kepler":
+        paths, _ = registry.paths("kepler", "KeplerRetrained")
+    elif retrained and mission == "k2":
+        # retrained K2 models are published as releases of the default version
+        paths, release = registry.paths("k2")
+        paths = paths if release else {}
+    else:
+        # the shipped model (for TESS the trained one, or the stand-in while there is none)
+        paths = registry.base_paths(mission, "Kepler" if mission == "kepler" else None)
+    path = paths.get("model") or paths.get("xgb_model")
+
+    if not path or not os.path.exists(path):
+        return {"error": "Model not found"}
+    ext = os.path.splitext(path)[1]
+    model_format, media_type = MODEL_FILE_FORMATS.get(ext, ("unknown", "application/octet-stream"))
+    return FileResponse(path, media_type=media_type, headers={"X-Model-Format": model_format},
+                        filename=f"xgb_{mission}{'_retrained' if retrained and mission != 'tess' else ''}{ext}")
+
+# ======================================================
+# 🌍 Researcher Insights (cached, refreshed when Data_DR25.csv changes)
+# ======================================================
+@app.get("/api/researcher/insights")
+def researcher_insights(request: Request):
+    payload, etag = insights.get_insights()
+    if etag is None:
+        return payload
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
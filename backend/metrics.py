@@ -0,0 +1,180 @@
+import os
+
+import numpy as np
+
+# -------- CONFIG --------
+# ROC / PR curves come from per-bin counts of the scores: one bincount per batch, mergeable,
+# exact up to the bin width
+CURVE_BINS = int(os.environ.get("METRICS_CURVE_BINS", 1000))
+# points returned per curve (thresholds evenly spaced over the bins)
+CURVE_POINTS = int(os.environ.get("METRICS_CURVE_POINTS", 101))
+# the class of prediction_prob_1 ("CONFIRMED"): the curves are this class against the rest
+POSITIVE_CLASS = 1
+# ------------------------
+
+# كل الـ metrics من confusion matrix واحدة (bincount واحد لكل batch) بدل ما كل دالة من sklearn
+# تعدّي على الـ labels من الأول؛ والـ matrix بتتجمع chunk ورا chunk أو من workers مختلفة
+
+
+def confusion_matrix(y_true, y_pred, n_classes):
+    """n_classes x n_classes counts (rows: true class, columns: predicted) in one bincount pass."""
+    idx = np.asarray(y_true, dtype=np.int64) * n_classes + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(idx, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def metrics_from_confusion(cm):
+    """
+    نفس مخرجات accuracy/precision/recall/f1 (weighted) و classification_report
+    بتاعة sklearn (zero_division=0)، بس محسوبة من confusion matrix متجمعة chunk ورا chunk.
+    """
+    support = cm.sum(axis=1).astype(float)
+    predicted = cm.sum(axis=0).astype(float)
+    labels = np.flatnonzero((support + predicted) > 0)
+    cm = cm[np.ix_(labels, labels)]
+    support, predicted = support[labels], predicted[labels]
+    tp = np.diag(cm).astype(float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        denom = support + predicted
+        f1 = np.where(denom > 0, 2 * tp / denom, 0.0)
+
+    total = support.sum()
+    accuracy = float(tp.sum() / total) if total else 0.0
+    weights = support if total else None
+
+    def avg(values, w):
+        return float(np.average(values, weights=w)) if total else 0.0
+
+    report = {
+        str(label): {
+            "precision": float(precision[i]),
+            "recall": float(recall[i]),
+            "f1-score": float(f1[i]),
+            "support": float(support[i]),
+        }
+        for i, label in enumerate(labels)
+    }
+    report["accuracy"] = accuracy
+    report["macro avg"] = {
+        "precision": avg(precision, None), "recall": avg(recall, None),
+        "f1-score": avg(f1, None), "support": float(total),
+    }
+    report["weighted avg"] = {
+        "precision": avg(precision, weights), "recall": avg(recall, weights),
+        "f1-score": avg(f1, weights), "support": float(total),
+    }
+    return {
+        "accuracy": accuracy,
+        "precision": report["weighted avg"]["precision"],
+        "recall": report["weighted avg"]["recall"],
+        "f1": report["weighted avg"]["f1-score"],
+        "report": report,
+    }
+
+
+class ScoreCurves:
+    """
+    ROC and precision-recall curves of one class against the rest, kept as counts of the
+    positive and negative rows' scores per bin of [0, 1]: update() is a bincount, merge() a sum.
+    """
+
+    def __init__(self, bins=CURVE_BINS):
+        self.bins = bins
+        self.positive = np.zeros(bins, dtype=np.int64)
+        self.negative = np.zeros(bins, dtype=np.int64)
+
+    def update(self, is_positive, scores):
+        scores = np.asarray(scores, dtype=np.float64)
+        finite = np.isfinite(scores)
+        idx = np.clip((scores[finite] * self.bins).astype(np.int64), 0, self.bins - 1)
+        is_positive = np.asarray(is_positive, dtype=bool)[finite]
+        self.positive += np.bincount(idx[is_positive], minlength=self.bins)
+        self.negative += np.bincount(idx[~is_positive], minlength=self.bins)
+        return self
+
+    def merge(self, other):
+        self.positive += other.positive
+        self.negative += other.negative
+        return self
+
+    def result(self, points=CURVE_POINTS):
+        """None while one side is empty (the curves are undefined)."""
+        n_pos, n_neg = int(self.positive.sum()), int(self.negative.sum())
+        if not n_pos or not n_neg:
+            return None
+        # point j: rows scored >= (bins - j) / bins, from nothing predicted positive to everything
+        tp = np.concatenate([[0], np.cumsum(self.positive[::-1])])
+        fp = np.concatenate([[0], np.cumsum(self.negative[::-1])])
+        tpr, fpr = tp / n_pos, fp / n_neg
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 1.0)
+        thresholds = (self.bins - np.arange(self.bins + 1)) / self.bins
+        # ROC AUC: trapezoids (ties inside a bin count as ties); AP: sklearn's step sum
+        roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+        average_precision = float(np.sum(np.diff(tpr) * precision[1:]))
+
+        shown = np.unique(np.linspace(0, self.bins, min(points, self.bins + 1)).round().astype(int))
+        return {
+            "roc_auc": roc_auc,
+            "average_precision": average_precision,
+            "positives": n_pos,
+            "negatives": n_neg,
+            "thresholds": thresholds[shown].tolist(),
+            "roc": {"fpr": fpr[shown].tolist(), "tpr": tpr[shown].tolist()},
+            "pr": {"precision": precision[shown].tolist(), "recall": tpr[shown].tolist()},
+        }
+
+
+class MetricsAccumulator:
+    """
+    Confusion matrix (+ ROC / PR curves of POSITIVE_CLASS when probabilities are given) over any
+    number of batches, mergeable across chunks and workers. Metrics are reported only when every
+    batch was labelled with known classes (a label of -1 is unknown).
+    """
+
+    def __init__(self, n_classes, positive_class=POSITIVE_CLASS):
+        self.n_classes = n_classes
+        self.positive_class = positive_class
+        self.confusion = np.zeros((n_classes, n_classes), dtype=np.int64)
+        self.curves = ScoreCurves() if positive_class < n_classes else None
+        self.labelled = None  # None until a batch is seen
+
+    def update(self, y_true, y_pred, probs=None):
+        labelled = y_true is not None and not np.any(np.asarray(y_true) < 0)
+        self.labelled = labelled if self.labelled is None else (self.labelled and labelled)
+        if not self.labelled:
+            return self
+        y_true = np.asarray(y_true)
+        self.confusion += confusion_matrix(y_true, y_pred, self.n_classes)
+        if self.curves is not None:
+            if probs is None:
+                self.curves = None  # curves over only some of the rows would be wrong
+            else:
+                self.curves.update(y_true == self.positive_class, np.asarray(probs)[:, self.positive_class])
+        return self
+
+    def merge(self, other):
+        if other.labelled is None:
+            return self
+        self.labelled = other.labelled if self.labelled is None else (self.labelled and other.labelled)
+        if self.labelled:
+            self.confusion += other.confusion
+            self.curves = self.curves.merge(other.curves) if self.curves is not None and other.curves is not None else None
+        return self
+
+    def result(self):
+        """The /predict metrics dict ({} without usable labels), with "curves" when they are defined."""
+        if not self.labelled:
+            return {}
+        metrics = metrics_from_confusion(self.confusion)
+        curves = self.curves.result() if self.curves is not None else None
+        if curves is not None:
+            metrics["curves"] = {"positive_class": self.positive_class, **curves}
+        return metrics
+
+
+def classification_metrics(y_true, y_pred, n_classes, probs=None):
+    """One batch: accuracy, weighted precision / recall / f1, the per-class report and the curves."""
+    return MetricsAccumulator(n_classes).update(y_true, y_pred, probs).result()
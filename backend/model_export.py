@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from preprocessing import IterativeImputation, Scaling, SimpleImputation, native_step
+
+# -------- CONFIG --------
+# bundles are written in the libraries' own formats instead of pickles:
+#   xgboost -> .ubj (UBJSON), lightgbm -> .txt, imputer / scaler -> .npz arrays + params,
+#   label encoder / feature list -> .json; anything else still falls back to a pickle
+FORMAT = "native-1"
+CHECKSUM_CHUNK = 1 << 20
+STEP_CLASSES = {cls.__name__: cls for cls in (SimpleImputation, IterativeImputation, Scaling)}
+# ------------------------
+
+_source_digests = {}  # pickle path -> ((size, mtime), sha256)
+
+# الـ pickle بيربط الموديل بنسخة sklearn/xgboost اللي اتعمل بيها وبيحمل أبطأ؛
+# الصيغة دي بتتقري بأي نسخة من المكتبة وكل ملف عليه sha256 في الـ manifest
+
+
+class LightGBMModel:
+    """A LightGBM booster read from its text model, with the LGBMClassifier surface serving uses."""
+
+    def __init__(self, booster, classes):
+        self.booster_ = booster
+        self.classes_ = np.asarray(classes)
+        self.n_classes_ = len(self.classes_)
+        self.feature_names_in_ = np.asarray(booster.feature_name(), dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+
+    def predict_proba(self, X):
+        proba = self.booster_.predict(X)
+        if proba.ndim == 1:  # binary objective: probability of the positive class only
+            proba = np.column_stack([1.0 - proba, proba])
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _kind(obj):
+    if hasattr(obj, "get_booster"):
+        return "xgboost"
+    if hasattr(obj, "booster_") and hasattr(obj.booster_, "model_to_string"):
+        return "lightgbm"
+    if isinstance(obj, LabelEncoder):
+        return "label_encoder"
+    if isinstance(obj, (list, tuple)) and all(isinstance(v, str) for v in obj):
+        return "features"
+    step = native_step(obj) if hasattr(obj, "transform") else None
+    if step is not None and _jsonable(step.params):
+        return "step"
+    return "pickle"
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHECKSUM_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_sha256(path):
+    """sha256 of a source pickle, recomputed only when its size or mtime changes (checked on every lookup)."""
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _source_digests.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = _source_digests[path] = (stamp, sha256(path))
+    return cached[1]
+
+
+def stale_sources(manifest):
+    """
+    Artifacts of an export whose source pickle is on disk and is not the one that was exported
+    (replaced or retrained since, or exported before the digests were recorded).
+    """
+    recorded = manifest.get("source_sha256", {})
+    return [name for name, path in manifest.get("source", {}).items()
+            if os.path.exists(path) and recorded.get(name) != source_sha256(path)]
+
+
+def library_versions():
+    versions = {"numpy": np.__version__}
+    for name in ("sklearn", "xgboost", "lightgbm"):
+        module = sys.modules.get(name)
+        if module is not None:
+            versions[name] = module.__version__
+    return versions
+
+
+# ======================================================
+# 💾 Writing
+# ======================================================
+def save_artifacts(artifacts, directory):
+    """
+    Write every artifact of a bundle into directory in its native format.
+    Returns the manifest entries describing them (files, kinds, per-artifact meta, sha256).
+    """
+    files, kinds, meta, checksums = {}, {}, {}, {}
+    for name, obj in artifacts.items():
+        kind = _kind(obj)
+        if kind == "xgboost":
+            files[name] = f"{name}.ubj"
+            obj.save_model(os.path.join(directory, files[name]))
+        elif kind == "lightgbm":
+            files[name] = f"{name}.txt"
+            obj.booster_.save_model(os.path.join(directory, files[name]))
+            meta[name] = {"classes": np.asarray(obj.classes_).tolist()}
+        elif kind == "label_encoder":
+            files[name] = f"{name}.json"
+            with open(os.path.join(directory, files[name]), "w") as f:
+                json.dump({"classes": np.asarray(obj.classes_).tolist()}, f)
+        elif kind == "features":
+            files[name] = f"{name}.json"
+            with open(os.path.join(directory, files[name]), "w") as f:
+                json.dump(list(obj), f)
+        elif kind == "step":
+            step = native_step(obj)
+            files[name] = f"{name}.npz"
+            np.savez(os.path.join(directory, files[name]), **step.to_arrays())
+            meta[name] = {"class": type(step).__name__, "params": step.params}
+            if isinstance(step, Scaling):
+                meta[name]["kind"] = step.kind
+        else:
+            files[name] = f"{name}.pkl"
+            joblib.dump(obj, os.path.join(directory, files[name]))
+        kinds[name] = kind
+        checksums[name] = sha256(os.path.join(directory, files[name]))
+
+    return {"format": FORMAT, "artifacts": files, "kinds": kinds, "meta": meta,
+            "sha256": checksums, "libraries": library_versions()}
+
+
+# ======================================================
+# 📂 Reading
+# ======================================================
+def verify(paths, manifest):
+    """Raise ValueError when a file does not match the checksum recorded when it was written."""
+    for name, expected in manifest.get("sha256", {}).items():
+        if name in paths and sha256(paths[name]) != expected:
+            raise ValueError(f"Checksum mismatch for artifact '{name}' ({paths[name]})")
+
+
+def load_artifact(path, kind, meta=None):
+    meta = meta or {}
+    if kind == "xgboost":
+        from xgboost import XGBClassifier
+        model = XGBClassifier()
+        model.load_model(path)
+        return model
+    if kind == "lightgbm":
+        import lightgbm
+        return LightGBMModel(lightgbm.Booster(model_file=path), meta["classes"])
+    if kind == "label_encoder":
+        with open(path) as f:
+            encoder = LabelEncoder()
+            encoder.classes_ = np.asarray(json.load(f)["classes"])
+        return encoder
+    if kind == "features":
+        with open(path) as f:
+            return json.load(f)
+    if kind == "step":
+        cls = STEP_CLASSES[meta["class"]]
+        with np.load(path) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        if cls is Scaling:
+            return Scaling.from_arrays(arrays, meta["params"], meta["kind"])
+        return cls.from_arrays(arrays, meta["params"])
+    return joblib.load(path)
+
+
+def load_artifacts(paths, manifest):
+    """{name: path} of a native bundle -> {name: object}, checksums verified first."""
+    verify(paths, manifest)
+    kinds = manifest.get("kinds", {})
+    meta = manifest.get("meta", {})
+    return {name: load_artifact(path, kinds.get(name, "pickle"), meta.get(name)) for name, path in paths.items()}
+
+
+def is_native(manifest):
+    return manifest is not None and manifest.get("format") == FORMAT
+
+
+# ======================================================
+# 🛠 Exporting the shipped pickles
+# ======================================================
+def export_bundle(mission, version, out_dir):
+    """Convert a version's pickles into out_dir/<mission>/<version>/ (replaced as a whole)."""
+    from model_registry import BUNDLE_SPECS
+
+    paths = BUNDLE_SPECS[mission]["versions"][version]
+    artifacts = {name: joblib.load(path) for name, path in paths.items()}
+
+    target = os.path.join(out_dir, mission, version)
+    staging = f"{target}.staging-{uuid.uuid4().hex[:6]}"
+    os.makedirs(staging)
+    manifest = {"mission": mission, "version": version, "created_at": time.time(),
+                "source": dict(paths), "source_sha256": {name: sha256(path) for name, path in paths.items()},
+                **save_artifacts(artifacts, staging)}
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(staging, target)
+    return manifest
+
+
+if __name__ == "__main__":
+    # python model_export.py [mission[/version] ...]  ->  by default every version whose pickles are on disk,
+    # except the fallbacks (built locally on first use, see tess_model.train_standin)
+    from model_registry import BUNDLE_SPECS, NATIVE_DIR
+
+    wanted = sys.argv[1:] or [
+        f"{m}/{v}" for m, spec in BUNDLE_SPECS.items() for v, paths in spec["versions"].items()
+        if v != spec.get("fallback") and all(os.path.exists(p) for p in paths.values())
+    ]
+    for item in wanted:
+        mission, _, version = item.partition("/")
+        for version in [version] if version else list(BUNDLE_SPECS[mission]["versions"]):
+            manifest = export_bundle(mission, version, NATIVE_DIR)
+            print(f"{mission}/{version}: {manifest['artifacts']}")
@@ -0,0 +1,458 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import joblib
+
+import model_export
+from instrumentation import observe, register_collector
+
+# -------- CONFIG --------
+MAX_CACHE_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Retrained bundles are published as immutable release dirs: RELEASES_DIR/<mission>/<version>/<release>/.
+# The CURRENT file next to them names the live release and is switched with an atomic rename;
+# versions without a CURRENT file are served from the paths below.
+RELEASES_DIR = os.environ.get("MODEL_RELEASES_DIR", "models/releases")
+RELEASES_KEEP = int(os.environ.get("MODEL_RELEASES_KEEP", 3))
+MANIFEST = "manifest.json"
+# "native": releases are published in the libraries' own formats (model_export), and a version
+# exported to NATIVE_DIR/<mission>/<version>/ is served from there instead of its pickles.
+# "pickle": joblib everywhere, as before.
+# An export whose source pickles have changed since (model_export.stale_sources) is ignored:
+# the pickles are served until `python model_export.py` is run again.
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "native")
+NATIVE_DIR = os.environ.get("MODEL_NATIVE_DIR", "models/native")
+
+# Every mission has one or more versions living side by side on disk.
+# "default" is the version served when the caller does not ask for one,
+# and can be overridden with <MISSION>_MODEL_VERSION (e.g. KEPLER_MODEL_VERSION).
+# "fallback" is served instead of the default while the default's artifacts are not on disk.
+BUNDLE_SPECS = {
+    "kepler": {
+        "default": "Kepler",
+        "versions": {
+            "Kepler": {
+                "model": "models/Kepler/xgb_kepler.pkl",
+                "label_encoder": "models/Kepler/label_encoder_kepler.pkl",
+                "features": "models/Kepler/top_features_kepler.pkl",
+                # the only imputer fitted on the same 10 top features as xgb_kepler.pkl
+                "imputer": "models/Kepler/imputer_kepler_retrained.pkl",
+            },
+            "KeplerRetrained": {
+                # retrain_kepler() trains on raw columns, feature order comes from the model itself
+                "model": "models/KeplerRetrained/xgb_kepler_retrained.pkl",
+                "label_encoder": "models/KeplerRetrained/label_encoder_kepler_retrained.pkl",
+            },
+        },
+    },
+    "k2": {
+        "default": "K2",
+        "versions": {
+            "K2": {
+                "xgb_model": "models/K2/xgb_k2.pkl",
+                "lgb_model": "models/K2/lgb_k2.pkl",
+                "imputer": "models/K2/imputer_k2.pkl",
+                "scaler": "models/K2/scaler_k2.pkl",
+                "label_encoder": "models/K2/label_encoder_k2.pkl",
+                "features": "models/K2/train_features_k2.pkl",
+            },
+        },
+    },
+    "tess": {
+        "default": "Tess",
+        "fallback": "TessStandin",
+        "versions": {
+            "Tess": {
+                "model": "models/Tess/xgb_tess.pkl",
+                "label_encoder": "models/Tess/label_encoder_tess.pkl",
+                "features": "models/Tess/features_tess.pkl",
+                "imputer": "models/Tess/imputer_tess.pkl",
+            },
+            # small model trained locally by tess_model.train_standin() on first use
+            "TessStandin": {
+                "model": "models/TessStandin/xgb_tess_standin.pkl",
+                "label_encoder": "models/TessStandin/label_encoder_tess_standin.pkl",
+                "features": "models/TessStandin/features_tess_standin.pkl",
+                "imputer": "models/TessStandin/imputer_tess_standin.pkl",
+            },
+        },
+    },
+}
+# ------------------------
+
+logger = logging.getLogger(__name__)
+_stale_exports = set()  # (mission, version) already warned about
+
+
+def _version_dir(mission, version):
+    return os.path.join(RELEASES_DIR, mission, version)
+
+
+def _pointer_stamp(mission, version):
+    """Identity of the CURRENT file; a switch renames a new file over it, so the inode changes."""
+    try:
+        st = os.stat(os.path.join(_version_dir(mission, version), "CURRENT"))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _current_rss():
+    """Resident set size of this process in bytes (Linux only, None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelBundle:
+    """All the artifacts one mission version needs to predict (model(s), encoder, imputer, ...)."""
+
+    profile = "full"
+    dtype = None  # feature matrix dtype; None = chosen from the models (preprocessing.pipeline)
+    skip_features = ()  # features no tree reads, left unfilled by the pipeline
+
+    def __init__(self, mission, version, artifacts, paths, load_seconds, size_bytes, rss_bytes, release=None):
+        self.mission = mission
+        self.version = version
+        self.release = release
+        self.artifacts = artifacts
+        self.paths = paths
+        self.load_seconds = load_seconds
+        self.size_bytes = size_bytes
+        self.rss_bytes = rss_bytes
+        self.loaded_at = time.time()
+        self.stamp = None  # CURRENT pointer the bundle was loaded under
+        # built from the artifacts on first use and kept with the bundle, never one of its artifacts
+        self._pipeline = None  # preprocessing.pipeline
+        self._compiled = None  # tree_engine.compiled
+        self._fast = None  # fast_profile.fast_bundle
+
+    def __getitem__(self, name):
+        return self.artifacts[name]
+
+    def get(self, name, default=None):
+        return self.artifacts.get(name, default)
+
+    def info(self):
+        return {
+            "mission": self.mission,
+            "version": self.version,
+            "release": self.release,
+            "profile": self.profile,
+            "artifacts": sorted(self.artifacts),
+            "load_seconds": round(self.load_seconds, 4),
+            "size_bytes": self.size_bytes,
+            "rss_bytes": self.rss_bytes,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """
+    Loads mission bundles on first use and keeps them in an LRU cache bounded by size.
+    Nothing is read from disk at import time.
+    """
+
+    def __init__(self, specs, max_bytes=MAX_CACHE_BYTES):
+        self.specs = specs
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._listeners = []
+        self._builders = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- versions ----------
+    def default_version(self, mission):
+        spec = self._mission_spec(mission)
+        version = os.environ.get(f"{mission.upper()}_MODEL_VERSION", spec["default"])
+        if "fallback" in spec and version == spec["default"] and not self.available(mission, version):
+            return spec["fallback"]
+        return version
+
+    def available(self, mission, version):
+        """True when every artifact of the version (its CURRENT release, or the spec paths) is on disk."""
+        paths, _ = self.paths(mission, version)
+        return all(os.path.exists(p) for p in paths.values())
+
+    def register_builder(self, mission, version, fn):
+        """fn() writes a version's artifacts; it runs on the first load that finds them missing."""
+        self._builders[(mission.lower(), version)] = fn
+
+    def versions(self, mission):
+        return list(self._mission_spec(mission)["versions"])
+
+    def _mission_spec(self, mission):
+        mission = mission.lower()
+        if mission not in self.specs:
+            raise KeyError(f"Mission '{mission}' has no registered models")
+        return self.specs[mission]
+
+    # ---------- loading ----------
+    def get(self, mission, version=None):
+        mission = mission.lower()
+        version = version or self.default_version(mission)
+        key = (mission, version)
+        # a release published by another process (or worker) is picked up on the next get()
+        stamp = _pointer_stamp(mission, version)
+
+        with self._lock:
+            bundle = self._cache.get(key)
+            if bundle is not None and bundle.stamp == stamp:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return bundle
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # one loader per bundle, other missions keep being served meanwhile
+        with load_lock:
+            with self._lock:
+                bundle = self._cache.get(key)
+                if bundle is not None and bundle.stamp == stamp:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return bundle
+                self.misses += 1
+                replaced = key in self._cache  # CURRENT moved on under a cached bundle
+
+            bundle = self._load(mission, version)
+            bundle.stamp = stamp
+
+            with self._lock:
+                self._cache[key] = bundle
+                self._evict()
+        if replaced:
+            self._notify(mission, version)
+        return bundle
+
+    def paths(self, mission, version=None, release=None):
+        """Artifact paths of a release (the CURRENT one by default), or the spec paths if none was published."""
+        paths, release, _ = self._locate(mission, version, release)
+        return paths, release
+
+    def base_paths(self, mission, version=None):
+        """Artifact paths of a version as shipped (its native export, or the spec pickles), whatever was published since."""
+        mission = mission.lower()
+        version = version or self.default_version(mission)
+        paths, _, _ = self._base_paths(mission, version)
+        return paths
+
+    def _locate(self, mission, version=None, release=None):
+        """(artifact paths, release, manifest); the manifest is None for the pickles named in the spec."""
+        mission = mission.lower()
+        version = version or self.default_version(mission)
+        versions = self._mission_spec(mission)["versions"]
+        if version not in versions:
+            raise KeyError(f"Unknown version '{version}' for mission '{mission}'. Available: {list(versions)}")
+        version_dir = _version_dir(mission, version)
+        if release is None:
+            try:
+                with open(os.path.join(version_dir, "CURRENT")) as f:
+                    release = f.read().strip()
+            except FileNotFoundError:
+                return self._base_paths(mission, version)
+        with open(os.path.join(version_dir, release, MANIFEST)) as f:
+            manifest = json.load(f)
+        return {name: os.path.join(version_dir, release, fn) for name, fn in manifest["artifacts"].items()}, release, manifest
+
+    def _base_paths(self, mission, version):
+        spec_paths = dict(self._mission_spec(mission)["versions"][version])
+        if MODEL_FORMAT != "native":
+            return spec_paths, None, None
+        native_dir = os.path.join(NATIVE_DIR, mission, version)
+        try:
+            with open(os.path.join(native_dir, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return spec_paths, None, None
+        stale = model_export.stale_sources(manifest)
+        if stale:
+            if (mission, version) not in _stale_exports:
+                _stale_exports.add((mission, version))
+                logger.warning("native export of %s/%s is older than its pickles (%s): serving the pickles, "
+                               "re-run model_export.py", mission, version, ", ".join(stale))
+            return spec_paths, None, None
+        return {name: os.path.join(native_dir, fn) for name, fn in manifest["artifacts"].items()}, None, manifest
+
+    def _load(self, mission, version, release=None):
+        builder = self._builders.get((mission, version))
+        if builder is not None and release is None and not self.available(mission, version):
+            builder()
+        paths, release, manifest = self._locate(mission, version, release)
+
+        rss_before = _current_rss()
+        start = time.perf_counter()
+        if model_export.is_native(manifest):
+            artifacts = model_export.load_artifacts(paths, manifest)
+        else:
+            if manifest is not None:
+                model_export.verify(paths, manifest)
+            artifacts = {name: joblib.load(path) for name, path in paths.items()}
+        load_seconds = time.perf_counter() - start
+        observe("model_load_seconds", load_seconds, mission=mission, version=version)
+        rss_after = _current_rss()
+
+        if "features" not in artifacts:
+            model = artifacts.get("model") or artifacts.get("xgb_model")
+            names = getattr(model, "feature_names_in_", None)
+            if names is not None:
+                artifacts["features"] = [str(c) for c in names]
+
+        size_bytes = sum(os.path.getsize(p) for p in paths.values())
+        rss_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        return ModelBundle(mission, version, artifacts, dict(paths), load_seconds, size_bytes, rss_bytes, release)
+
+    def _evict(self):
+        # always keep the most recently used bundle, even if it alone exceeds the bound
+        total = sum(b.size_bytes for b in self._cache.values())
+        while total > self.max_bytes and len(self._cache) > 1:
+            _, old = self._cache.popitem(last=False)
+            total -= old.size_bytes
+            self.evictions += 1
+
+    # ---------- publishing ----------
+    def publish(self, mission, version, artifacts, check=None):
+        """
+        Write artifacts as a new immutable release, load it, then switch to it.
+        Nothing that is being served is overwritten. check(bundle) runs on the loaded release
+        before the switch: when it raises, the release is removed and the current one stays live.
+        """
+        mission = mission.lower()
+        self.paths(mission, version)  # unknown mission / version fails before anything is written
+        release = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        version_dir = _version_dir(mission, version)
+        staging = os.path.join(version_dir, f".staging-{release}")
+        os.makedirs(staging)
+
+        manifest = {"mission": mission, "version": version, "release": release, "created_at": time.time()}
+        if MODEL_FORMAT == "native":
+            manifest.update(model_export.save_artifacts(artifacts, staging))
+        else:
+            files, checksums = {}, {}
+            for name, obj in artifacts.items():
+                files[name] = f"{name}.pkl"
+                joblib.dump(obj, os.path.join(staging, files[name]))
+                checksums[name] = model_export.sha256(os.path.join(staging, files[name]))
+            manifest.update(artifacts=files, sha256=checksums)
+        with open(os.path.join(staging, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        # the release appears complete or not at all
+        os.rename(staging, os.path.join(version_dir, release))
+
+        try:
+            bundle = self.activate(mission, version, release, check)
+        except Exception:
+            shutil.rmtree(os.path.join(version_dir, release), ignore_errors=True)
+            raise
+        self._prune(mission, version)
+        return bundle
+
+    def activate(self, mission, version, release, check=None):
+        """
+        Make a published release the live one (also used to roll back). The new bundle is fully
+        loaded (and passes check, if given) before the swap; requests that already hold the
+        previous bundle finish with it.
+        """
+        mission = mission.lower()
+        key = (mission, version)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            bundle = self._load(mission, version, release)
+            if check is not None:
+                check(bundle)
+            pointer = os.path.join(_version_dir(mission, version), "CURRENT")
+            tmp = f"{pointer}.tmp-{os.getpid()}"
+            with open(tmp, "w") as f:
+                f.write(release)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, pointer)
+            bundle.stamp = _pointer_stamp(mission, version)
+
+            with self._lock:
+                self._cache[key] = bundle
+                self._cache.move_to_end(key)
+                self._evict()
+        self._notify(mission, version)
+        return bundle
+
+    def releases(self, mission, version):
+        version_dir = _version_dir(mission.lower(), version)
+        if not os.path.isdir(version_dir):
+            return []
+        return sorted(d for d in os.listdir(version_dir) if os.path.exists(os.path.join(version_dir, d, MANIFEST)))
+
+    def _prune(self, mission, version):
+        _, current = self.paths(mission, version)
+        for release in self.releases(mission, version)[:-RELEASES_KEEP]:
+            if release != current:
+                shutil.rmtree(os.path.join(_version_dir(mission, version), release), ignore_errors=True)
+
+    def invalidate(self, mission, version=None):
+        """Drop cached bundles so the next get() re-reads them from disk (e.g. after retraining)."""
+        mission = mission.lower()
+        with self._lock:
+            for key in list(self._cache):
+                if key[0] == mission and (version is None or key[1] == version):
+                    del self._cache[key]
+        self._notify(mission, version)
+
+    # ---------- change listeners ----------
+    def on_change(self, fn):
+        """fn(mission, version) runs whenever the bundle served for a version changes or is dropped."""
+        self._listeners.append(fn)
+
+    def _notify(self, mission, version):
+        for fn in self._listeners:
+            fn(mission, version)
+
+    def stats(self):
+        with self._lock:
+            loaded = [b.info() for b in self._cache.values()]
+            return {
+                "loaded": loaded,
+                "cache_bytes": sum(b["size_bytes"] for b in loaded),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "available": {m: self.versions(m) for m in self.specs},
+                "releases": {m: {v: self.releases(m, v) for v in self.versions(m)} for m in self.specs},
+            }
+
+
+registry = ModelRegistry(BUNDLE_SPECS)
+
+
+def _registry_metrics():
+    stats = registry.stats()
+    yield "model_cache_hits_total", "counter", "Model registry cache hits", {}, stats["hits"]
+    yield "model_cache_misses_total", "counter", "Model registry cache misses (bundle loads)", {}, stats["misses"]
+    yield "model_cache_evictions_total", "counter", "Bundles evicted from the model cache", {}, stats["evictions"]
+    yield "model_cache_bytes", "gauge", "On-disk size of the loaded bundles", {}, stats["cache_bytes"]
+    for b in stats["loaded"]:
+        labels = {"mission": b["mission"], "version": b["version"]}
+        yield "model_bundle_load_seconds", "gauge", "Load time of each loaded bundle", labels, b["load_seconds"]
+
+
+register_collector(_registry_metrics)
+
+
+def get_bundle(mission, version=None, profile=None):
+    bundle = registry.get(mission, version)
+    if profile is None or profile == ModelBundle.profile:
+        return bundle
+    from fast_profile import profile_bundle  # pruned copies are derived from the full bundle
+    return profile_bundle(bundle, profile)
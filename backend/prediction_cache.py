@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import inc, register_collector
+from model_registry import registry
+
+# -------- CONFIG --------
+PREDICTION_CACHE_ENABLED = os.environ.get("PREDICTION_CACHE_ENABLED", "1") == "1"
+# rows kept in memory (one row = one feature vector -> its class probabilities)
+PREDICTION_CACHE_ROWS = int(os.environ.get("PREDICTION_CACHE_ROWS", 200_000))
+# rows evicted from memory go to this sqlite file (shared by every worker) when it is set
+PREDICTION_CACHE_SPILL_PATH = os.environ.get("PREDICTION_CACHE_SPILL_PATH", "")
+PREDICTION_CACHE_SPILL_ROWS = int(os.environ.get("PREDICTION_CACHE_SPILL_ROWS", 2_000_000))
+SPILL_QUERY_CHUNK = 500  # keys per IN (...) lookup, under sqlite's bound variable limit
+# ------------------------
+
+
+def bundle_tag(bundle):
+    """The model a cached row was scored by: a new release (retrain) or profile means a new tag."""
+    tag = f"{bundle.mission}/{bundle.version}/{bundle.release or 'base'}"
+    return tag if bundle.profile == "full" else f"{tag}/{bundle.profile}"
+
+
+def row_keys(X):
+    """
+    64-bit content hash of every aligned feature vector (vectorized, NaN-safe).
+    Rows are hashed before imputation, so the key is exactly what the client sent.
+    """
+    return pd.util.hash_pandas_object(pd.DataFrame(X, copy=False), index=False).to_numpy().view(np.int64)
+
+
+class _Spill:
+    """Evicted rows on disk, bounded by max_rows (oldest written first out)."""
+
+    def __init__(self, path, max_rows):
+        self.path = path
+        self.max_rows = max_rows
+        self._connect()
+        # a sqlite connection must not cross a fork (serve.py workers): each child opens its own
+        os.register_at_fork(after_in_child=self._connect)
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rows (tag TEXT, key INTEGER, probs BLOB, PRIMARY KEY (tag, key))")
+
+    def get(self, tag, keys):
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), SPILL_QUERY_CHUNK):
+                chunk = keys[i:i + SPILL_QUERY_CHUNK]
+                query = f"SELECT key, probs FROM rows WHERE tag = ? AND key IN ({','.join('?' * len(chunk))})"
+                found.update(self._conn.execute(query, [tag, *chunk]).fetchall())
+        return found
+
+    def put(self, items):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?)", [(t, k, p) for (t, k), p in items])
+            extra = self._conn.execute("SELECT count(*) FROM rows").fetchone()[0] - self.max_rows
+            if extra > 0:
+                self._conn.execute("DELETE FROM rows WHERE rowid IN (SELECT rowid FROM rows ORDER BY rowid LIMIT ?)", (extra,))
+            self._conn.execute("COMMIT")
+
+    def drop(self, prefix):
+        with self._lock:
+            self._conn.execute("DELETE FROM rows WHERE substr(tag, 1, ?) = ?", (len(prefix), prefix))
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM rows").fetchone()[0]
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of class probabilities: (bundle tag, feature-vector hash) -> probabilities
+    of that row (the label is their argmax, as everywhere else). Bounded LRU in memory, optional
+    sqlite spill for what falls out of it; entries of a model are dropped as soon as it is replaced.
+    """
+
+    def __init__(self, max_rows=PREDICTION_CACHE_ROWS, spill_path=PREDICTION_CACHE_SPILL_PATH,
+                 spill_rows=PREDICTION_CACHE_SPILL_ROWS):
+        self.max_rows = max_rows
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self._spill = _Spill(spill_path, spill_rows) if spill_path else None
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def proba(self, bundle, X, score):
+        """
+        Class probabilities for every row of X; only the rows not seen before (by this model)
+        are passed to score(X_missing) -> probabilities.
+        """
+        if not PREDICTION_CACHE_ENABLED or self.max_rows <= 0 or not len(X):
+            return score(X)
+        tag = bundle_tag(bundle)
+        keys = row_keys(X).tolist()
+
+        # duplicate rows inside one batch are scored once
+        cached, missing = {}, {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in cached or key in missing:
+                    continue
+                blob = self._rows.get((tag, key))
+                if blob is None:
+                    missing[key] = i
+                else:
+                    self._rows.move_to_end((tag, key))
+                    cached[key] = blob
+
+        spilled = self._spill.get(tag, list(missing)) if self._spill is not None and missing else {}
+        for key, blob in spilled.items():
+            cached[key] = blob
+            del missing[key]
+
+        if missing:
+            rows = np.fromiter(missing.values(), dtype=np.intp, count=len(missing))
+            fresh = np.asarray(score(X if len(rows) == len(X) else X[rows]), dtype=np.float64)
+            for key, values in zip(missing, fresh):
+                cached[key] = values.tobytes()
+        new = {key: cached[key] for key in missing}
+        new.update(spilled)  # promoted back into memory
+        self._store(tag, new)
+
+        # per row: a row is a miss only if it was scored, repeats of it in the batch are hits
+        self._count(bundle.mission, len(keys) - len(missing) - len(spilled), len(spilled), len(missing))
+        blobs = [cached[key] for key in keys]
+        return np.frombuffer(b"".join(blobs), dtype=np.float64).reshape(len(keys), -1).copy()
+
+    def _store(self, tag, blobs):
+        evicted = []
+        with self._lock:
+            for key, blob in blobs.items():
+                self._rows[(tag, key)] = blob
+            while len(self._rows) > self.max_rows:
+                evicted.append(self._rows.popitem(last=False))
+            self.evictions += len(evicted)
+        if evicted and self._spill is not None:
+            self._spill.put(evicted)
+
+    def _count(self, mission, hits, spill_hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.spill_hits += spill_hits
+            self.misses += misses
+        inc("prediction_cache_total", hits, mission=mission, result="hit")
+        inc("prediction_cache_total", spill_hits, mission=mission, result="spill_hit")
+        inc("prediction_cache_total", misses, mission=mission, result="miss")
+
+    def invalidate(self, mission, version=None):
+        """Forget every row scored by a mission (version), e.g. when a retrain publishes a new model."""
+        prefix = f"{mission}/" if version is None else f"{mission}/{version}/"
+        with self._lock:
+            stale = [k for k in self._rows if k[0].startswith(prefix)]
+            for k in stale:
+                del self._rows[k]
+            self.invalidations += 1
+        if self._spill is not None:
+            self._spill.drop(prefix)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+        if self._spill is not None:
+            self._spill.drop("")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.spill_hits + self.misses
+            stats = {
+                "enabled": PREDICTION_CACHE_ENABLED,
+                "rows": len(self._rows),
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.spill_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+        if self._spill is not None:
+            stats["spill"] = {"path": self._spill.path, "rows": self._spill.size(), "max_rows": self._spill.max_rows}
+        return stats
+
+
+prediction_cache = PredictionCache()
+registry.on_change(prediction_cache.invalidate)
+
+
+def cached_proba(bundle, X, score):
+    return prediction_cache.proba(bundle, X, score)
+
+
+def _cache_metrics():
+    stats = prediction_cache.stats()
+    yield "prediction_cache_rows", "gauge", "Rows held in the in-memory prediction cache", {}, stats["rows"]
+    yield "prediction_cache_hit_ratio", "gauge", "Share of scored rows answered from the prediction cache", {}, stats["hit_ratio"]
+    yield "prediction_cache_evictions_total", "counter", "Rows evicted from the in-memory prediction cache", {}, stats["evictions"]
+
+
+register_collector(_cache_metrics)
@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401 (IterativeImputer is still experimental)
+from sklearn.impute import IterativeImputer, SimpleImputer
+from sklearn.preprocessing import RobustScaler, StandardScaler
+from sklearn.base import clone
+
+# -------- CONFIG --------
+# how a column that is missing from the input (or is not numeric) is filled before imputation
+FILL_NAN = "nan"
+FILL_ZERO = "zero"
+# ------------------------
+
+
+def _is_numeric(dtype):
+    # same columns as select_dtypes(include=[np.number]): bools are not numbers here
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+# ======================================================
+# Fitted statistics as plain arrays
+# ======================================================
+# These replay a fitted sklearn imputer / scaler from its statistics alone. They are what the
+# pipeline runs, and what model_export stores (arrays + the estimator's params to refit it).
+class _Step:
+    estimator = None  # the sklearn class it stands for
+
+    def __init__(self, params):
+        self.params = params
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        return self.apply(X)
+
+    def unfitted(self):
+        """A fresh sklearn estimator with the same params (retraining fits a new one)."""
+        # params read back from JSON have their tuples (quantile_range, ...) turned into lists
+        params = {k: tuple(v) if isinstance(v, list) else v for k, v in self.params.items()}
+        return self.estimator(**params)
+
+
+class SimpleImputation(_Step):
+    """SimpleImputer: every missing value becomes its column statistic."""
+    estimator = SimpleImputer
+
+    def __init__(self, statistics, params=None):
+        super().__init__(params or {})
+        self.statistics = np.asarray(statistics, dtype=np.float64)
+
+    @classmethod
+    def from_estimator(cls, imputer):
+        return cls(imputer.statistics_, imputer.get_params())
+
+    def __call__(self, X, missing):
+        rows, cols = np.nonzero(missing)
+        X[rows, cols] = self.statistics[cols]
+
+    def apply(self, X):
+        self(X, np.isnan(X))
+        return X
+
+    def to_arrays(self):
+        return {"statistics": self.statistics}
+
+    @classmethod
+    def from_arrays(cls, arrays, params):
+        return cls(arrays["statistics"], params)
+
+
+class IterativeImputation(_Step):
+    """
+    IterativeImputer.transform: start from the initial (mean) imputation, then replay the fitted
+    round-robin regressions on the missing entries only. Linear estimators (BayesianRidge) are
+    applied as coef_/intercept_ directly.
+    """
+    estimator = IterativeImputer
+
+    def __init__(self, initial, n_iter, steps, min_value, max_value, params=None):
+        super().__init__(params or {})
+        self.initial = SimpleImputation(initial)
+        self.n_iter = int(n_iter)
+        self.steps = steps  # [(feature, neighbor features, coef, intercept)]
+        self.min_value = np.asarray(min_value, dtype=np.float64)
+        self.max_value = np.asarray(max_value, dtype=np.float64)
+
+    @classmethod
+    def from_estimator(cls, imputer):
+        steps = [
+            (int(t.feat_idx), np.asarray(t.neighbor_feat_idx), np.asarray(t.estimator.coef_), float(t.estimator.intercept_))
+            for t in imputer.imputation_sequence_
+        ]
+        return cls(imputer.initial_imputer_.statistics_, imputer.n_iter_, steps,
+                   imputer._min_value, imputer._max_value, imputer.get_params())
+
+    def __call__(self, X, missing):
+        self.initial(X, missing)
+        if self.n_iter == 0 or missing.all():
+            return
+        for feat, neighbors, coef, intercept in self.steps:
+            rows = missing[:, feat]
+            if not rows.any():
+                continue
+            values = X[np.ix_(rows, neighbors)] @ coef + intercept
+            X[rows, feat] = np.clip(values, self.min_value[feat], self.max_value[feat])
+
+    def apply(self, X):
+        self(X, np.isnan(X))
+        return X
+
+    def to_arrays(self):
+        # the neighbor lists are ragged: stored end to end with their lengths
+        return {
+            "initial": self.initial.statistics,
+            "n_iter": np.array(self.n_iter),
+            "feature": np.array([s[0] for s in self.steps], dtype=np.int64),
+            "length": np.array([len(s[1]) for s in self.steps], dtype=np.int64),
+            "neighbors": np.concatenate([s[1] for s in self.steps]).astype(np.int64) if self.steps else np.empty(0, np.int64),
+            "coef": np.concatenate([s[2] for s in self.steps]) if self.steps else np.empty(0),
+            "intercept": np.array([s[3] for s in self.steps], dtype=np.float64),
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, params):
+        ends = np.cumsum(arrays["length"])
+        starts = ends - arrays["length"]
+        steps = [
+            (int(f), arrays["neighbors"][a:b], arrays["coef"][a:b], float(c))
+            for f, a, b, c in zip(arrays["feature"], starts, ends, arrays["intercept"])
+        ]
+        return cls(arrays["initial"], int(arrays["n_iter"]), steps, arrays["min_value"], arrays["max_value"], params)
+
+
+class Scaling(_Step):
+    """RobustScaler / StandardScaler: (X - center) / scale, either part optional."""
+
+    def __init__(self, center, scale, kind="RobustScaler", params=None):
+        super().__init__(params or {})
+        self.kind = kind
+        self.estimator = {"RobustScaler": RobustScaler, "StandardScaler": StandardScaler}[kind]
+        self.center = None if center is None else np.asarray(center, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_estimator(cls, scaler):
+        if isinstance(scaler, RobustScaler):
+            center = scaler.center_ if scaler.with_centering else None
+            scale = scaler.scale_ if scaler.with_scaling else None
+        else:
+            center = scaler.mean_ if scaler.with_mean else None
+            scale = scaler.scale_ if scaler.with_std else None
+        return cls(center, scale, type(scaler).__name__, scaler.get_params())
+
+    def apply(self, X):
+        if self.center is not None:
+            X -= self.center
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+    def to_arrays(self):
+        arrays = {}
+        if self.center is not None:
+            arrays["center"] = self.center
+        if self.scale is not None:
+            arrays["scale"] = self.scale
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, params, kind="RobustScaler"):
+        return cls(arrays.get("center"), arrays.get("scale"), kind, params)
+
+
+def _missing_is_nan(imputer):
+    value = getattr(imputer, "missing_values", None)
+    return isinstance(value, float) and np.isnan(value)
+
+
+def native_step(step):
+    """Array version of a fitted imputer/scaler, or None when only step.transform reproduces it."""
+    if isinstance(step, _Step):
+        return step
+    if isinstance(step, (RobustScaler, StandardScaler)):
+        return Scaling.from_estimator(step)
+    if not _missing_is_nan(step) or getattr(step, "add_indicator", False):
+        return None
+    if isinstance(step, SimpleImputer):
+        if np.isnan(step.statistics_).any():  # columns that were empty at fit time are dropped by sklearn
+            return None
+        return SimpleImputation.from_estimator(step)
+    if isinstance(step, IterativeImputer):
+        if step.sample_posterior or np.isnan(step.initial_imputer_.statistics_).any():
+            return None
+        if not all(hasattr(t.estimator, "coef_") and hasattr(t.estimator, "intercept_") for t in step.imputation_sequence_):
+            return None
+        return IterativeImputation.from_estimator(step)
+    return None
+
+
+def unfitted(step):
+    """Unfitted copy of a (sklearn or native) preprocessing step, to be fitted on new data."""
+    return step.unfitted() if isinstance(step, _Step) else clone(step)
+
+
+# ======================================================
+# Pipeline
+# ======================================================
+class FeaturePipeline:
+    """
+    DataFrame -> one contiguous matrix in model feature order, imputed and scaled in place.
+    The matrix is float32 when the models only ever see float32 (xgboost) and nothing
+    between the input and the model rounds differently in float32; otherwise float64.
+    Features in skip (read by no tree) are left at the fill value instead of being copied.
+    """
+
+    def __init__(self, features, imputer=None, scaler=None, fill=FILL_NAN, dtype=np.float64, skip=()):
+        self.features = list(features)
+        self.fill = fill
+        self.skip = set(skip)
+        self.dtype = np.dtype(dtype)
+        self.imputer = imputer
+        self.scaler = scaler
+        self._impute = native_step(imputer) if imputer is not None else None
+        self._scale = native_step(scaler) if scaler is not None else None
+
+    def align(self, df):
+        """The single allocation per batch: input columns are copied straight into it."""
+        X = np.empty((len(df), len(self.features)), dtype=self.dtype)
+        fill = np.nan if self.fill == FILL_NAN else 0.0
+        for j, name in enumerate(self.features):
+            if name not in df.columns or name in self.skip:
+                X[:, j] = fill
+                continue
+            col = df[name]
+            if _is_numeric(col.dtype):
+                X[:, j] = col.to_numpy(dtype=np.float64, na_value=np.nan)
+            elif self.fill == FILL_NAN:
+                X[:, j] = pd.to_numeric(col, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                X[:, j] = fill
+        return X
+
+    def impute(self, X):
+        if self.imputer is None:
+            return X
+        if self._impute is None:
+            if hasattr(self.imputer, "transform"):
+                X[:] = self.imputer.transform(X)
+            else:
+                X[np.isnan(X)] = 0.0
+            return X
+        missing = np.isnan(X)
+        if missing.any():
+            self._impute(X, missing)
+        return X
+
+    def scale(self, X):
+        if self.scaler is None:
+            return X
+        if self._scale is None:
+            X[:] = self.scaler.transform(X)
+            return X
+        return self._scale.apply(X)
+
+    def transform(self, df):
+        return self.scale(self.impute(self.align(df)))
+
+
+def pipeline(bundle, fill=FILL_NAN):
+    """Build a bundle's pipeline once and keep it on the bundle."""
+    pipe = bundle._pipeline
+    if pipe is None:
+        imputer = bundle.get("imputer")
+        scaler = bundle.get("scaler")
+        models = [bundle.get(name) for name in ("model", "xgb_model", "lgb_model") if bundle.get(name) is not None]
+        xgb_only = all(hasattr(m, "get_booster") for m in models)
+        exact_in_float32 = scaler is None and (imputer is None or isinstance(imputer, (SimpleImputer, SimpleImputation)))
+        dtype = bundle.dtype or (np.float32 if xgb_only and exact_in_float32 else np.float64)
+        pipe = bundle._pipeline = FeaturePipeline(bundle["features"], imputer, scaler, fill, dtype, bundle.skip_features)
+    return pipe
+
+
+def encode_labels(classes, values):
+    """Position of each value in classes, -1 when unknown (vectorized)."""
+    return pd.Index(np.asarray(classes)).get_indexer(pd.Index(values))
@@ -0,0 +1,248 @@
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import inc, register_collector
+from jobs import available_formats, get_job, result_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow responses and the on-disk copies are optional
+    pa = pq = None
+
+# -------- CONFIG --------
+# scored batches (bulk /predict uploads, finished jobs) held in memory for the /results queries
+RESULTS_KEPT = int(os.environ.get("RESULTS_KEPT", 8))
+# /predict results are also written here before their id is returned, so every serve.py worker
+# can answer for them
+RESULTS_DIR = os.environ.get("RESULTS_DIR", "results")
+RESULTS_DIR_KEPT = int(os.environ.get("RESULTS_DIR_KEPT", 64))
+PAGE_ROWS = 100
+MAX_PAGE_ROWS = 10_000
+HISTOGRAM_BINS = 20
+MAX_HISTOGRAM_BINS = 1000
+TOP_K = 10
+JSON_PRECISION = 15  # significant digits of floats in JSON (pandas' encoder maximum)
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# ------------------------
+
+# الدوشبوردات بتسأل السيرفر (صفحة، histogram، counts، top-K) بدل ما تستلم الجدول كله:
+# حجم الرد ثابت مهما كان عدد الصفوف، والـ JSON بيتعمل column by column من غير object لكل خلية
+
+
+class ResultStore:
+    """LRU of scored frames by result id (a /predict result or a job id), loaded from disk on a miss."""
+
+    def __init__(self, max_results=RESULTS_KEPT):
+        self.max_results = max_results
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, df, **meta):
+        """Keep a scored frame; it is on disk before its id is handed out (blocking: not on the event loop)."""
+        result_id = uuid.uuid4().hex
+        self._put(result_id, df, meta)
+        if pq is not None and RESULTS_DIR:
+            self._persist(result_id, df, meta)
+        return result_id
+
+    def get(self, result_id):
+        """(df, meta) or None when the id is neither held, on disk, nor a finished job."""
+        with self._lock:
+            if result_id in self._frames:
+                self._frames.move_to_end(result_id)
+                inc("result_store_hits_total")
+                return self._frames[result_id]
+        loaded = self._load(result_id)
+        if loaded is not None:
+            inc("result_store_loads_total")
+            self._put(result_id, *loaded)
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            frames = list(self._frames.values())
+        return {
+            "results": len(frames),
+            "rows": sum(len(df) for df, _ in frames),
+            "bytes": int(sum(df.memory_usage(deep=False).sum() for df, _ in frames)),
+        }
+
+    def _put(self, result_id, df, meta):
+        with self._lock:
+            self._frames[result_id] = (df, meta)
+            self._frames.move_to_end(result_id)
+            while len(self._frames) > self.max_results:
+                self._frames.popitem(last=False)
+
+    def _persist(self, result_id, df, meta):
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{result_id}.parquet")
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"result": json.dumps(meta).encode()})
+            pq.write_table(table, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OSError):
+            # mixed-type columns: the result stays queryable from this worker only
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            return
+        kept = sorted((e for e in os.scandir(RESULTS_DIR) if e.name.endswith(".parquet")), key=lambda e: e.stat().st_mtime)
+        for entry in kept[:-RESULTS_DIR_KEPT]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _load(self, result_id):
+        path = os.path.join(RESULTS_DIR, f"{result_id}.parquet")
+        if pq is not None and os.path.exists(path):
+            table = pq.read_table(path, memory_map=True)
+            meta = json.loads((table.schema.metadata or {}).get(b"result", b"{}"))
+            return table.to_pandas(), meta
+
+        job = get_job(result_id)
+        if job is None or job["status"] != "done":
+            return None
+        formats = available_formats(job)
+        meta = {"mission": job["mission"], "version": job["version"], "source": "job"}
+        if "parquet" in formats:
+            return pq.read_table(result_path(job, "parquet"), memory_map=True).to_pandas(), meta
+        if "ndjson" in formats:
+            return pd.read_json(result_path(job, "ndjson"), lines=True), meta
+        return None
+
+
+result_store = ResultStore()
+
+
+# ======================================================
+# Queries (each returns a small payload, whatever the size of the result)
+# ======================================================
+def _column(df, name):
+    if name not in df.columns:
+        raise ValueError(f"Unknown column '{name}'. Available: {list(df.columns)}")
+    return df[name]
+
+
+def _filtered(df, prediction=None):
+    """The rows of one predicted class (every row when prediction is None)."""
+    if prediction is None:
+        return df
+    return df[_column(df, "prediction").astype(str) == prediction]
+
+
+def describe(df, meta):
+    return {
+        **meta,
+        "rows": len(df),
+        "columns": [{"name": str(c), "dtype": str(t)} for c, t in df.dtypes.items()],
+    }
+
+
+def page(df, cursor=None, limit=PAGE_ROWS, columns=None, prediction=None):
+    """
+    Rows [cursor, cursor + limit) of the (filtered) result; next_cursor is None on the last page.
+    The cursor is the position in the filtered rows, so pages stay stable while nothing is re-scored.
+    """
+    start = int(cursor or 0)
+    limit = max(1, min(int(limit), MAX_PAGE_ROWS))
+    if start < 0:
+        raise ValueError("cursor must be >= 0")
+    rows = _filtered(df, prediction)
+    if columns:
+        rows = rows[[_column(df, c).name for c in columns]]
+    end = min(start + limit, len(rows))
+    meta = {"cursor": str(start), "next_cursor": str(end) if end < len(rows) else None, "total": len(rows)}
+    return meta, rows.iloc[start:end]
+
+
+def histogram(df, column, bins=HISTOGRAM_BINS, lo=None, hi=None, prediction=None):
+    """Counts per bin of a numeric column (NaN / inf counted apart), or per value of any other column."""
+    values = _column(_filtered(df, prediction), column)
+    bins = max(1, min(int(bins), MAX_HISTOGRAM_BINS))
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        x = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = np.isfinite(x)
+        x = x[finite]
+        value_range = None
+        if lo is not None or hi is not None:
+            # an open end takes the data's own bound
+            lo = float(lo) if lo is not None else (float(x.min()) if len(x) else 0.0)
+            hi = float(hi) if hi is not None else (float(x.max()) if len(x) else lo + 1.0)
+            if hi <= lo:
+                raise ValueError("max must be greater than min")
+            value_range = (lo, hi)
+        counts, edges = np.histogram(x, bins=bins, range=value_range)
+        return {"column": column, "kind": "numeric", "edges": edges.tolist(), "counts": counts.tolist(),
+                "missing": int((~finite).sum()), "rows": len(values)}
+
+    counts = values.astype(object).where(values.notna(), None).value_counts(dropna=False)
+    shown = counts.head(bins)
+    return {"column": column, "kind": "categorical",
+            "values": [None if v is None else str(v) for v in shown.index], "counts": shown.tolist(),
+            "other": int(counts.iloc[bins:].sum()), "rows": len(values)}
+
+
+def counts(df, column="prediction"):
+    values = _column(df, column)
+    return {"column": column, "rows": len(values),
+            "counts": {str(k): int(v) for k, v in values.value_counts(dropna=True).items()},
+            "missing": int(values.isna().sum())}
+
+
+def top_k(df, column, k=TOP_K, columns=None, prediction=None):
+    """The k rows with the highest values of a numeric column (NaN last), highest first."""
+    rows = _filtered(df, prediction)
+    values = _column(rows, column)
+    if not pd.api.types.is_numeric_dtype(values):
+        raise ValueError(f"Column '{column}' is not numeric")
+    k = max(1, min(int(k), MAX_PAGE_ROWS, len(rows))) if len(rows) else 0
+    x = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    x = np.where(np.isnan(x), -np.inf, x)
+    # argpartition: O(n) for the k best, then only those k are sorted (stable, so ties keep row order)
+    best = np.argpartition(-x, k - 1)[:k] if 0 < k < len(x) else np.arange(len(x))
+    best = best[np.lexsort((best, -x[best]))]
+    out = rows.iloc[best]
+    if columns:
+        out = out[[_column(df, c).name for c in columns]]
+    return {"column": column, "k": k, "total": len(rows)}, out
+
+
+# ======================================================
+# Encoding: pandas' C encoder per column instead of a Python object per cell
+# ======================================================
+def to_json(meta, frame=None, key="rows"):
+    """meta as a JSON object, with frame (if any) encoded as a list of records under `key`."""
+    body = json.dumps(meta)
+    if frame is None:
+        return body
+    records = frame.to_json(orient="records", date_format="iso", double_precision=JSON_PRECISION)
+    return f'{body[:-1]}{", " if meta else ""}"{key}": {records}}}'
+
+
+def to_arrow(frame):
+    """The frame as an Arrow IPC stream (columns as they are, no text encoding)."""
+    if pa is None:
+        raise ValueError("Arrow responses need pyarrow")
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _result_metrics():
+    stats = result_store.stats()
+    yield "result_store_results", "gauge", "Scored results held in memory for /results queries", {}, stats["results"]
+    yield "result_store_bytes", "gauge", "Memory of the scored results held for /results queries", {}, stats["bytes"]
+
+
+register_collector(_result_metrics)
@@ -0,0 +1,218 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from threadpoolctl import threadpool_limits
+
+from instrumentation import register_collector
+
+# -------- CONFIG --------
+# python serve.py: a supervisor imports the app and loads the model bundles once, then forks the
+# workers. They share those pages copy-on-write, so a worker costs what it allocates while serving
+# instead of a full copy of the libraries and models (uvicorn --workers spawns fresh interpreters).
+SERVE_HOST = os.environ.get("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.environ.get("SERVE_PORT", 8000))
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", 2))
+# missions whose default bundle (and compiled engine) is loaded before forking
+SERVE_PRELOAD = [m for m in os.environ.get("SERVE_PRELOAD", "kepler,k2,tess").split(",") if m]
+# also preload in every process that starts the app (plain uvicorn, each --workers process on its own)
+PRELOAD_ON_STARTUP = os.environ.get("PRELOAD_ON_STARTUP", "0") == "1"
+SERVE_LOG_LEVEL = os.environ.get("SERVE_LOG_LEVEL", "info")
+RESTART_DELAY = 1.0  # seconds before a worker that died is replaced
+# set by the supervisor, read by the workers to find each other
+SUPERVISOR_ENV = "SERVE_SUPERVISOR_PID"
+# ------------------------
+
+# كل worker بيورث الموديلات من الـ supervisor بالـ fork بدل ما يحملها تاني،
+# والصفحات دي بتفضل مشتركة طول ما محدش بيكتب فيها
+
+logger = logging.getLogger(__name__)
+
+
+# ======================================================
+# 🧠 Preloading
+# ======================================================
+def preload(missions=SERVE_PRELOAD):
+    """Load the default bundle of each mission and compile its ensemble; returns seconds per mission."""
+    from model_registry import registry
+    from tree_engine import compiled
+
+    seconds = {}
+    for mission in missions:
+        start = time.perf_counter()
+        compiled(registry.get(mission))
+        seconds[mission] = round(time.perf_counter() - start, 3)
+    return seconds
+
+
+# ======================================================
+# 📏 Per-process memory
+# ======================================================
+def process_memory(pid):
+    """RSS, PSS (shared pages split between their users), shared and private bytes of one process."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss", 0),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def child_pids(parent):
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name may contain spaces, the fields after ")" never do
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == parent:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def memory_report(root=None):
+    """
+    Memory of the serving processes: the supervisor and its workers when run by serve.py
+    (or of the tree under `root`), otherwise of this process alone.
+    Summed RSS counts shared pages once per worker; summed PSS is what they really cost.
+    """
+    root = root or int(os.environ.get(SUPERVISOR_ENV, 0)) or None
+    workers = child_pids(root) if root else [os.getpid()]
+    report = {
+        "mode": "shared" if os.environ.get(SUPERVISOR_ENV) else "single",
+        "supervisor": {"pid": root, **(process_memory(root) or {})} if root else None,
+        "workers": [],
+    }
+    for pid in workers:
+        memory = process_memory(pid)
+        if memory is not None:
+            report["workers"].append({"pid": pid, "current": pid == os.getpid(), **memory})
+    processes = report["workers"] + ([report["supervisor"]] if root else [])
+    report["total"] = {
+        "processes": len(processes),
+        "rss_bytes": sum(p.get("rss_bytes", 0) for p in processes),
+        "pss_bytes": sum(p.get("pss_bytes", 0) for p in processes),
+    }
+    return report
+
+
+def _memory_metrics():
+    for worker in memory_report()["workers"]:
+        labels = {"pid": worker["pid"]}
+        yield "serving_worker_rss_bytes", "gauge", "Resident memory of each serving worker", labels, worker["rss_bytes"]
+        yield "serving_worker_pss_bytes", "gauge", "Proportional (shared pages split) memory of each serving worker", labels, worker["pss_bytes"]
+
+
+register_collector(_memory_metrics)
+
+
+# ======================================================
+# 🚀 Supervisor
+# ======================================================
+def _bind(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock, log_level):
+    import uvicorn
+
+    # uvicorn installs its own SIGINT / SIGTERM handlers for a graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def _fork_worker(app, sock, log_level):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, log_level)
+        except BaseException:
+            logger.exception("worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, workers=SERVE_WORKERS, missions=SERVE_PRELOAD, log_level=SERVE_LOG_LEVEL):
+    os.environ[SUPERVISOR_ENV] = str(os.getpid())
+    from main import app
+    from startup import load_deferred
+    load_deferred()  # the modules main.py defers, imported once here instead of in every worker
+    import lightgbm  # noqa: F401 (loaded lazily by the bundles; its OpenMP runtime must be loaded before the limit below)
+
+    # an OpenMP thread pool started before fork() hangs the first parallel region of every child
+    # (libgomp): the supervisor stays single-threaded, each worker starts its own pool
+    with threadpool_limits(limits=1, user_api="openmp"):
+        loaded = preload(missions)
+    logger.info("preloaded %s", loaded)
+    sock = _bind(host, port)
+    # objects that exist now are never collected: the gc then leaves their pages (and the sharing) alone
+    gc.collect()
+    gc.freeze()
+
+    children = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        children.add(_fork_worker(app, sock, log_level))
+    logger.info("serving on %s:%d with %d workers %s", host, port, workers, sorted(children))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in children:
+            continue
+        children.discard(pid)
+        if stopping:
+            continue
+        logger.warning("worker %d exited (status %d), starting a new one", pid, status)
+        time.sleep(RESTART_DELAY)
+        if not stopping:
+            children.add(_fork_worker(app, sock, log_level))
+    sock.close()
+
+
+if __name__ == "__main__":
+    # python serve.py [workers]  (cd backend first, like uvicorn main:app)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    serve(workers=int(sys.argv[1]) if len(sys.argv) > 1 else SERVE_WORKERS)
@@ -0,0 +1,180 @@
+import functools
+import importlib
+import logging
+import os
+import threading
+import time
+import types
+
+from instrumentation import register_collector
+
+# -------- CONFIG --------
+# How the app comes up (main.py imports only FastAPI and the stdlib; pandas, sklearn, xgboost and
+# the mission modules are deferred):
+#   "background": the app binds at once and a thread imports the deferred modules; /healthz and
+#                 /readyz answer meanwhile, other requests wait for the warm-up to finish
+#   "lazy":       no warm-up: the first request of a route imports the deferred modules that route
+#                 uses (modules_used) and the bundles it scores with load on first use
+#   "blocking":   startup returns once the warm-up is done (the app binds warm, as before)
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "background")
+STARTUP_MODES = ("background", "lazy", "blocking")
+# ------------------------
+
+# السيرفر بيرد على الـ health checks فورًا والمكتبات التقيلة بتتحمل في الخلفية أو عند أول استخدام،
+# و /readyz بيقول إمتى الـ warm-up خلص (الـ replicas الجديدة بتدخل الخدمة أسرع)
+
+logger = logging.getLogger(__name__)
+
+_import_lock = threading.RLock()
+_deferred = []
+import_seconds = {}  # module -> seconds its import took (what it added on top of the ones before)
+
+
+class DeferredModule:
+    """A module imported on first attribute access (or by the warm-up), not where it is named."""
+
+    def __init__(self, name, warm=True):
+        self._name = name
+        self._warm = warm
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        if self._module is None:
+            with _import_lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    import_seconds.setdefault(self._name, time.perf_counter() - start)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<deferred module '{self._name}' ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def deferred(name, warm=True):
+    """
+    A stand-in for `import name`. warm=False leaves it out of the warm-up: it is imported on
+    first use only (training-only modules on inference workers).
+    """
+    module = DeferredModule(name, warm)
+    _deferred.append(module)
+    return module
+
+
+def load_deferred():
+    """Import every warm deferred module now (serve.py's supervisor does, so its workers share them)."""
+    for module in _deferred:
+        if module._warm:
+            module.load()
+
+
+@functools.lru_cache(maxsize=None)
+def modules_used(fn):
+    """
+    The deferred modules fn refers to by global name: in its own code, its nested functions and
+    lambdas, and the functions of its module it calls (what a route needs imported to run).
+    """
+    namespace = fn.__globals__
+    found, seen, todo = [], set(), [fn.__code__]
+    while todo:
+        code = todo.pop()
+        if code in seen:
+            continue
+        seen.add(code)
+        todo.extend(c for c in code.co_consts if isinstance(c, types.CodeType))
+        for name in code.co_names:
+            value = namespace.get(name)
+            if isinstance(value, DeferredModule) and value not in found:
+                found.append(value)
+            elif isinstance(value, types.FunctionType) and value.__globals__ is namespace:
+                todo.append(value.__code__)
+    return tuple(found)
+
+
+class Warmup:
+    """The deferred imports, then any registered task (model preloading), run once per process."""
+
+    def __init__(self):
+        self.state = "pending"  # pending -> warming -> ready | failed
+        self.error = None
+        self.started_at = None
+        self.seconds = None
+        self.tasks = {}  # name -> result
+        self._tasks = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def add_task(self, name, fn):
+        self._tasks.append((name, fn))
+
+    def start(self):
+        """Run in a background thread (no-op once started)."""
+        if self.state == "pending":
+            threading.Thread(target=self.run, name="warmup", daemon=True).start()
+
+    def run(self):
+        """Warm up, or wait for the warm-up already running; True when it succeeded."""
+        with self._lock:
+            owner = self.state == "pending"
+            if owner:
+                self.state = "warming"
+                self.started_at = time.time()
+        if not owner:
+            self._done.wait()
+            return self.ready
+
+        start = time.perf_counter()
+        try:
+            load_deferred()
+            for name, fn in self._tasks:
+                self.tasks[name] = fn()
+            self.state = "ready"
+        except Exception as e:
+            # requests go ahead anyway and fail on the module that did not import, with its error
+            logger.exception("warm-up failed")
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = "failed"
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._done.set()
+        logger.info("warm-up %s in %.2fs", self.state, self.seconds)
+        return self.ready
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "mode": STARTUP_MODE,
+            "error": self.error,
+            "started_at": self.started_at,
+            "seconds": round(self.seconds, 4) if self.seconds is not None else None,
+            "modules": {m._name: m.loaded for m in _deferred},
+            "import_seconds": {name: round(s, 4) for name, s in import_seconds.items()},
+            "tasks": self.tasks,
+        }
+
+
+warmup = Warmup()
+
+
+def _startup_metrics():
+    yield "startup_ready", "gauge", "1 once the warm-up (deferred imports, preloading) has finished", {}, int(warmup.ready)
+    if warmup.seconds is not None:
+        yield "startup_warmup_seconds", "gauge", "Time the warm-up took", {}, warmup.seconds
+    for name, seconds in list(import_seconds.items()):
+        yield "startup_import_seconds", "gauge", "Import time of each deferred module", {"module": name}, seconds
+
+
+register_collector(_startup_metrics)
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import catalog_store
+from metrics import MetricsAccumulator
+from model_registry import get_bundle
+from kepler_model import predict_batch as predict_batch_kepler
+from k2_model import predict_batch_k2
+from tess_model import predict_batch_tess, LABEL_COLUMN as TESS_LABEL_COLUMN
+
+# -------- CONFIG --------
+CHUNK_ROWS = int(os.environ.get("PREDICT_CHUNK_ROWS", 50_000))
+# uploads bigger than this are always streamed, even without stream=true
+STREAM_THRESHOLD_BYTES = int(os.environ.get("PREDICT_STREAM_THRESHOLD_BYTES", 64 * 1024 * 1024))
+SAMPLE_SIZE = 10
+# /predict/multi scores the missions side by side on this many threads (the models release the GIL)
+MULTI_WORKERS = int(os.environ.get("PREDICT_MULTI_WORKERS", 3))
+# identifier columns carried into the merged multi-mission table when the upload has them
+ID_COLUMNS = ["kepid", "kepoi_name", "kepler_name", "pl_name", "epic_hostname", "toi", "tid"]
+# ------------------------
+
+_multi_pool = None
+_multi_pool_lock = threading.Lock()
+
+BATCH_PREDICTORS = {
+    "kepler": predict_batch_kepler,
+    "k2": predict_batch_k2,
+    "tess": predict_batch_tess,
+}
+
+LABEL_COLUMNS = {
+    "kepler": "koi_disposition",
+    "k2": "disposition",
+    "tess": TESS_LABEL_COLUMN,
+}
+
+
+def required_columns(mission, bundle):
+    """Model features plus the label column: all a batch needs to be scored and evaluated."""
+    return list(bundle["features"]) + [LABEL_COLUMNS[mission]]
+
+
+def prob_columns(classes):
+    return [f"prob_{str(c).lower().replace(' ', '_')}" for c in classes]
+
+
+class PredictionSummary:
+    """Counts, metrics (confusion matrix + curves) and head sample, accumulated one scored batch at a time."""
+
+    def __init__(self, mission, n_classes, sample_size=SAMPLE_SIZE):
+        self.mission = mission
+        self.n_classes = n_classes
+        self.sample_size = sample_size
+        self.counts = Counter()
+        self.metrics = MetricsAccumulator(n_classes)
+        self.sample = []
+        self.rows = 0
+
+    def update(self, df_out, y_true, y_pred, probs=None):
+        self.metrics.update(y_true, y_pred, probs)
+        self._add_rows(df_out)
+
+    def merge(self, df_out, metrics):
+        """A batch whose metrics were accumulated elsewhere (a pool worker)."""
+        self.metrics.merge(metrics)
+        self._add_rows(df_out)
+
+    def _add_rows(self, df_out):
+        self.rows += len(df_out)
+        self.counts.update(df_out["prediction"].astype(str).str.title().value_counts().to_dict())
+        if len(self.sample) < self.sample_size:
+            head = df_out.head(self.sample_size - len(self.sample))
+            self.sample.extend(head.replace({np.nan: None}).to_dict(orient="records"))
+
+    def result(self):
+        return {
+            "mission": self.mission,
+            "rows": self.rows,
+            "counts": dict(self.counts.most_common()),
+            "metrics": self.metrics.result(),
+            "sample": self.sample,
+        }
+
+
+def predict_frames(frames, mission, bundle, sample_size=SAMPLE_SIZE):
+    """Score an iterable of DataFrames with one bundle and summarize them."""
+    predict_batch = BATCH_PREDICTORS[mission]
+    summary = PredictionSummary(mission, len(bundle["label_encoder"].classes_), sample_size)
+    for frame in frames:
+        df_out, y_true, y_pred, probs = predict_batch(frame, bundle)
+        summary.update(df_out, y_true, y_pred, probs)
+    return summary.result()
+
+
+def stream_predict(source, mission, version=None, chunk_rows=CHUNK_ROWS, sample_size=SAMPLE_SIZE, profile=None):
+    """
+    Score a CSV (path or file object) chunk by chunk so peak memory follows chunk_rows, not file size.
+    Returns the same shape as the /predict response body: counts, metrics and a head sample.
+    """
+    mission = mission.lower()
+    if mission not in BATCH_PREDICTORS:
+        raise ValueError(f"Streaming is not supported for mission '{mission}'")
+
+    # the same bundle for every chunk, even if the registry evicts or reloads meanwhile
+    bundle = get_bundle(mission, version, profile)
+    return predict_frames(pd.read_csv(source, chunksize=chunk_rows), mission, bundle, sample_size)
+
+
+def predict_catalog(name, mission, version=None, chunk_rows=CHUNK_ROWS, sample_size=SAMPLE_SIZE):
+    """Score a stored catalog, reading only the model's feature columns and the label."""
+    mission = mission.lower()
+    if mission not in BATCH_PREDICTORS:
+        raise ValueError(f"Catalog scoring is not supported for mission '{mission}'")
+    bundle = get_bundle(mission, version)
+    frames = catalog_store.iter_frames(name, required_columns(mission, bundle), chunk_rows)
+    return predict_frames(frames, mission, bundle, sample_size)
+
+
+# ======================================================
+# Multi-mission fan-out
+# ======================================================
+def _get_multi_pool():
+    global _multi_pool
+    with _multi_pool_lock:
+        if _multi_pool is None:
+            _multi_pool = ThreadPoolExecutor(max_workers=MULTI_WORKERS, thread_name_prefix="multi")
+        return _multi_pool
+
+
+def _multi_missions(missions):
+    missions = [m.lower() for m in (missions or BATCH_PREDICTORS)]
+    unknown = [m for m in missions if m not in BATCH_PREDICTORS]
+    if unknown:
+        raise ValueError(f"Mission(s) not supported: {unknown}. Available: {list(BATCH_PREDICTORS)}")
+    return missions
+
+
+def multi_columns(missions=None, versions=None):
+    """Columns one parse of the upload needs for all the missions: features, labels and ids."""
+    versions = versions or {}
+    columns = set(ID_COLUMNS)
+    for mission in _multi_missions(missions):
+        columns.update(required_columns(mission, get_bundle(mission, versions.get(mission))))
+    return columns
+
+
+def _score_mission(mission, bundle, df, sample_size):
+    start = time.perf_counter()
+    # shallow copy: a mission may add/replace its label column, never the shared values
+    df_out, y_true, y_pred, probs = BATCH_PREDICTORS[mission](df.copy(deep=False), bundle)
+    summary = PredictionSummary(mission, len(bundle["label_encoder"].classes_), sample_size)
+    summary.update(df_out, y_true, y_pred, probs)
+    return summary.result(), np.asarray(y_pred), np.asarray(probs), time.perf_counter() - start
+
+
+def predict_multi(df, missions=None, versions=None, sample_size=SAMPLE_SIZE):
+    """
+    Score one parsed catalog against several missions at once. Every mission picks its own
+    features out of df by name; returns per-mission counts/metrics and one table with every
+    mission's prediction and class probabilities per row.
+    """
+    missions = _multi_missions(missions)
+    versions = versions or {}
+    # one bundle per mission for the whole request, like the streaming path
+    bundles = {m: get_bundle(m, versions.get(m)) for m in missions}
+
+    start = time.perf_counter()
+    pool = _get_multi_pool()
+    futures = {m: pool.submit(_score_mission, m, bundles[m], df, sample_size) for m in missions}
+    scored = {m: f.result() for m, f in futures.items()}
+    wall = time.perf_counter() - start
+
+    table = df[[c for c in ID_COLUMNS if c in df.columns]].copy()
+    results = {}
+    for mission, (summary, y_pred, probs, seconds) in scored.items():
+        bundle = bundles[mission]
+        classes = bundle["label_encoder"].classes_
+        table[f"{mission}_prediction"] = classes[y_pred]
+        for name, col in zip(prob_columns(classes), probs.T):
+            table[f"{mission}_{name}"] = col
+        summary.pop("sample")
+        results[mission] = {**summary, "version": bundle.version, "release": bundle.release,
+                            "seconds": round(seconds, 4)}
+
+    return {
+        "rows": len(df),
+        "missions": results,
+        "wall_seconds": round(wall, 4),
+        "sum_seconds": round(sum(r["seconds"] for r in results.values()), 4),
+        "table": table,
+    }
@@ -0,0 +1,151 @@
+import os
+import logging
+
+import pandas as pd
+
+from model_registry import registry, get_bundle
+from tree_engine import predict_proba as ensemble_proba
+from instrumentation import span, inc
+from preprocessing import pipeline, encode_labels
+from prediction_cache import cached_proba
+from metrics import classification_metrics
+
+# -------- CONFIG --------
+MISSION = "tess"
+OUTPUT_PATH = "predictions_tess.csv"
+LABEL_COLUMN = "tfopwg_disp"
+# TOI catalog columns the TESS model is trained on
+FEATURES = ["pl_orbper", "pl_trandurh", "pl_trandep", "pl_rade", "pl_insol", "pl_eqt",
+            "st_tmag", "st_dist", "st_teff", "st_logg", "st_rad"]
+# TFOPWG dispositions -> the labels Kepler / K2 use
+DISPOSITIONS = {
+    "CP": "CONFIRMED", "KP": "CONFIRMED",
+    "PC": "CANDIDATE", "APC": "CANDIDATE",
+    "FP": "FALSE POSITIVE", "FA": "FALSE POSITIVE",
+    "REFUTED": "FALSE POSITIVE",
+}
+
+# Stand-in model until a trained TESS model is put in models/Tess/:
+# the K2 rows, restricted to the TOI columns K2 also has (sy_dist is the TOI st_dist)
+STANDIN_VERSION = "TessStandin"
+STANDIN_SOURCE = os.environ.get("TESS_STANDIN_SOURCE", "Data_K2.csv")
+STANDIN_RENAME = {"sy_dist": "st_dist", "disposition": LABEL_COLUMN}
+STANDIN_PARAMS = {"n_estimators": 100, "max_depth": 4, "learning_rate": 0.1}
+# ------------------------
+
+# الموديل بيتحمل من الـ registry عند أول طلب؛ لو مفيش موديل TESS متدرب بيتبني الـ stand-in مرة واحدة
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_labels(values):
+    """TFOPWG codes (PC, CP, FP, ...) or full labels -> CONFIRMED / CANDIDATE / FALSE POSITIVE."""
+    values = pd.Series(values, dtype=object).astype(str).str.strip().str.upper()
+    return values.replace(DISPOSITIONS)
+
+
+# ======================================================
+# 🧪 Stand-in model
+# ======================================================
+def train_standin(source=STANDIN_SOURCE, version=STANDIN_VERSION):
+    """Train the stand-in and write it where the registry spec of `version` expects it."""
+    # training-only imports: an inference worker with a trained TESS model never pays for them
+    import joblib
+    from sklearn.impute import SimpleImputer
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+    from xgboost import XGBClassifier
+
+    df = pd.read_csv(source).rename(columns=STANDIN_RENAME)
+    features = [c for c in FEATURES if c in df.columns]
+    y_raw = normalize_labels(df[LABEL_COLUMN])
+
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(y_raw)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[features], y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    imputer = SimpleImputer(strategy="median")
+    X_train = pd.DataFrame(imputer.fit_transform(X_train), columns=features)
+    model = XGBClassifier(**STANDIN_PARAMS, eval_metric="mlogloss", random_state=42, n_jobs=1)
+    model.fit(X_train, y_train)
+    accuracy = accuracy_score(y_test, model.predict(pd.DataFrame(imputer.transform(X_test), columns=features)))
+
+    # every file is written next to its final name and renamed, so a reader never sees half a pickle
+    paths = dict(registry.specs[MISSION]["versions"][version])
+    artifacts = {"model": model, "label_encoder": label_encoder, "features": features, "imputer": imputer}
+    for name, path in paths.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        joblib.dump(artifacts[name], tmp)
+        os.replace(tmp, path)
+
+    logger.info("trained TESS stand-in on %s (%d rows, test accuracy %.4f)", source, len(df), accuracy)
+    return {"rows": len(df), "features": features, "test_accuracy": float(accuracy), "paths": paths}
+
+
+registry.register_builder(MISSION, STANDIN_VERSION, train_standin)
+
+
+# ======================================================
+# 🔮 Prediction
+# ======================================================
+def predict_batch_tess(df: pd.DataFrame, bundle):
+    """
+    تنبؤ batch واحدة بدون metrics (بيستخدمها run_prediction_tess والـ streaming على chunks)
+    بترجع df_out و y_true و y_pred و probs
+    """
+    label_encoder = bundle["label_encoder"]
+    pipe = pipeline(bundle)
+
+    if LABEL_COLUMN in df.columns:
+        y_true = encode_labels(label_encoder.classes_, normalize_labels(df[LABEL_COLUMN]))
+    else:
+        y_true = None
+
+    with span("align", mission=MISSION):
+        X = pipe.align(df)
+
+    def score(X):
+        with span("impute", mission=MISSION):
+            pipe.impute(X)
+        with span("predict_proba", mission=MISSION):
+            return ensemble_proba(bundle, X)
+
+    probs = cached_proba(bundle, X, score)
+    y_pred = probs.argmax(axis=1)
+
+    with span("labels", mission=MISSION):
+        df_out = df.copy()
+        df_out["prediction"] = label_encoder.classes_[y_pred]
+    inc("rows_processed_total", len(df_out), mission=MISSION)
+
+    return df_out, y_true, y_pred, probs
+
+
+def run_prediction_tess(df: pd.DataFrame, version=None, profile=None):
+    """
+    تشغيل التنبؤ باستخدام موديل TESS (أو الـ stand-in لحد ما يتحط موديل متدرب)
+    """
+    try:
+        bundle = get_bundle(MISSION, version, profile)
+        df_out, y_true, y_pred, probs = predict_batch_tess(df, bundle)
+
+        with span("metrics", mission=MISSION):
+            metrics = classification_metrics(y_true, y_pred, probs.shape[1], probs) or None
+
+        return df_out, metrics
+
+    except Exception:
+        logger.exception("run_prediction_tess failed")
+        inc("errors_total", where="run_prediction_tess")
+        raise
+
+
+if __name__ == "__main__":
+    # python tess_model.py  ->  (re)train the stand-in explicitly
+    logging.basicConfig(level=logging.INFO)
+    summary = train_standin()
+    print({k: v for k, v in summary.items() if k != "paths"})
@@ -0,0 +1,7 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# the registry specs and data paths are relative to backend/, as when the API runs
+os.chdir(BACKEND_DIR)
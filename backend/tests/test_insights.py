@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import insights
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """A catalog of a few dozen KB, and a record of the byte offsets insights parses it from."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "kepoi_name": [f"K{i:05d}.01" for i in range(3000)],
+        "koi_prad": rng.uniform(0.5, 6, 3000).round(3),
+        "koi_insol": rng.uniform(0.1, 3, 3000).round(3),
+    })
+    path = str(tmp_path / "catalog.csv")
+    df.to_csv(path, index=False, float_format="%.3f")
+    monkeypatch.setattr(insights, "_cache", {})
+    reads, read_columns = [], insights._read_columns
+
+    def recorded(path, offset=0, columns=None):
+        reads.append(offset)
+        return read_columns(path, offset, columns)
+
+    monkeypatch.setattr(insights, "_read_columns", recorded)
+    return path, df, reads
+
+
+def rewrite(path, df, seconds):
+    # fixed-width values: an edited row keeps its length, so every old byte offset stays in place
+    df.to_csv(path, index=False, float_format="%.3f")
+    os.utime(path, ns=(0, seconds * 10**9))
+
+
+def from_scratch(path):
+    insights._cache.pop(path)
+    return insights.get_insights(path)
+
+
+def test_appended_rows_are_folded_in(catalog):
+    path, df, reads = catalog
+    insights.get_insights(path)
+    extra = pd.DataFrame({"kepoi_name": ["K99999.01"], "koi_prad": [1.0], "koi_insol": [1.0]})
+    rewrite(path, pd.concat([df, extra]), 1)
+
+    payload, etag = insights.get_insights(path)
+    assert reads[-1] > 0
+    assert payload["top_habitable"][0]["planet_id"] == "Candidate_3001"
+    assert (payload, etag) == from_scratch(path)
+
+
+def test_an_edited_row_plus_appended_rows_is_recomputed(catalog):
+    path, df, reads = catalog
+    before, _ = insights.get_insights(path)
+    edited = df.copy()
+    # far before the old end of the file (the last few KB are untouched), with rows appended in the same rewrite
+    edited.loc[0, ["koi_prad", "koi_insol"]] = [1.0, 1.0]
+    extra = pd.DataFrame({"kepoi_name": ["K99999.01"], "koi_prad": [40.0], "koi_insol": [500.0]})
+    rewrite(path, pd.concat([edited, extra]), 1)
+
+    payload, etag = insights.get_insights(path)
+    assert reads[-1] == 0
+    assert payload["top_habitable"][0]["planet_id"] == "Candidate_1"
+    assert payload != before
+    assert (payload, etag) == from_scratch(path)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from metrics import MetricsAccumulator, classification_metrics
+
+
+@pytest.fixture
+def labelled():
+    rng = np.random.default_rng(0)
+    probs = rng.dirichlet(np.ones(3), size=900)
+    y_pred = probs.argmax(axis=1)
+    y_true = np.where(rng.random(900) < 0.8, y_pred, rng.integers(0, 3, 900))
+    return y_true, y_pred, probs
+
+
+def chunks(*arrays, bounds=(0, 250, 251, 600, 900)):
+    return [tuple(a[lo:hi] for a in arrays) for lo, hi in zip(bounds, bounds[1:])]
+
+
+def test_merged_chunks_equal_a_single_pass(labelled):
+    y_true, y_pred, probs = labelled
+    # one accumulator per chunk (as per worker), merged in order and in reverse
+    parts = [MetricsAccumulator(3).update(*chunk) for chunk in chunks(y_true, y_pred, probs)]
+    forward, backward = MetricsAccumulator(3), MetricsAccumulator(3)
+    for part in parts:
+        forward.merge(part)
+    for part in reversed(parts):
+        backward.merge(part)
+
+    single = classification_metrics(y_true, y_pred, 3, probs)
+    assert "curves" in single
+    assert forward.result() == single
+    assert backward.result() == single
+
+
+def test_an_empty_accumulator_merges_as_a_no_op(labelled):
+    y_true, y_pred, probs = labelled
+    merged = MetricsAccumulator(3).merge(MetricsAccumulator(3).update(y_true, y_pred, probs))
+    merged.merge(MetricsAccumulator(3))
+    assert merged.result() == classification_metrics(y_true, y_pred, 3, probs)
+
+
+def test_one_unlabelled_chunk_drops_the_metrics(labelled):
+    y_true, y_pred, probs = labelled
+    first, second = chunks(y_true, y_pred, probs, bounds=(0, 450, 900))
+    unlabelled = MetricsAccumulator(3).update(None, second[1], second[2])
+    assert MetricsAccumulator(3).update(*first).merge(unlabelled).result() == {}
+
+
+def test_a_chunk_without_probabilities_drops_only_the_curves(labelled):
+    y_true, y_pred, probs = labelled
+    first, second = chunks(y_true, y_pred, probs, bounds=(0, 450, 900))
+    merged = MetricsAccumulator(3).update(*first).merge(MetricsAccumulator(3).update(*second[:2]))
+    assert merged.result() == classification_metrics(y_true, y_pred, 3)
+    assert "curves" not in merged.result()
@@ -0,0 +1,42 @@
+import os
+
+import joblib
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+import model_export
+import model_registry
+
+
+@pytest.fixture
+def exported(tmp_path, monkeypatch):
+    """A one-version mission with its pickles in tmp_path, exported to a native dir there too."""
+    paths = {"label_encoder": str(tmp_path / "label_encoder.pkl"), "features": str(tmp_path / "features.pkl")}
+    joblib.dump(LabelEncoder().fit(["CANDIDATE", "CONFIRMED"]), paths["label_encoder"])
+    joblib.dump(["koi_period", "koi_prad"], paths["features"])
+    monkeypatch.setitem(model_registry.BUNDLE_SPECS, "test", {"default": "Test", "versions": {"Test": paths}})
+    monkeypatch.setattr(model_registry, "NATIVE_DIR", str(tmp_path / "native"))
+    monkeypatch.setattr(model_registry, "RELEASES_DIR", str(tmp_path / "releases"))
+    model_export.export_bundle("test", "Test", str(tmp_path / "native"))
+    return model_registry.ModelRegistry(model_registry.BUNDLE_SPECS), paths
+
+
+def test_native_export_is_served(exported):
+    registry, paths = exported
+    served, _ = registry.paths("test")
+    assert all(path.startswith(model_registry.NATIVE_DIR) for path in served.values())
+    assert registry.get("test")["features"] == ["koi_period", "koi_prad"]
+
+
+def test_rewritten_identical_pickle_keeps_the_export(exported):
+    registry, paths = exported
+    joblib.dump(["koi_period", "koi_prad"], paths["features"])
+    os.utime(paths["features"], ns=(0, 0))
+    assert registry.paths("test")[0]["features"].startswith(model_registry.NATIVE_DIR)
+
+
+def test_replaced_pickle_is_served_instead_of_a_stale_export(exported):
+    registry, paths = exported
+    joblib.dump(["koi_period", "koi_prad", "koi_teq"], paths["features"])
+    assert registry.paths("test")[0] == paths
+    assert registry.get("test")["features"] == ["koi_period", "koi_prad", "koi_teq"]
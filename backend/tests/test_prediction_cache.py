@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import model_registry
+import prediction_cache
+from model_registry import ModelBundle
+from prediction_cache import PredictionCache
+
+
+def bundle(mission="kepler", version="Test", release=None, profile="full"):
+    b = ModelBundle(mission, version, {}, {}, 0.0, 0, None, release)
+    b.profile = profile
+    return b
+
+
+class Scorer:
+    """Fake model: probabilities derived from the row, and a count of the rows it was asked to score."""
+
+    def __init__(self, shift=0.0):
+        self.shift = shift
+        self.scored = 0
+
+    def __call__(self, X):
+        self.scored += len(X)
+        p = 1 / (1 + np.exp(-(np.nansum(X, axis=1) + self.shift)))
+        return np.column_stack([1 - p, p])
+
+
+@pytest.fixture
+def X():
+    X = np.random.default_rng(0).normal(size=(50, 4))
+    X[::5, 1] = np.nan
+    return X
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(prediction_cache, "PREDICTION_CACHE_ENABLED", True)
+
+
+def test_same_bundle_hits(X):
+    cache, score = PredictionCache(max_rows=1000), Scorer()
+    first = cache.proba(bundle(), X, score)
+    np.testing.assert_array_equal(cache.proba(bundle(), X, score), first)
+    assert score.scored == len(X)
+    assert cache.stats()["hits"] == len(X)
+
+
+@pytest.mark.parametrize("changed", [bundle(release="20260101-000000"), bundle(profile="fast"),
+                                     bundle(version="Retrained"), bundle(mission="k2")])
+def test_a_changed_bundle_never_reads_the_old_rows(X, changed):
+    cache = PredictionCache(max_rows=1000)
+    cache.proba(bundle(), X, Scorer())
+    retrained = Scorer(shift=1.0)
+    np.testing.assert_allclose(cache.proba(changed, X, retrained), retrained(X))
+    assert retrained.scored == 2 * len(X)
+
+
+def test_registry_change_drops_only_that_mission(X):
+    registry = model_registry.ModelRegistry(model_registry.BUNDLE_SPECS)
+    cache = PredictionCache(max_rows=1000)
+    registry.on_change(cache.invalidate)
+    cache.proba(bundle(), X, Scorer())
+    cache.proba(bundle(mission="k2"), X, Scorer())
+
+    registry.invalidate("kepler")
+    assert cache.stats()["rows"] == len(X)
+    score = Scorer()
+    cache.proba(bundle(mission="k2"), X, score)
+    assert score.scored == 0
+    cache.proba(bundle(), X, score)
+    assert score.scored == len(X)
+
+
+def test_invalidate_drops_spilled_rows(X, tmp_path):
+    cache = PredictionCache(max_rows=10, spill_path=str(tmp_path / "spill.sqlite"), spill_rows=1000)
+    cache.proba(bundle(), X, Scorer())
+    assert cache.stats()["spill"]["rows"] == len(X) - 10
+
+    cache.invalidate("kepler", "Test")
+    assert cache.stats()["rows"] == 0
+    assert cache.stats()["spill"]["rows"] == 0
+    score = Scorer()
+    cache.proba(bundle(), X, score)
+    assert score.scored == len(X)
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import result_query
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "koi_period": [3.5, np.nan, 12.0, 7.25, 12.0, 1.0],
+        "prediction": ["CONFIRMED", "CANDIDATE", "CONFIRMED", "FALSE POSITIVE", "CANDIDATE", "CONFIRMED"],
+        "prediction_prob_1": [0.9, 0.2, np.nan, 0.1, 0.4, 0.7],
+    })
+
+
+def test_page_walks_every_row_once(df):
+    seen, cursor = [], None
+    while True:
+        meta, rows = result_query.page(df, cursor=cursor, limit=4)
+        seen.extend(rows.index)
+        if meta["next_cursor"] is None:
+            break
+        cursor = meta["next_cursor"]
+    assert seen == list(df.index)
+    assert meta == {"cursor": "4", "next_cursor": None, "total": 6}
+
+
+@pytest.mark.parametrize("frame, prediction", [("empty", None), ("full", "NOT A CLASS")])
+def test_page_of_no_rows(df, frame, prediction):
+    source = df.iloc[:0] if frame == "empty" else df
+    meta, rows = result_query.page(source, prediction=prediction, columns=["koi_period"])
+    assert meta == {"cursor": "0", "next_cursor": None, "total": 0}
+    assert rows.empty and list(rows.columns) == ["koi_period"]
+    assert json.loads(result_query.to_json(meta, rows))["rows"] == []
+
+
+def test_page_past_the_end_is_empty(df):
+    meta, rows = result_query.page(df, cursor=50, limit=10)
+    assert rows.empty and meta["next_cursor"] is None and meta["total"] == 6
+    with pytest.raises(ValueError):
+        result_query.page(df, cursor=-1)
+
+
+def test_top_k_larger_than_the_rows_returns_them_all_sorted(df):
+    meta, rows = result_query.top_k(df, "koi_period", k=100)
+    assert meta == {"column": "koi_period", "k": 6, "total": 6}
+    # ties keep row order, NaN last
+    assert list(rows.index) == [2, 4, 3, 0, 5, 1]
+
+
+def test_top_k_keeps_the_best_k(df):
+    meta, rows = result_query.top_k(df, "prediction_prob_1", k=2, columns=["prediction"])
+    assert meta["k"] == 2 and list(rows.index) == [0, 5] and list(rows.columns) == ["prediction"]
+    _, rows = result_query.top_k(df, "koi_period", k=3, prediction="CONFIRMED")
+    assert list(rows.index) == [2, 0, 5]
+
+
+@pytest.mark.parametrize("frame, prediction", [("empty", None), ("full", "NOT A CLASS")])
+def test_top_k_of_no_rows(df, frame, prediction):
+    source = df.iloc[:0] if frame == "empty" else df
+    meta, rows = result_query.top_k(source, "koi_period", k=5, prediction=prediction)
+    assert meta == {"column": "koi_period", "k": 0, "total": 0}
+    assert rows.empty
+    assert json.loads(result_query.to_json(meta, rows))["rows"] == []
+
+
+def test_top_k_rejects_text_and_unknown_columns(df):
+    with pytest.raises(ValueError, match="not numeric"):
+        result_query.top_k(df, "prediction")
+    with pytest.raises(ValueError, match="Unknown column"):
+        result_query.top_k(df, "koi_prad")
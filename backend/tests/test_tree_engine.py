@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from lightgbm import LGBMClassifier
+from sklearn.datasets import make_classification
+from xgboost import XGBClassifier
+
+import fast_profile
+import tree_engine
+from model_registry import ModelBundle
+from preprocessing import pipeline
+
+
+@pytest.fixture(scope="module")
+def early_stopped():
+    """An early-stopped 3-class model (trees past best_iteration on disk) and rows it never saw."""
+    X, y = make_classification(n_samples=1500, n_features=8, n_informative=5, n_classes=3, random_state=0)
+    X[::7, 2] = np.nan
+    model = XGBClassifier(n_estimators=300, learning_rate=0.3, max_depth=4, early_stopping_rounds=5,
+                          eval_metric="mlogloss", n_jobs=1, random_state=0)
+    model.fit(X[:1000], y[:1000], eval_set=[(X[1000:1200], y[1000:1200])], verbose=False)
+    assert model.best_iteration + 1 < model.get_booster().num_boosted_rounds()
+    bundle = ModelBundle("kepler", "Test", {"model": model, "features": [f"f{i}" for i in range(8)]}, {}, 0.0, 0, None)
+    return bundle, X[1200:]
+
+
+@pytest.fixture(scope="module")
+def binary():
+    """Two-class xgboost and lightgbm models (a skewed prior, so base_score is far from 0.5) and unseen rows."""
+    X, y = make_classification(n_samples=1500, n_features=8, n_informative=5, weights=[0.85], random_state=1)
+    X[::9, 3] = np.nan
+    xgb = XGBClassifier(n_estimators=40, max_depth=4, n_jobs=1, random_state=0).fit(X[:1200], y[:1200])
+    lgb = LGBMClassifier(n_estimators=40, num_leaves=15, n_jobs=1, verbose=-1, random_state=0).fit(X[:1200], y[:1200])
+    return xgb, lgb, X[1200:]
+
+
+def test_served_trees_stop_at_best_iteration(early_stopped):
+    bundle, _ = early_stopped
+    model = bundle["model"]
+    assert tree_engine.compiled(bundle).forest.n_trees == (model.best_iteration + 1) * 3
+
+
+def test_derived_caches_are_not_artifacts(early_stopped):
+    bundle, _ = early_stopped
+    assert tree_engine.compiled(bundle) is tree_engine.compiled(bundle)
+    assert pipeline(bundle) is pipeline(bundle)
+    fast = fast_profile.fast_bundle(bundle)
+    assert fast is fast_profile.fast_bundle(bundle)
+    assert bundle.info()["artifacts"] == fast.info()["artifacts"] == ["features", "model"]
+    # the pruned copy builds its own engine from its own trees
+    assert tree_engine.compiled(fast).forest.n_trees < tree_engine.compiled(bundle).forest.n_trees
+
+
+def test_compiled_matches_native_on_early_stopped_model(early_stopped):
+    bundle, X = early_stopped
+    report = tree_engine.validate(bundle, X)
+    assert report["ok"], report
+    # single rows go through the compiled engine under "auto": same scores as a large batch
+    np.testing.assert_allclose(tree_engine.predict_proba(bundle, X[:1], backend="auto"),
+                               tree_engine.predict_proba(bundle, X, backend="native")[:1], atol=1e-5)
+
+
+def test_compiled_matches_native_after_native_round_trip(early_stopped, tmp_path):
+    bundle, X = early_stopped
+    bundle["model"].save_model(tmp_path / "model.ubj")
+    model = XGBClassifier()
+    model.load_model(tmp_path / "model.ubj")
+    loaded = ModelBundle("kepler", "Test", {"model": model, "features": bundle["features"]}, {}, 0.0, 0, None)
+    assert tree_engine.validate(loaded, X)["ok"]
+
+
+def test_check_parity_rejects_unused_trees(early_stopped, monkeypatch):
+    bundle, X = early_stopped
+    monkeypatch.setattr(tree_engine, "xgb_served_trees", lambda learner: len(learner["gradient_booster"]["model"]["trees"]))
+    stale = ModelBundle("kepler", "Test", {"model": bundle["model"]}, {}, 0.0, 0, None)
+    with pytest.raises(ValueError, match="disagrees"):
+        tree_engine.check_parity(stale, X)
+
+
+def test_fast_profile_ranks_only_served_trees(early_stopped):
+    bundle, X = early_stopped
+    whole = fast_profile.prune(bundle, keep=1.0)
+    assert whole.pruning["trees"]["model"] == (bundle["model"].best_iteration + 1) * 3
+    np.testing.assert_allclose(tree_engine.predict_proba(whole, X, backend="native"),
+                               tree_engine.predict_proba(bundle, X, backend="native"), atol=1e-6)
+    pruned = fast_profile.prune(bundle, keep=0.5)
+    assert tree_engine.validate(pruned, X)["ok"]
+
+
+@pytest.mark.parametrize("members", [{"model": "xgb"}, {"model": "lgb"}, {"xgb_model": "xgb", "lgb_model": "lgb"}])
+def test_compiled_matches_native_on_binary_models(binary, members):
+    xgb, lgb, X = binary
+    models = {"xgb": xgb, "lgb": lgb}
+    bundle = ModelBundle("k2", "Test", {name: models[kind] for name, kind in members.items()}, {}, 0.0, 0, None)
+    report = tree_engine.validate(bundle, X)
+    assert report["ok"], report
+    # two columns, [P(0), P(1)], for single rows too
+    single = tree_engine.predict_proba(bundle, X[:3], backend="auto")
+    assert single.shape == (3, 2)
+    np.testing.assert_allclose(single, tree_engine.predict_proba(bundle, X[:3], backend="native"), atol=1e-5)
@@ -0,0 +1,755 @@
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from xgboost import XGBClassifier
+
+from model_registry import get_bundle, registry
+from tree_engine import check_parity
+from preprocessing import FeaturePipeline, FILL_NAN, FILL_ZERO, unfitted
+from metrics import confusion_matrix, metrics_from_confusion
+
+# -------- CONFIG --------
+TRAIN_DIR = os.environ.get("TRAIN_JOBS_DIR", "training")
+# cores given to one retrain (candidate fits x xgboost threads per fit)
+TRAIN_WORKERS = int(os.environ.get("TRAIN_WORKERS", os.cpu_count() or 1))
+EARLY_STOPPING_ROUNDS = int(os.environ.get("TRAIN_EARLY_STOPPING_ROUNDS", 20))
+TEST_SIZE = 0.2
+# share of the training split held out for early stopping and for ranking candidates
+VALIDATION_SIZE = 0.2
+HALVING_FACTOR = 3
+SEED = 42
+SEARCH_STRATEGIES = ("grid", "halving")
+DEFAULT_PARAMS = {
+    "kepler": {"learning_rate": 0.1, "max_depth": 6, "n_estimators": 100},
+    "k2": {"learning_rate": 0.05, "max_depth": 6, "n_estimators": 300},
+}
+LABEL_COLUMNS = {"kepler": "koi_disposition", "k2": "disposition"}
+# how columns missing from an upload are filled (K2 trains on a fixed feature list, like it predicts)
+FEATURE_FILL = {"kepler": FILL_NAN, "k2": FILL_ZERO}
+
+# Out-of-core mode (stream=true, or uploads above the threshold): the CSV is read in chunks, the
+# prepared splits are written to disk as float32 chunks and xgboost trains from external-memory
+# quantile pages, so memory follows TRAIN_CHUNK_ROWS instead of the catalog size.
+STREAM_THRESHOLD_BYTES = int(os.environ.get("TRAIN_STREAM_THRESHOLD_BYTES", 256 * 1024 * 1024))
+STREAM_CHUNK_ROWS = int(os.environ.get("TRAIN_CHUNK_ROWS", 100_000))
+# imputers/scalers without an exact one-pass fit (IterativeImputer, RobustScaler medians) are fitted
+# on a uniform reservoir sample of this many training rows (exact when the training split is smaller)
+STREAM_SAMPLE_ROWS = int(os.environ.get("TRAIN_SAMPLE_ROWS", 200_000))
+MAX_BIN = 256
+# held-out rows a new release is scored on by both inference engines before it goes live
+# (tree_engine.check_parity); a release they disagree on is never published
+PARITY_ROWS = int(os.environ.get("TRAIN_PARITY_ROWS", 2000))
+# a job's status and events are also written to <job dir>/status.json (the dir keeps only that file once
+# the job is over), so every serve.py worker answers /retrain/{id} for it; the oldest finished jobs
+# past TRAIN_JOBS_KEPT are forgotten, on disk and in memory
+STATUS_FILE = "status.json"
+TRAIN_JOBS_KEPT = int(os.environ.get("TRAIN_JOBS_KEPT", 64))
+# ------------------------
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = {}
+_jobs_cond = threading.Condition()
+_worker_data = {}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: never fork the threaded API process
+            _executor = ProcessPoolExecutor(max_workers=TRAIN_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+# ======================================================
+# Search space
+# ======================================================
+def _values(value, cast):
+    """A scalar, a list or a comma separated string ("0.05,0.1") -> list of values."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [cast(v) for v in value.split(",") if v.strip()]
+    if isinstance(value, (list, tuple)):
+        return [cast(v) for v in value]
+    return [cast(value)]
+
+
+def param_grid(mission, learning_rate=None, max_depth=None, n_estimators=None):
+    defaults = DEFAULT_PARAMS[mission]
+    axes = {
+        "learning_rate": _values(learning_rate, float) or [defaults["learning_rate"]],
+        "max_depth": _values(max_depth, int) or [defaults["max_depth"]],
+        "n_estimators": _values(n_estimators, int) or [defaults["n_estimators"]],
+    }
+    return [dict(zip(axes, combo)) for combo in itertools.product(*axes.values())]
+
+
+def halving_schedule(n_candidates, factor=HALVING_FACTOR):
+    """[(candidates kept, share of n_estimators)] per round, ending with one candidate at full budget."""
+    rounds = math.ceil(math.log(n_candidates, factor)) + 1 if n_candidates > 1 else 1
+    schedule, kept = [], n_candidates
+    for r in range(rounds):
+        schedule.append((kept, factor ** (r - rounds + 1)))
+        kept = max(1, math.ceil(kept / factor))
+    return schedule
+
+
+# ======================================================
+# Pool workers
+# ======================================================
+def _labels(mission, values):
+    # Merge REFUTED مع FALSE POSITIVE
+    return values.replace("REFUTED", "FALSE POSITIVE") if mission == "k2" else values
+
+
+def _prepare(mission, df, features, preprocessors, data_path, base=None):
+    """
+    Runs in a pool worker: features/labels, train/validation/test split, preprocessing fitted
+    on the training rows only. The result is written once to data_path for every candidate fit.
+    With base (warm start) the served bundle's fitted encoder and preprocessors are reused as-is.
+    """
+    label = LABEL_COLUMNS[mission]
+    y_raw = _labels(mission, df[label])
+    X = df.drop(columns=[label]).select_dtypes(include=[np.number])
+    if features is not None:
+        X = X.reindex(columns=features, fill_value=0 if FEATURE_FILL[mission] == FILL_ZERO else np.nan)
+
+    le = base["label_encoder"] if base else LabelEncoder().fit(y_raw)
+    y = le.transform(y_raw)
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SEED)
+    X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=VALIDATION_SIZE, random_state=SEED)
+
+    fitted = {}
+    if preprocessors:
+        splits = [X_fit, X_valid, X_train, X_test]
+        for name, step in preprocessors.items():
+            if base is None:
+                step = unfitted(step)
+                step.fit(splits[0])
+            splits = [pd.DataFrame(step.transform(s), columns=X.columns, index=s.index) for s in splits]
+            fitted[name] = step
+        X_fit, X_valid, X_train, X_test = splits
+
+    data = {
+        "X_fit": X_fit, "y_fit": y_fit, "X_valid": X_valid, "y_valid": y_valid,
+        "X_train": X_train, "y_train": y_train, "X_test": X_test, "y_test": y_test,
+        "label_encoder": le, "preprocessors": fitted, "features": list(X.columns),
+        "base_model": base["model"] if base else None,
+    }
+    joblib.dump(data, data_path)
+    return {
+        "rows_fit": len(X_fit),
+        "rows_valid": len(X_valid),
+        "rows_test": len(X_test),
+        "features": len(X.columns),
+        "classes": [str(c) for c in le.classes_],
+    }
+
+
+def _load_data(data_path):
+    # every worker reads the prepared splits once per training job
+    if data_path not in _worker_data:
+        _worker_data.clear()
+        _worker_data[data_path] = joblib.load(data_path)
+    return _worker_data[data_path]
+
+
+def _fit_candidate(data_path, params, n_estimators, n_threads, early_stopping_rounds):
+    data = _load_data(data_path)
+    start = time.perf_counter()
+    model = XGBClassifier(
+        n_estimators=n_estimators,
+        learning_rate=params["learning_rate"],
+        max_depth=params["max_depth"],
+        subsample=0.8,
+        colsample_bytree=0.8,
+        random_state=SEED,
+        eval_metric="mlogloss",
+        early_stopping_rounds=early_stopping_rounds or None,
+        n_jobs=n_threads,
+    )
+    base = data["base_model"]
+    model.fit(data["X_fit"], data["y_fit"], eval_set=[(data["X_valid"], data["y_valid"])], verbose=False,
+              xgb_model=base.get_booster() if base is not None else None)
+    if early_stopping_rounds:
+        best_iteration, valid_logloss = int(model.best_iteration) + 1, float(model.best_score)
+    else:
+        best_iteration = n_estimators
+        valid_logloss = float(model.evals_result()["validation_0"]["mlogloss"][-1])
+    return model, {
+        "params": params,
+        "n_estimators": n_estimators,
+        "best_iteration": best_iteration,
+        "valid_logloss": valid_logloss,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+# ======================================================
+# Out-of-core (chunked) training, in pool workers
+# ======================================================
+def _split_codes(n, chunk_index):
+    """0 = fit, 1 = validation, 2 = test; the same rows land in the same split on every pass."""
+    u = np.random.default_rng([SEED, chunk_index]).random(n)
+    codes = np.zeros(n, dtype=np.int8)
+    codes[u < TEST_SIZE + (1 - TEST_SIZE) * VALIDATION_SIZE] = 1
+    codes[u < TEST_SIZE] = 2
+    return codes
+
+
+class _Reservoir:
+    """Uniform sample of at most `size` rows out of a stream of row blocks (algorithm R)."""
+
+    def __init__(self, size, n_features):
+        self.rows = np.empty((size, n_features), dtype=np.float64)
+        self.filled = 0
+        self.seen = 0
+        self._rng = np.random.default_rng(SEED)
+
+    def add(self, X):
+        take = min(len(X), len(self.rows) - self.filled)
+        self.rows[self.filled:self.filled + take] = X[:take]
+        self.filled += take
+        rest = X[take:]
+        if len(rest):
+            seen = np.arange(self.seen + take, self.seen + len(X)) + 1
+            slots = (self._rng.random(len(rest)) * seen).astype(np.int64)
+            keep = slots < len(self.rows)
+            self.rows[slots[keep]] = rest[keep]
+        self.seen += len(X)
+
+    def sample(self):
+        return self.rows[:self.filled]
+
+
+def _prepare_stream(mission, source, features, preprocessors, job_dir, chunk_rows, base=None):
+    """
+    Two passes over the CSV, one chunk in memory at a time. Pass 1: label set, split sizes and a
+    reservoir sample of the fit rows the preprocessors are fitted on. Pass 2: every chunk aligned,
+    imputed, scaled and written to <job_dir>/chunks as float32 X and int y of its split.
+    """
+    label = LABEL_COLUMNS[mission]
+    fill = FEATURE_FILL[mission]
+    chunk_dir = os.path.join(job_dir, "chunks")
+    os.makedirs(chunk_dir, exist_ok=True)
+
+    labels, reservoir, align = set(), None, None
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_rows)):
+        if features is None:
+            # same columns the in-memory path would train on: numeric ones of the first chunk
+            features = list(chunk.drop(columns=[label]).select_dtypes(include=[np.number]).columns)
+        if align is None:
+            align = FeaturePipeline(features, fill=fill)
+            reservoir = _Reservoir(STREAM_SAMPLE_ROWS, len(features))
+        labels.update(_labels(mission, chunk[label]).dropna().unique())
+        fit_rows = _split_codes(len(chunk), i) == 0
+        reservoir.add(align.align(chunk[fit_rows]))
+    if align is None:
+        raise ValueError("The uploaded dataset has no rows")
+
+    le = base["label_encoder"] if base else LabelEncoder().fit(sorted(labels))
+    fitted = {}
+    sample = pd.DataFrame(reservoir.sample(), columns=features)
+    for name, step in (preprocessors or {}).items():
+        if base is None:
+            step = unfitted(step)
+            step.fit(sample)
+        sample = pd.DataFrame(step.transform(sample), columns=features)
+        fitted[name] = step
+    pipe = FeaturePipeline(features, fitted.get("imputer"), fitted.get("scaler"), fill, np.float64)
+
+    rows = [0, 0, 0]
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_rows)):
+        codes = _split_codes(len(chunk), i)
+        y = le.transform(_labels(mission, chunk[label]))
+        X = pipe.transform(chunk).astype(np.float32)
+        for split in range(3):
+            mask = codes == split
+            if mask.any():
+                np.savez(os.path.join(chunk_dir, f"{split}-{i:06d}.npz"), X=X[mask], y=y[mask])
+                rows[split] += int(mask.sum())
+
+    joblib.dump({"label_encoder": le, "preprocessors": fitted, "features": features,
+                 "base_model": base["model"] if base else None}, os.path.join(job_dir, "meta.pkl"))
+    return {
+        "rows_fit": rows[0],
+        "rows_valid": rows[1],
+        "rows_test": rows[2],
+        "features": len(features),
+        "classes": [str(c) for c in le.classes_],
+        "preprocessing_sample_rows": reservoir.filled,
+    }
+
+
+def _chunk_files(job_dir, *splits):
+    chunk_dir = os.path.join(job_dir, "chunks")
+    return sorted(os.path.join(chunk_dir, f) for f in os.listdir(chunk_dir) if int(f.split("-")[0]) in splits)
+
+
+class _ChunkIter(xgb.DataIter):
+    """Feeds the prepared chunk files to xgboost; its pages are cached under cache_prefix on disk."""
+
+    def __init__(self, files, features, cache_prefix):
+        self.files = files
+        self.features = features
+        self._i = 0
+        super().__init__(cache_prefix=cache_prefix, release_data=True)
+
+    def next(self, input_data):
+        if self._i == len(self.files):
+            return False
+        with np.load(self.files[self._i]) as chunk:
+            input_data(data=chunk["X"], label=chunk["y"], feature_names=self.features)
+        self._i += 1
+        return True
+
+    def reset(self):
+        self._i = 0
+
+
+def _load_stream(job_dir):
+    # every worker builds the external-memory matrices once per training job; their pages live in
+    # the worker's own cache dir (not the job dir, which is removed while the worker may still hold them)
+    if job_dir not in _worker_data:
+        _worker_data.clear()  # frees the previous job's matrices and their page files
+        meta = joblib.load(os.path.join(job_dir, "meta.pkl"))
+        cache_dir = os.path.join(TRAIN_DIR, f".cache-{os.getpid()}")
+        os.makedirs(cache_dir, exist_ok=True)
+        prefix = os.path.join(cache_dir, os.path.basename(job_dir))
+        fit = xgb.ExtMemQuantileDMatrix(_ChunkIter(_chunk_files(job_dir, 0), meta["features"], f"{prefix}-fit"),
+                                        max_bin=MAX_BIN)
+        valid = xgb.ExtMemQuantileDMatrix(_ChunkIter(_chunk_files(job_dir, 1), meta["features"], f"{prefix}-valid"),
+                                          max_bin=MAX_BIN, ref=fit)
+        _worker_data[job_dir] = {**meta, "fit": fit, "valid": valid}
+    return _worker_data[job_dir]
+
+
+def _fit_candidate_stream(job_dir, params, n_estimators, n_threads, early_stopping_rounds):
+    data = _load_stream(job_dir)
+    start = time.perf_counter()
+    n_classes = len(data["label_encoder"].classes_)
+    booster_params = {
+        "learning_rate": params["learning_rate"],
+        "max_depth": params["max_depth"],
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "seed": SEED,
+        "tree_method": "hist",
+        "max_bin": MAX_BIN,
+        "nthread": n_threads,
+        "eval_metric": "mlogloss" if n_classes > 2 else "logloss",
+    }
+    if n_classes > 2:
+        booster_params.update(objective="multi:softprob", num_class=n_classes)
+    else:
+        booster_params["objective"] = "binary:logistic"
+    base = data["base_model"]
+
+    evals_result = {}
+    booster = xgb.train(booster_params, data["fit"], num_boost_round=n_estimators,
+                        evals=[(data["valid"], "validation")], evals_result=evals_result,
+                        early_stopping_rounds=early_stopping_rounds or None, verbose_eval=False,
+                        xgb_model=base.get_booster() if base is not None else None)
+    # served like any other release: an XGBClassifier (classes, feature names, best_iteration kept)
+    model = XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    if early_stopping_rounds:
+        best_iteration, valid_logloss = int(booster.best_iteration) + 1, float(booster.best_score)
+    else:
+        best_iteration = booster.num_boosted_rounds()
+        valid_logloss = float(evals_result["validation"][booster_params["eval_metric"]][-1])
+    return model, {
+        "params": params,
+        "n_estimators": n_estimators,
+        "best_iteration": best_iteration,
+        "valid_logloss": valid_logloss,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def _confusion(model, files, n_classes):
+    cm = np.zeros((n_classes, n_classes), dtype=np.int64)
+    for path in files:
+        with np.load(path) as chunk:
+            cm += confusion_matrix(chunk["y"], model.predict(chunk["X"]), n_classes)
+    return cm
+
+
+def _evaluate_stream(job_dir, model):
+    """Train (fit + validation) and test metrics, chunk by chunk."""
+    n_classes = len(joblib.load(os.path.join(job_dir, "meta.pkl"))["label_encoder"].classes_)
+    train = metrics_from_confusion(_confusion(model, _chunk_files(job_dir, 0, 1), n_classes))
+    test = metrics_from_confusion(_confusion(model, _chunk_files(job_dir, 2), n_classes))
+    return {
+        "train_accuracy": train["accuracy"],
+        "test_accuracy": test["accuracy"],
+        "precision": test["precision"],
+        "recall": test["recall"],
+        "f1": test["f1"],
+    }
+
+
+# ======================================================
+# Training jobs
+# ======================================================
+def _plain(value):
+    # numpy scalars in the metrics / search results
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def _write_status(job):
+    """Replace the job's status.json atomically (called under _jobs_cond, so writes stay in order)."""
+    path = os.path.join(TRAIN_DIR, job["job_id"], STATUS_FILE)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in job.items() if k != "future"}, f, default=_plain)
+    os.replace(tmp, path)
+
+
+def _read_status(job_id):
+    if not _JOB_ID.fullmatch(job_id):
+        return None
+    try:
+        with open(os.path.join(TRAIN_DIR, job_id, STATUS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        return None
+
+
+def _event(job, kind, **fields):
+    with _jobs_cond:
+        job["events"].append({"event": kind, "t": round(time.time() - job["created_at"], 3), **fields})
+        _write_status(job)
+        _jobs_cond.notify_all()
+
+
+def _update(job, **fields):
+    with _jobs_cond:
+        job.update(fields)
+        _write_status(job)
+        _jobs_cond.notify_all()
+
+
+def _finish(job, status, **fields):
+    # the last event and finished_at are set together, so followers never stop before it
+    with _jobs_cond:
+        job.update(status=status, finished_at=time.time(), **fields)
+        _event(job, status, **({"error": fields["error"]} if "error" in fields else {}))
+
+
+def submit_training(mission, data, learning_rate=None, max_depth=None, n_estimators=None, search="grid",
+                    n_jobs=None, early_stopping_rounds=EARLY_STOPPING_ROUNDS, warm_start=False,
+                    chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Validate the request, start the search in a background thread and return the job id.
+    data is a DataFrame (trained in memory) or a CSV file object / path (trained out of core).
+    """
+    mission = mission.lower()
+    if mission not in DEFAULT_PARAMS:
+        raise ValueError(f"Mission '{mission}' not supported")
+    if search not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search '{search}'. Use one of {list(SEARCH_STRATEGIES)}")
+    candidates = param_grid(mission, learning_rate, max_depth, n_estimators)
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(TRAIN_DIR, job_id)
+
+    mode = "memory" if isinstance(data, pd.DataFrame) else "stream"
+    os.makedirs(job_dir, exist_ok=True)
+    if mode == "stream":
+        if not isinstance(data, (str, os.PathLike)):
+            # the upload is spooled to the job dir once, then read chunk by chunk
+            path = os.path.join(job_dir, "input.csv")
+            with open(path, "wb") as f:
+                shutil.copyfileobj(data, f, 1024 * 1024)
+            data = path
+        columns = list(pd.read_csv(data, nrows=0).columns)
+    else:
+        columns = list(data.columns)
+    target = LABEL_COLUMNS[mission]
+    if target not in columns:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise ValueError(f"'{target}' column not found in dataset. Available columns: {columns}")
+
+    job = {
+        "job_id": job_id,
+        "mission": mission,
+        "mode": mode,
+        "warm_start": bool(warm_start),
+        "chunk_rows": int(chunk_rows or STREAM_CHUNK_ROWS),
+        "search": search,
+        "n_jobs": max(1, min(int(n_jobs or TRAIN_WORKERS), TRAIN_WORKERS)),
+        "early_stopping_rounds": int(early_stopping_rounds or 0),
+        "candidates": len(candidates),
+        "status": "queued",
+        "created_at": time.time(),
+        "finished_at": None,
+        "error": None,
+        "result": None,
+        "events": [],
+        "future": Future(),
+    }
+    _prune_jobs()
+    with _jobs_cond:
+        _jobs[job_id] = job
+        _write_status(job)
+    threading.Thread(target=_run_training, args=(job, data, candidates), daemon=True).start()
+    return job_id
+
+
+def _run_round(job, data_path, candidates, share):
+    """Fit candidates with n_estimators scaled by share; at most n_jobs fits at a time."""
+    executor = _get_executor()
+    fit = _fit_candidate_stream if job["mode"] == "stream" else _fit_candidate
+    n_jobs = job["n_jobs"]
+    concurrent = min(len(candidates), n_jobs)
+    threads = max(1, n_jobs // concurrent)
+
+    results, pending, queue = [], set(), list(candidates)
+    while queue or pending:
+        while queue and len(pending) < concurrent:
+            params = queue.pop(0)
+            budget = max(1, math.ceil(params["n_estimators"] * share))
+            pending.add(executor.submit(fit, data_path, params, budget, threads, job["early_stopping_rounds"]))
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            model, info = future.result()
+            results.append((model, info))
+            _event(job, "candidate", **info)
+    return sorted(results, key=lambda r: r[1]["valid_logloss"])
+
+
+def _publish_version(mission):
+    return "KeplerRetrained" if mission == "kepler" else registry.default_version(mission)
+
+
+def _warm_start_base(mission):
+    """Fitted artifacts of the bundle a retrain publishes to; a warm start continues its xgboost model."""
+    bundle = get_bundle(mission, _publish_version(mission))
+    return {
+        "model": bundle.get("xgb_model") or bundle["model"],
+        "label_encoder": bundle["label_encoder"],
+        "features": list(bundle["features"]),
+        "preprocessors": {name: bundle[name] for name in ("imputer", "scaler") if bundle.get(name) is not None},
+    }
+
+
+def _run_training(job, data, candidates):
+    _update(job, status="running")
+    _event(job, "started", mission=job["mission"], mode=job["mode"], warm_start=job["warm_start"],
+           search=job["search"], candidates=len(candidates), n_jobs=job["n_jobs"])
+    job_dir = os.path.join(TRAIN_DIR, job["job_id"])
+    try:
+        os.makedirs(job_dir, exist_ok=True)
+        executor = _get_executor()
+
+        base, features, preprocessors = None, None, {}
+        if job["warm_start"]:
+            base = _warm_start_base(job["mission"])
+            features, preprocessors = base["features"], base["preprocessors"]
+        elif job["mission"] == "k2":
+            bundle = get_bundle("k2")
+            # unfitted copies: the bundle that is being served is never touched
+            features = bundle["features"]
+            preprocessors = {"imputer": unfitted(bundle["imputer"]), "scaler": unfitted(bundle["scaler"])}
+
+        if job["mode"] == "stream":
+            data_path = job_dir
+            prepared = executor.submit(_prepare_stream, job["mission"], data, features, preprocessors,
+                                       job_dir, job["chunk_rows"], base).result()
+        else:
+            data_path = os.path.join(job_dir, "data.pkl")
+            prepared = executor.submit(_prepare, job["mission"], data, features, preprocessors, data_path, base).result()
+        data = None  # the in-memory frame is not needed past this point
+        _event(job, "prepared", **prepared)
+
+        if job["search"] == "halving":
+            schedule = halving_schedule(len(candidates))
+        else:
+            schedule = [(len(candidates), 1.0)]
+        survivors = candidates
+        for r, (kept, share) in enumerate(schedule):
+            survivors = survivors[:kept]
+            ranked = _run_round(job, data_path, survivors, share)
+            _event(job, "round", round=r, candidates=len(survivors), share=share, best=ranked[0][1])
+            survivors = [info["params"] for _, info in ranked]
+        best_model, best_info = ranked[0]
+
+        if job["mode"] == "stream":
+            metrics = executor.submit(_evaluate_stream, job_dir, best_model).result()
+            artifacts = joblib.load(os.path.join(job_dir, "meta.pkl"))
+        else:
+            artifacts = joblib.load(data_path)
+            metrics = _evaluate(best_model, artifacts)
+        result = _publish(job, best_model, best_info, metrics, artifacts, _parity_rows(job, artifacts))
+        _event(job, "published", model_path=result["model_path"])
+        _finish(job, "done", result=result)
+        job["future"].set_result(result)
+    except Exception as e:
+        _finish(job, "failed", error=str(e))
+        job["future"].set_exception(e)
+    finally:
+        # the prepared data goes, the status stays for the workers that did not run the job
+        for entry in os.scandir(job_dir):
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.name != STATUS_FILE:
+                os.remove(entry.path)
+
+
+def _prune_jobs():
+    """Forget the oldest finished jobs past TRAIN_JOBS_KEPT: status dirs on disk, records in memory."""
+    with _jobs_cond:
+        finished = sorted((j for j in _jobs.values() if j["finished_at"] is not None), key=lambda j: j["finished_at"])
+        for job in finished[:max(0, len(finished) - TRAIN_JOBS_KEPT)]:
+            del _jobs[job["job_id"]]
+    if not os.path.isdir(TRAIN_DIR):
+        return
+    done = []
+    for entry in os.scandir(TRAIN_DIR):
+        status = _read_status(entry.name) if entry.is_dir() else None
+        if status is not None and status["finished_at"] is not None:
+            done.append((status["finished_at"], entry.path))
+    for _, path in sorted(done)[:max(0, len(done) - TRAIN_JOBS_KEPT)]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _evaluate(model, data):
+    n_classes = len(data["label_encoder"].classes_)
+    train = metrics_from_confusion(confusion_matrix(data["y_train"], model.predict(data["X_train"]), n_classes))
+    test = metrics_from_confusion(confusion_matrix(data["y_test"], model.predict(data["X_test"]), n_classes))
+    return {
+        "train_accuracy": train["accuracy"],
+        "test_accuracy": test["accuracy"],
+        "precision": test["precision"],
+        "recall": test["recall"],
+        "f1": test["f1"],
+    }
+
+
+def _parity_rows(job, data):
+    """Up to PARITY_ROWS held-out test rows, as the model sees them (already preprocessed)."""
+    if job["mode"] == "memory":
+        return np.asarray(data["X_test"], dtype=np.float64)[:PARITY_ROWS]
+    blocks, rows = [], 0
+    for path in _chunk_files(os.path.join(TRAIN_DIR, job["job_id"]), 2):
+        if rows >= PARITY_ROWS:
+            break
+        with np.load(path) as chunk:
+            blocks.append(chunk["X"][:PARITY_ROWS - rows].astype(np.float64))
+        rows += len(blocks[-1])
+    return np.concatenate(blocks) if blocks else np.empty((0, len(data["features"])))
+
+
+def _publish(job, model, info, metrics, data, parity_rows):
+    train_acc, test_acc = metrics["train_accuracy"], metrics["test_accuracy"]
+
+    # تحديد حالة الموديل
+    status = "Balanced"
+    if train_acc - test_acc > 0.15:
+        status = "Overfitting"
+    elif test_acc < 0.7:
+        status = "Underfitting"
+
+    # a new immutable release, swapped in only once it is fully written, loaded and scored the same
+    # by the compiled engine (small batches) as by the native models (everything else)
+    check = lambda bundle: check_parity(bundle, parity_rows)
+    if job["mission"] == "kepler":
+        bundle = registry.publish("kepler", _publish_version("kepler"), {
+            "model": model,
+            "label_encoder": data["label_encoder"],
+        }, check)
+        model_path = bundle.paths["model"]
+        message = "✅ Kepler retrained with custom hyperparams (and saved separately)"
+    else:
+        pre = data["preprocessors"]
+        bundle = registry.publish("k2", _publish_version("k2"), {
+            "xgb_model": model,
+            "imputer": pre["imputer"],
+            "scaler": pre["scaler"],
+            "label_encoder": data["label_encoder"],
+            "features": data["features"],
+        }, check)
+        model_path = bundle.paths["xgb_model"]
+        message = "✅ K2 model retrained successfully"
+
+    return {
+        "message": message,
+        "status": status,
+        "metrics": metrics,
+        "model_path": model_path,
+        "release": bundle.release,
+        "mode": job["mode"],
+        "warm_start": job["warm_start"],
+        "search": {
+            "strategy": job["search"],
+            "candidates": job["candidates"],
+            "best_params": info["params"],
+            "best_iteration": info["best_iteration"],
+            "valid_logloss": info["valid_logloss"],
+        },
+    }
+
+
+# ======================================================
+# Status / progress
+# ======================================================
+def get_training(job_id):
+    """The job record: live (with its future) in the worker running it, read from its status.json in the others."""
+    with _jobs_cond:
+        job = _jobs.get(job_id)
+    return job if job is not None else _read_status(job_id)
+
+
+def training_status(job_id):
+    job = get_training(job_id)
+    if job is None:
+        return None
+    with _jobs_cond:
+        status = {k: v for k, v in job.items() if k not in ("events", "future")}
+        status["events"] = len(job["events"])
+    return status
+
+
+def iter_events(job_id, timeout=1.0):
+    """NDJSON progress events, following the job until it finishes (polling its status file if it runs elsewhere)."""
+    sent = 0
+    while True:
+        with _jobs_cond:
+            job = _jobs.get(job_id)
+            if job is not None:
+                while sent == len(job["events"]) and job["finished_at"] is None:
+                    _jobs_cond.wait(timeout)
+                events, finished = job["events"][sent:], job["finished_at"] is not None
+        if job is None:
+            job = _read_status(job_id)
+            if job is None:
+                break
+            events, finished = job["events"][sent:], job["finished_at"] is not None
+            if not events and not finished:
+                time.sleep(timeout)
+                continue
+        for event in events:
+            yield (json.dumps(event) + "\n").encode()
+        sent += len(events)
+        if finished:
+            break
@@ -0,0 +1,331 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# -------- CONFIG --------
+# "native" = xgboost/lightgbm predict_proba, "compiled" = the array-of-nodes engine below,
+# "auto" = compiled for small batches (single planets, micro-batches) where per-call overhead dominates
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "auto")
+COMPILED_MAX_ROWS = int(os.environ.get("COMPILED_MAX_ROWS", 4))
+ROW_BLOCK = 512
+# LightGBM's kZeroThreshold
+ZERO_THRESHOLD = 1e-35
+# ------------------------
+
+
+class CompiledForest:
+    """
+    Every tree of one or more ensembles flattened into parallel node arrays.
+    A row goes left when x <= threshold (xgboost's "<" is rewritten at export time).
+    Leaves point to themselves so a traversal step is a no-op once a leaf is reached.
+    Each tree adds its leaf value to one output column (model x class).
+    """
+
+    FIELDS = ("feature", "threshold", "left", "right", "default_left", "nan_to_zero",
+              "zero_default", "is_leaf", "value", "roots", "tree_output")
+
+    def __init__(self, feature, threshold, left, right, default_left, nan_to_zero, zero_default,
+                 is_leaf, value, roots, tree_output):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.nan_to_zero = nan_to_zero
+        self.zero_default = zero_default
+        self.is_leaf = is_leaf
+        self.value = value
+        self.roots = roots
+        self.tree_output = tree_output
+        self.n_outputs = int(tree_output.max()) + 1 if len(tree_output) else 0
+        # (n_trees, n_outputs) one-hot, so summing leaves per output is a single matmul
+        self._output_matrix = np.zeros((len(roots), self.n_outputs))
+        self._output_matrix[np.arange(len(roots)), tree_output] = 1.0
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def save(self, path):
+        np.savez(path, **{name: getattr(self, name) for name in self.FIELDS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in cls.FIELDS})
+
+    # ---------- evaluation ----------
+    def leaf_values(self, X):
+        """(n_rows, n_trees) leaf value reached by every row in every tree."""
+        n, width = X.shape
+        X_flat = np.ascontiguousarray(X, dtype=np.float64).ravel()
+        node = np.tile(self.roots, n)
+        row_base = np.repeat(np.arange(n, dtype=np.int32) * width, self.n_trees)
+        # without NaNs (or exact zeros for zero-missing splits) no default directions are needed
+        plain = not np.isnan(X_flat).any() and not (self.zero_default.any() and (np.abs(X_flat) <= ZERO_THRESHOLD).any())
+
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            nd = node[active]
+            x = X_flat[row_base[active] + self.feature[nd]]
+            if plain:
+                go_left = x <= self.threshold[nd]
+            else:
+                missing = np.isnan(x)
+                x = np.where(missing & self.nan_to_zero[nd], 0.0, x)
+                use_default = (missing & ~self.nan_to_zero[nd]) | (self.zero_default[nd] & (np.abs(x) <= ZERO_THRESHOLD))
+                go_left = np.where(use_default, self.default_left[nd], x <= self.threshold[nd])
+            nxt = np.where(go_left, self.left[nd], self.right[nd])
+            node[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+        return self.value[node].reshape(n, self.n_trees)
+
+    def margins(self, X):
+        out = np.empty((X.shape[0], self.n_outputs))
+        for start in range(0, X.shape[0], ROW_BLOCK):
+            block = X[start:start + ROW_BLOCK]
+            out[start:start + ROW_BLOCK] = self.leaf_values(block) @ self._output_matrix
+        return out
+
+
+# ======================================================
+# Export from XGBoost / LightGBM
+# ======================================================
+def xgb_served_trees(learner):
+    """
+    How many trees xgboost predicts with: an early-stopped model (best_iteration set) is scored
+    with the rounds up to its best one only, the trees grown after it are kept but never used.
+    """
+    gb = learner["gradient_booster"]["model"]
+    best = learner.get("attributes", {}).get("best_iteration")
+    if best is None:
+        return len(gb["trees"])
+    return int(gb["iteration_indptr"][int(best) + 1])
+
+
+def _xgb_arrays(model, feature_offset, output_offset):
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    gb = learner["gradient_booster"]["model"]
+    n_outputs = int(learner["learner_model_param"]["num_class"]) or 1
+    base_score = float(learner["learner_model_param"]["base_score"])
+    if n_outputs == 1:
+        # a binary model has one margin column and keeps base_score as a probability
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"XGBoost objective '{objective}' is not supported by the compiled engine")
+        base_score = float(np.log(base_score / (1 - base_score)))
+    n_trees = xgb_served_trees(learner)
+
+    parts = []
+    for tree, group in zip(gb["trees"][:n_trees], gb["tree_info"][:n_trees]):
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        right = np.asarray(tree["right_children"], dtype=np.int64)
+        cond32 = np.asarray(tree["split_conditions"], dtype=np.float32)
+        cond = cond32.astype(np.float64)
+        is_leaf = left == -1
+        # inputs are float32-rounded, so "x < c" is the same test as "x <= largest float32 below c"
+        below = np.nextafter(cond32, np.float32(-np.inf)).astype(np.float64)
+        idx = np.arange(len(left))
+        parts.append({
+            "feature": np.where(is_leaf, 0, np.asarray(tree["split_indices"], dtype=np.int64)) + feature_offset,
+            "threshold": np.where(is_leaf, 0.0, below),
+            "left": np.where(is_leaf, idx, left),
+            "right": np.where(is_leaf, idx, right),
+            "default_left": np.asarray(tree["default_left"], dtype=bool),
+            "nan_to_zero": np.zeros(len(left), dtype=bool),
+            "zero_default": np.zeros(len(left), dtype=bool),
+            "is_leaf": is_leaf,
+            "value": np.where(is_leaf, cond, 0.0),
+            "output": output_offset + int(group),
+        })
+    return parts, n_outputs, base_score
+
+
+def _lgb_arrays(model, feature_offset, output_offset):
+    dump = model.booster_.dump_model()
+    n_outputs = int(dump["num_tree_per_iteration"])
+    scale = 1.0
+    if n_outputs == 1:
+        # binary: p = sigmoid(scale * margin) with "binary sigmoid:<scale>", folded into the leaf values
+        objective = dump["objective"].split()
+        if objective[0] != "binary":
+            raise ValueError(f"LightGBM objective '{dump['objective']}' is not supported by the compiled engine")
+        scale = float(dict(o.split(":", 1) for o in objective[1:] if ":" in o).get("sigmoid", 1.0))
+
+    parts = []
+    for i, info in enumerate(dump["tree_info"]):
+        nodes = []
+
+        def walk(node):
+            pos = len(nodes)
+            nodes.append(node)
+            if "leaf_value" not in node:
+                node["_left"] = walk(node["left_child"])
+                node["_right"] = walk(node["right_child"])
+            return pos
+
+        walk(info["tree_structure"])
+        is_leaf = np.array(["leaf_value" in n for n in nodes])
+        idx = np.arange(len(nodes))
+        if any(n.get("decision_type", "<=") != "<=" for n in nodes):
+            raise ValueError("Categorical LightGBM splits are not supported by the compiled engine")
+        missing = [n.get("missing_type", "None") for n in nodes]
+        parts.append({
+            "feature": np.array([n.get("split_feature", 0) for n in nodes], dtype=np.int64) + feature_offset,
+            "threshold": np.array([n.get("threshold", 0.0) for n in nodes], dtype=np.float64),
+            "left": np.array([n.get("_left", i) for i, n in enumerate(nodes)], dtype=np.int64),
+            "right": np.array([n.get("_right", i) for i, n in enumerate(nodes)], dtype=np.int64),
+            "default_left": np.array([n.get("default_left", False) for n in nodes], dtype=bool),
+            "nan_to_zero": np.array([m != "NaN" for m in missing]) & ~is_leaf,
+            "zero_default": np.array([m == "Zero" for m in missing]) & ~is_leaf,
+            "is_leaf": is_leaf,
+            "value": np.array([n.get("leaf_value", 0.0) for n in nodes], dtype=np.float64) * scale,
+            "output": output_offset + i % n_outputs,
+        })
+    return parts, n_outputs
+
+
+def _build(parts):
+    offsets = np.cumsum([0] + [len(p["is_leaf"]) for p in parts])
+    cat = lambda key: np.concatenate([p[key] for p in parts])
+    shift = np.repeat(offsets[:-1], [len(p["is_leaf"]) for p in parts])
+    return CompiledForest(
+        feature=cat("feature").astype(np.int32),
+        threshold=cat("threshold"),
+        left=(cat("left") + shift).astype(np.int32),
+        right=(cat("right") + shift).astype(np.int32),
+        default_left=cat("default_left"),
+        nan_to_zero=cat("nan_to_zero"),
+        zero_default=cat("zero_default"),
+        is_leaf=cat("is_leaf"),
+        value=cat("value"),
+        roots=offsets[:-1].astype(np.int32),
+        tree_output=np.array([p["output"] for p in parts], dtype=np.int64),
+    )
+
+
+class CompiledEnsemble:
+    """
+    One forest holding every member model, evaluated in a single pass.
+    Member k reads columns [k*F, (k+1)*F) of a widened input, so XGBoost members see
+    float32-rounded features (as xgboost does) while LightGBM members see float64.
+    """
+
+    def __init__(self, forest, members):
+        self.forest = forest
+        # [(kind, margin columns, margin offset)]: one column (binary) is a sigmoid, more a softmax
+        self.members = members
+
+    @classmethod
+    def from_models(cls, models):
+        parts, members = [], []
+        n_features = None
+        output = 0
+        for k, model in enumerate(models):
+            n_features = n_features or int(model.n_features_in_)
+            if hasattr(model, "get_booster"):
+                p, n_outputs, base = _xgb_arrays(model, k * n_features, output)
+                members.append(("xgb", n_outputs, base))
+            else:
+                p, n_outputs = _lgb_arrays(model, k * n_features, output)
+                members.append(("lgb", n_outputs, 0.0))
+            parts.extend(p)
+            output += n_outputs
+        return cls(_build(parts), members)
+
+    def _widen(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        cols = [X.astype(np.float32).astype(np.float64) if kind == "xgb" else X for kind, _, _ in self.members]
+        return np.hstack(cols) if len(cols) > 1 else cols[0]
+
+    def member_proba(self, X):
+        margins = self.forest.margins(self._widen(X))
+        out, start = [], 0
+        for kind, n_outputs, base in self.members:
+            m = margins[:, start:start + n_outputs] + base
+            if n_outputs == 1:
+                p = 1 / (1 + np.exp(-m[:, 0]))
+                out.append(np.column_stack([1 - p, p]))
+            else:
+                m = m - m.max(axis=1, keepdims=True)
+                e = np.exp(m)
+                out.append(e / e.sum(axis=1, keepdims=True))
+            start += n_outputs
+        return out
+
+    def predict_proba(self, X):
+        """Mean of the member probabilities (a single model returns its own probabilities)."""
+        probs = self.member_proba(X)
+        return sum(probs) / len(probs)
+
+    def save(self, path):
+        self.forest.save(path)
+        with open(f"{path}.json", "w") as f:
+            json.dump(self.members, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(f"{path}.json") as f:
+            members = [tuple(m) for m in json.load(f)]
+        return cls(CompiledForest.load(path), members)
+
+
+# ======================================================
+# Serving helpers
+# ======================================================
+def ensemble_models(bundle):
+    if "xgb_model" in bundle.artifacts:
+        # a retrained K2 release only has the xgb member (the lgb one was fitted on other preprocessing)
+        return [bundle[name] for name in ("xgb_model", "lgb_model") if name in bundle.artifacts]
+    return [bundle["model"]]
+
+
+def compiled(bundle):
+    """Compile a bundle's ensemble once and keep it on the bundle."""
+    engine = bundle._compiled
+    if engine is None:
+        engine = bundle._compiled = CompiledEnsemble.from_models(ensemble_models(bundle))
+    return engine
+
+
+def predict_proba(bundle, X, backend=None):
+    """Ensemble class probabilities; labels are derived from these, never from a second predict()."""
+    backend = backend or INFERENCE_BACKEND
+    if backend == "auto":
+        backend = "compiled" if len(X) <= COMPILED_MAX_ROWS else "native"
+    if backend == "compiled":
+        return compiled(bundle).predict_proba(np.asarray(X, dtype=np.float64))
+    probs = [model.predict_proba(_native_input(model, X)) for model in ensemble_models(bundle)]
+    return sum(probs) / len(probs)
+
+
+def _native_input(model, X):
+    # lightgbm checks feature names when it was fitted on a DataFrame; wrapping the matrix costs no copy
+    names = getattr(model, "feature_names_in_", None)
+    if isinstance(X, np.ndarray) and names is not None and not hasattr(model, "get_booster"):
+        return pd.DataFrame(X, columns=names, copy=False)
+    return X
+
+
+def validate(bundle, X, atol=1e-5):
+    """Compare the compiled engine with the native models on X."""
+    native = predict_proba(bundle, X, backend="native")
+    fast = predict_proba(bundle, X, backend="compiled")
+    return {
+        "rows": int(len(native)),
+        "max_abs_prob_diff": float(np.max(np.abs(native - fast))) if len(native) else 0.0,
+        "label_agreement": float(np.mean(native.argmax(1) == fast.argmax(1))) if len(native) else 1.0,
+        "ok": bool(np.allclose(native, fast, atol=atol) and np.array_equal(native.argmax(1), fast.argmax(1))),
+    }
+
+
+def check_parity(bundle, X, atol=1e-5):
+    """validate() as a gate: ValueError when the compiled engine would not score X as the native models do."""
+    report = validate(bundle, X, atol)
+    if not report["ok"]:
+        raise ValueError(f"Compiled engine disagrees with the native models of {bundle.mission}/{bundle.version}: "
+                         f"max |p diff| {report['max_abs_prob_diff']:.3g}, label agreement {report['label_agreement']:.4f}")
+    return report